@@ -0,0 +1,192 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import OrderedDict
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from app import metrics
+from app.config import settings
+
+# Control de admisión delante de la BD. Cuando muchos dispositivos se reconectan a la
+# vez, sin esto cada request espera su conexión dentro del threadpool hasta
+# DB_POOL_TIMEOUT y hasta /health deja de contestar.
+#
+# * A lo sumo ADMISION_LIMITE requests en curso por worker (lo que da el pool), y de
+#   esos como mucho ADMISION_LECTURAS listados/dashboards/reportes.
+# * El resto espera en una cola por prioridad: crear pedidos, después las demás
+#   escrituras, después las lecturas. ADMISION_COLA lugares por clase y ADMISION_ESPERA
+#   segundos como máximo; lo que no entra recibe 503 + Retry-After al instante.
+# * Escrituras con X-Client-Id: token bucket por dispositivo (429 + Retry-After).
+# * /, /health, /metrics, la documentación y el stream SSE no pasan por acá.
+
+PRIORIDADES = {"pedidos": 0, "escritura": 1, "lectura": 2}
+LIBRES = {"/", "/health", "/metrics", "/docs", "/redoc", "/openapi.json", "/pedidos/stream"}
+CREAR_PEDIDOS = {"/pedidos", "/pedidos/batch"}
+RETRY_AFTER = 2
+
+ADMISION_RECHAZOS = metrics.Contador("admision_rechazos_total", "Requests rechazados por clase y motivo")
+ADMISION_ESPERA = metrics.Histograma("admision_espera_seconds", "Tiempo en la cola de admisión")
+
+def clasificar(metodo: str, ruta: str) -> str | None:
+    if ruta in LIBRES or ruta.startswith("/docs/"):
+        return None
+    if metodo == "POST" and ruta in CREAR_PEDIDOS:
+        return "pedidos"
+    if metodo in ("POST", "PUT", "PATCH", "DELETE"):
+        return "escritura"
+    return "lectura"
+
+class Rechazado(Exception):
+    def __init__(self, motivo: str):
+        super().__init__(motivo)
+        self.motivo = motivo
+
+class Admision:
+    # Semáforo con cola por prioridad. Vive en el event loop del worker: sin locks.
+    def __init__(self, limite: int, limites: dict[str, int], cola: int, espera: float):
+        self.limite = limite
+        self.limites = limites
+        self.cola = cola
+        self.espera = espera
+        self.en_curso = dict.fromkeys(PRIORIDADES, 0)
+        self.en_cola = dict.fromkeys(PRIORIDADES, 0)
+        self._total = 0
+        self._esperando: list = []      # heap (prioridad, orden, clase, future)
+        self._orden = itertools.count()
+
+    def _cabe(self, clase: str) -> bool:
+        return self._total < self.limite and self.en_curso[clase] < self.limites.get(clase, self.limite)
+
+    def _ocupar(self, clase: str):
+        self._total += 1
+        self.en_curso[clase] += 1
+
+    def _hay_antes(self, clase: str) -> bool:
+        # Alguien de igual o mayor prioridad ya está esperando: no se le pasa por delante
+        prioridad = PRIORIDADES[clase]
+        return any(p <= prioridad and not f.done() for p, _, _, f in self._esperando)
+
+    async def entrar(self, clase: str):
+        if self._cabe(clase) and not self._hay_antes(clase):
+            self._ocupar(clase)
+            return
+        if self.en_cola[clase] >= self.cola:
+            raise Rechazado("cola_llena")
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._esperando, (PRIORIDADES[clase], next(self._orden), clase, fut))
+        self.en_cola[clase] += 1
+        try:
+            await asyncio.wait_for(fut, self.espera)
+        except BaseException as e:
+            if fut.done() and not fut.cancelled():
+                # Lo admitieron justo cuando vencía o se cortaba la conexión
+                self.salir(clase)
+            else:
+                self.en_cola[clase] -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                raise Rechazado("espera") from None
+            raise
+
+    def salir(self, clase: str):
+        self._total -= 1
+        self.en_curso[clase] -= 1
+        self._despertar()
+
+    def _despertar(self):
+        bloqueados = []
+        while self._esperando and self._total < self.limite:
+            entrada = heapq.heappop(self._esperando)
+            _, _, clase, fut = entrada
+            if fut.done():
+                continue
+            if self.en_curso[clase] >= self.limites.get(clase, self.limite):
+                # Tope de su clase (lecturas): que pase el siguiente de otra clase
+                bloqueados.append(entrada)
+                continue
+            self.en_cola[clase] -= 1
+            self._ocupar(clase)
+            fut.set_result(None)
+        for entrada in bloqueados:
+            heapq.heappush(self._esperando, entrada)
+
+class Cubetas:
+    # Token bucket por cliente: `tasa` por segundo, hasta `rafaga` acumulados
+    def __init__(self, tasa: float, rafaga: int, maximo: int = 10000):
+        self.tasa = tasa
+        self.rafaga = rafaga
+        self.maximo = maximo
+        self._cubetas: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def tomar(self, cliente: str) -> float:
+        # 0 = permitido; si no, segundos hasta el próximo token
+        ahora = time.monotonic()
+        tokens, antes = self._cubetas.pop(cliente, (float(self.rafaga), ahora))
+        tokens = min(self.rafaga, tokens + (ahora - antes) * self.tasa)
+        espera = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            espera = (1 - tokens) / self.tasa
+        self._cubetas[cliente] = (tokens, ahora)
+        while len(self._cubetas) > self.maximo:
+            self._cubetas.popitem(last=False)
+        return espera
+
+def _crear_admision() -> Admision:
+    limite = settings.ADMISION_LIMITE or settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    lecturas = settings.ADMISION_LECTURAS or max(1, limite // 2)
+    return Admision(limite, {"lectura": lecturas}, settings.ADMISION_COLA, settings.ADMISION_ESPERA)
+
+admision = _crear_admision()
+cubetas = Cubetas(settings.ADMISION_TASA, settings.ADMISION_RAFAGA) if settings.ADMISION_TASA > 0 else None
+
+metrics.Gauge("admision_en_curso", "Requests admitidos en curso por clase",
+              funcion=lambda: [({"clase": c}, n) for c, n in admision.en_curso.items()])
+metrics.Gauge("admision_en_cola", "Requests esperando admisión por clase",
+              funcion=lambda: [({"clase": c}, n) for c, n in admision.en_cola.items()])
+
+def _rechazo(status_code: int, detalle: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detalle},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+class AdmisionMiddleware:
+    # ASGI puro como MedicionMiddleware: el lugar se libera cuando termina la respuesta
+    # (un export en streaming lo ocupa mientras usa su conexión)
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        clase = clasificar(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if clase is None:
+            await self.app(scope, receive, send)
+            return
+
+        if cubetas is not None and clase != "lectura":
+            cliente = Headers(scope=scope).get("x-client-id")
+            # Sin X-Client-Id no se limita: las tablets del local comparten IP
+            espera = cubetas.tomar(cliente) if cliente else 0.0
+            if espera:
+                ADMISION_RECHAZOS.inc(clase=clase, motivo="tasa")
+                await _rechazo(429, "Demasiadas escrituras, reintente en un momento", espera)(scope, receive, send)
+                return
+
+        t0 = time.perf_counter()
+        try:
+            await admision.entrar(clase)
+        except Rechazado as r:
+            ADMISION_RECHAZOS.inc(clase=clase, motivo=r.motivo)
+            await _rechazo(503, "Servidor ocupado, reintente en un momento", RETRY_AFTER)(scope, receive, send)
+            return
+        ADMISION_ESPERA.observe(time.perf_counter() - t0, clase=clase)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admision.salir(clase)
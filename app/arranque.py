@@ -0,0 +1,36 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from app import metrics
+
+# Tiempos del arranque en frío (imports, esquema, seed, pool...). Se registran una
+# vez por proceso, se loguean en "app.arranque" y quedan en /metrics.
+
+logger = logging.getLogger("app.arranque")
+
+_fases: dict[str, float] = {}
+
+metrics.Gauge(
+    "app_startup_seconds", "Duración de cada fase del arranque del worker",
+    funcion=lambda: [({"fase": f}, s) for f, s in list(_fases.items())],
+)
+
+def registrar(fase: str, segundos: float):
+    _fases[fase] = segundos
+
+@contextmanager
+def medir(fase: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(fase, time.perf_counter() - t0)
+
+def fases() -> dict[str, float]:
+    return dict(_fases)
+
+def reportar(**contexto):
+    detalle = " ".join(f"{f}={s * 1000:.0f}ms" for f, s in _fases.items())
+    extra = " ".join(f"{k}={v}" for k, v in contexto.items())
+    logger.info("arranque %.0fms: %s %s", sum(_fases.values()) * 1000, detalle, extra)
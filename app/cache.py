@@ -0,0 +1,232 @@
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import metrics
+from app.config import settings
+
+# Caché de lecturas calientes (catálogo, jornada activa, dashboards) con backend
+# intercambiable por CACHE_BACKEND:
+#
+# * "memoria": LRU con TTL dentro del proceso (default, como antes).
+# * "sqlite": archivo compartido por los workers de uvicorn del mismo host.
+# * "redis": compartido entre hosts (CACHE_REDIS_URL, necesita el paquete redis).
+#
+# Invalidación por tags: cada entrada guarda la versión de sus tags al momento de
+# cargarse; invalidar(tag) sube la versión y toda entrada con la versión vieja pasa
+# a ser un miss. Con "sqlite" o "redis" la invalidación se ve en todos los workers;
+# con "memoria" solo en el que escribió y el TTL acota al resto.
+
+logger = logging.getLogger("app.cache")
+
+CACHE_CONSULTAS = metrics.Contador("cache_total", "Lecturas de la caché por espacio y resultado")
+
+class BackendMemoria:
+    def __init__(self, maximo: int):
+        self.maximo = maximo
+        self._lock = threading.Lock()
+        self._entradas: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._versiones: dict[str, int] = {}
+
+    def leer(self, clave: str, tags: tuple[str, ...]):
+        with self._lock:
+            actuales = tuple(self._versiones.get(t, 0) for t in tags)
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None, actuales
+            if entrada[0] <= time.monotonic():
+                del self._entradas[clave]
+                return None, actuales
+            self._entradas.move_to_end(clave)
+            return entrada[1], actuales
+
+    def escribir(self, clave: str, valor, ttl: float):
+        with self._lock:
+            self._entradas[clave] = (time.monotonic() + ttl, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def borrar(self, clave: str):
+        with self._lock:
+            self._entradas.pop(clave, None)
+
+    def subir_versiones(self, tags: tuple[str, ...]):
+        with self._lock:
+            for t in tags:
+                self._versiones[t] = self._versiones.get(t, 0) + 1
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+class BackendSQLite:
+    # Un archivo por host. Es una caché: synchronous=OFF, si se pierde algo es un miss.
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._local = threading.local()
+        self._escrituras = 0
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS entradas (clave TEXT PRIMARY KEY, valor BLOB NOT NULL, expira REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS versiones (tag TEXT PRIMARY KEY, version INTEGER NOT NULL);"
+            )
+            self._local.conn = conn
+        return conn
+
+    def leer(self, clave: str, tags: tuple[str, ...]):
+        db = self._db()
+        versiones = dict(db.execute(
+            f"SELECT tag, version FROM versiones WHERE tag IN ({','.join('?' * len(tags))})", tags
+        ).fetchall()) if tags else {}
+        actuales = tuple(versiones.get(t, 0) for t in tags)
+        fila = db.execute(
+            "SELECT valor FROM entradas WHERE clave = ? AND expira > ?", (clave, time.time())
+        ).fetchone()
+        return (pickle.loads(fila[0]) if fila else None), actuales
+
+    def escribir(self, clave: str, valor, ttl: float):
+        db = self._db()
+        db.execute(
+            "INSERT OR REPLACE INTO entradas VALUES (?, ?, ?)",
+            (clave, pickle.dumps(valor, pickle.HIGHEST_PROTOCOL), time.time() + ttl),
+        )
+        self._escrituras += 1
+        if self._escrituras % 500 == 0:
+            db.execute("DELETE FROM entradas WHERE expira <= ?", (time.time(),))
+
+    def borrar(self, clave: str):
+        self._db().execute("DELETE FROM entradas WHERE clave = ?", (clave,))
+
+    def subir_versiones(self, tags: tuple[str, ...]):
+        self._db().executemany(
+            "INSERT INTO versiones VALUES (?, 1) ON CONFLICT (tag) DO UPDATE SET version = version + 1",
+            [(t,) for t in tags],
+        )
+
+    def limpiar(self):
+        self._db().execute("DELETE FROM entradas")
+
+class BackendRedis:
+    PREFIJO = "sopas:"
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis necesita el paquete redis (pip install redis)") from e
+        self.cliente = redis.Redis.from_url(url)
+
+    def _tag(self, tag: str) -> str:
+        return f"{self.PREFIJO}tag:{tag}"
+
+    def leer(self, clave: str, tags: tuple[str, ...]):
+        # Entrada y versiones de sus tags en un solo round-trip
+        valor, *versiones = self.cliente.mget([self.PREFIJO + clave, *(self._tag(t) for t in tags)])
+        actuales = tuple(int(v) if v is not None else 0 for v in versiones)
+        return (pickle.loads(valor) if valor is not None else None), actuales
+
+    def escribir(self, clave: str, valor, ttl: float):
+        self.cliente.set(self.PREFIJO + clave, pickle.dumps(valor, pickle.HIGHEST_PROTOCOL), px=int(ttl * 1000))
+
+    def borrar(self, clave: str):
+        self.cliente.delete(self.PREFIJO + clave)
+
+    def subir_versiones(self, tags: tuple[str, ...]):
+        pipe = self.cliente.pipeline(transaction=False)
+        for t in tags:
+            pipe.incr(self._tag(t))
+        pipe.execute()
+
+    def limpiar(self):
+        for clave in self.cliente.scan_iter(f"{self.PREFIJO}*"):
+            if not clave.startswith(self._tag("").encode()):
+                self.cliente.delete(clave)
+
+class Cache:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get(self, clave: str, tags: tuple[str, ...] = ()):
+        # None = miss (no existe, venció o alguno de sus tags se invalidó)
+        valor, _ = self._leer(clave, tags)
+        return valor
+
+    def _leer(self, clave: str, tags: tuple[str, ...]):
+        entrada, actuales = self.backend.leer(clave, tags)
+        valor = entrada[1] if entrada is not None and entrada[0] == actuales else None
+        CACHE_CONSULTAS.inc(espacio=clave.split(":", 1)[0], resultado="miss" if valor is None else "hit")
+        return valor, actuales
+
+    def set(self, clave: str, valor, ttl: float, tags: tuple[str, ...] = (), versiones: tuple[int, ...] | None = None):
+        if versiones is None:
+            _, versiones = self.backend.leer(clave, tags)
+        self.backend.escribir(clave, (versiones, valor), ttl)
+
+    def obtener(self, clave: str, cargar, ttl: float, tags: tuple[str, ...] = ()):
+        # get-or-load. Las versiones se leen ANTES de cargar: si alguien invalida mientras
+        # tanto, lo guardado queda con la versión vieja y el próximo get lo descarta.
+        valor, versiones = self._leer(clave, tags)
+        if valor is None:
+            valor = cargar()
+            self.set(clave, valor, ttl, tags, versiones)
+        return valor
+
+    def borrar(self, clave: str):
+        self.backend.borrar(clave)
+
+    def invalidar(self, *tags: str):
+        if tags:
+            self.backend.subir_versiones(tags)
+
+    def version(self, tag: str) -> int:
+        return self.backend.leer("", (tag,))[1][0]
+
+    def limpiar(self):
+        self.backend.limpiar()
+
+def crear_backend(nombre: str):
+    if nombre == "memoria":
+        return BackendMemoria(settings.CACHE_MEMORIA_MAX)
+    if nombre == "sqlite":
+        return BackendSQLite(settings.CACHE_SQLITE_PATH)
+    if nombre == "redis":
+        if not settings.CACHE_REDIS_URL:
+            raise RuntimeError("CACHE_BACKEND=redis necesita CACHE_REDIS_URL")
+        return BackendRedis(settings.CACHE_REDIS_URL)
+    raise ValueError(f"CACHE_BACKEND desconocido: {nombre}")
+
+cache = Cache(crear_backend(settings.CACHE_BACKEND))
+
+# ---------- invalidación al confirmar ----------
+# Los servicios marcan tags durante la transacción; se invalidan recién en after_commit.
+# Invalidar antes dejaría que otro request recargue lo viejo y lo guarde con la versión nueva.
+
+def invalidar_al_confirmar(db: Session, *tags: str):
+    db.info.setdefault("cache_tags", set()).update(tags)
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_pendientes(session: Session):
+    tags = session.info.pop("cache_tags", None)
+    if tags:
+        try:
+            cache.invalidar(*sorted(tags))
+        except Exception:
+            # El commit ya pasó: si el backend falla, las entradas vencen por TTL
+            logger.warning("no se pudo invalidar %s", sorted(tags), exc_info=True)
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendientes(session: Session):
+    session.info.pop("cache_tags", None)
@@ -0,0 +1,39 @@
+"""Archiva jornadas cerradas y purga pedidos borrados (mantenimiento de pedidos).
+
+    python -m app.commands.archivar                  # ARCHIVO_RETENCION_DIAS / PURGA_BORRADOS_DIAS
+    python -m app.commands.archivar --dias 0         # todas las jornadas cerradas
+    python -m app.commands.archivar --jornada ID     # solo esta jornada
+
+Lo mismo que corre en segundo plano al cerrar una jornada (ARCHIVO_AL_CERRAR); sirve
+para un cron o para archivar el historial la primera vez.
+"""
+import argparse
+
+from app.database import SessionLocal
+from app.esquema import migrar
+from app.services.archivo_service import archivar_jornada, mantenimiento
+
+def main():
+    parser = argparse.ArgumentParser(description="Archiva jornadas cerradas y purga borrados")
+    parser.add_argument("--dias", type=int, help="Archivar jornadas cerradas hace más de N días")
+    parser.add_argument("--purgar-dias", type=int, help="Purgar borrados hace más de N días")
+    parser.add_argument("--jornada", help="Archivar solo esta jornada (sin purga)")
+    args = parser.parse_args()
+
+    migrar()
+    if args.jornada:
+        db = SessionLocal()
+        try:
+            movidos = archivar_jornada(db, args.jornada)
+        finally:
+            db.close()
+        print(f"jornada {args.jornada}: {movidos} pedidos archivados")
+        return
+
+    resultado = mantenimiento(args.dias, args.purgar_dias)
+    for jornada_id, movidos in resultado["jornadas"].items():
+        print(f"jornada {jornada_id}: {movidos} pedidos archivados")
+    print(f"{len(resultado['jornadas'])} jornadas archivadas, {resultado['purgados']} borrados purgados")
+
+if __name__ == "__main__":
+    main()
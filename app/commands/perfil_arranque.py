@@ -0,0 +1,72 @@
+"""Mide el arranque en frío: imports por paquete y fases del lifespan.
+
+    python -m app.commands.perfil_arranque
+    python -m app.commands.perfil_arranque --top 25
+
+Levanta un proceso nuevo con `python -X importtime`, importa app.main y corre el
+lifespan completo (esquema, seed, pool), igual que un worker recién escalado.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from collections import defaultdict
+
+_SCRIPT = """
+import asyncio, json, sys
+from app.main import app
+from app import arranque
+
+async def main():
+    async with app.router.lifespan_context(app):
+        pass
+
+asyncio.run(main())
+sys.stdout.write(json.dumps(arranque.fases()))
+"""
+
+def _importtime(stderr: str) -> list[tuple[str, int, int]]:
+    # "import time: self [us] | cumulative | imported package"
+    modulos = []
+    for linea in stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        modulos.append((nombre.strip(), int(propio), int(acumulado)))
+    return modulos
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="Módulos más lentos a mostrar")
+    args = parser.parse_args()
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _SCRIPT],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        sys.exit(proc.returncode)
+
+    fases = json.loads(proc.stdout)
+    modulos = _importtime(proc.stderr)
+
+    print(f"arranque total {sum(fases.values()) * 1000:.0f} ms")
+    for fase, segundos in fases.items():
+        print(f"  {fase:<10} {segundos * 1000:8.1f} ms")
+
+    # La suma del tiempo propio por paquete raíz reparte el total sin contar doble
+    por_paquete: dict[str, int] = defaultdict(int)
+    for nombre, propio, _ in modulos:
+        por_paquete[nombre.split(".")[0]] += propio
+    total = sum(por_paquete.values())
+    print(f"\nimports por paquete (total {total / 1000:.0f} ms)")
+    for paquete, us in sorted(por_paquete.items(), key=lambda x: -x[1])[:args.top]:
+        print(f"  {paquete:<28} {us / 1000:8.1f} ms  {us / total:6.1%}")
+
+    print("\nmódulos más lentos (tiempo propio)")
+    for nombre, propio, acumulado in sorted(modulos, key=lambda m: -m[1])[:args.top]:
+        print(f"  {nombre:<48} {propio / 1000:8.1f} ms  (acumulado {acumulado / 1000:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
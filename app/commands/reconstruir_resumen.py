@@ -0,0 +1,27 @@
+"""Reconstruye ventas_resumen desde pedidos (backfill).
+
+    python -m app.commands.reconstruir_resumen              # todas las jornadas
+    python -m app.commands.reconstruir_resumen --jornada ID
+"""
+import argparse
+
+from app.database import SessionLocal
+from app.esquema import migrar
+from app.services.reportes_service import reconstruir_resumen
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye el rollup de ventas")
+    parser.add_argument("--jornada", help="Solo esta jornada")
+    args = parser.parse_args()
+
+    migrar()
+    db = SessionLocal()
+    try:
+        filas = reconstruir_resumen(db, args.jornada)
+        db.commit()
+    finally:
+        db.close()
+    print(f"ventas_resumen: {filas} filas reconstruidas")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import gzip
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # opcional: sin el paquete solo se ofrece gzip
+    brotli = None
+
+from app import metrics
+
+# Compresión de respuestas JSON/CSV grandes según Accept-Encoding (br si está el paquete
+# brotli, si no gzip). Solo respuestas con Content-Length: las StreamingResponse (export,
+# stream SSE) pasan intactas, comprimirlas obligaría a bufferizarlas.
+
+COMPRIMIBLES = ("application/json", "application/x-ndjson", "text/")
+NIVEL_GZIP = 6
+CALIDAD_BROTLI = 4  # rápida; las respuestas son chicas y esto corre en el event loop
+
+COMPRESION_BYTES = metrics.Contador("http_compresion_bytes_total", "Bytes de respuestas comprimidas, antes y después")
+
+def _aceptadas(accept_encoding: str) -> dict[str, float]:
+    salida = {}
+    for parte in accept_encoding.split(","):
+        nombre, _, params = parte.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if nombre:
+            salida[nombre.strip().lower()] = q
+    return salida
+
+def negociar(accept_encoding: str | None) -> str | None:
+    if not accept_encoding:
+        return None
+    aceptadas = _aceptadas(accept_encoding)
+    if brotli is not None and aceptadas.get("br", 0) > 0:
+        return "br"
+    if aceptadas.get("gzip", aceptadas.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+def comprimir(cuerpo: bytes, codificacion: str) -> bytes:
+    if codificacion == "br":
+        return brotli.compress(cuerpo, quality=CALIDAD_BROTLI)
+    return gzip.compress(cuerpo, compresslevel=NIVEL_GZIP, mtime=0)
+
+class CompresionMiddleware:
+    # ASGI puro como MedicionMiddleware
+    def __init__(self, app, minimo: int):
+        self.app = app
+        self.minimo = minimo
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codificacion = negociar(Headers(scope=scope).get("accept-encoding"))
+        estado = {"inicio": None, "partes": []}
+
+        async def send_comprimido(message):
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                largo = headers.get("content-length")
+                if (
+                    largo is None or int(largo) < self.minimo
+                    or "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith(COMPRIMIBLES)
+                ):
+                    await send(message)
+                    return
+                MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                if codificacion is None:
+                    await send(message)
+                    return
+                estado["inicio"] = message
+                return
+
+            if message["type"] == "http.response.body" and estado["inicio"] is not None:
+                estado["partes"].append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+                cuerpo = b"".join(estado["partes"])
+                comprimido = comprimir(cuerpo, codificacion)
+                COMPRESION_BYTES.inc(len(cuerpo), codificacion=codificacion, etapa="original")
+                COMPRESION_BYTES.inc(len(comprimido), codificacion=codificacion, etapa="comprimido")
+                inicio = estado["inicio"]
+                headers = MutableHeaders(raw=inicio["headers"])
+                headers["content-encoding"] = codificacion
+                headers["content-length"] = str(len(comprimido))
+                await send(inicio)
+                await send({"type": "http.response.body", "body": comprimido})
+                return
+
+            await send(message)
+
+        await self.app(scope, receive, send_comprimido)
@@ -3,6 +3,114 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     DATABASE_URL: str
 
+    # "sync": psycopg2 + threadpool (como siempre). "async": AsyncEngine con asyncpg,
+    # los endpoints ya no ocupan un hilo mientras esperan a la BD.
+    DB_MODE: str = "sync"
+    # Opcional: URL explícita para el modo async (si no, se deriva de DATABASE_URL)
+    DATABASE_ASYNC_URL: str | None = None
+
+    # Réplica de solo lectura (opcional) para listados, dashboards y reportes, con su propio
+    # pool. Un cliente (header X-Client-Id) que acaba de escribir lee de la primaria durante
+    # DB_LECTURA_PRIMARIA_TRAS_ESCRITURA segundos; si la réplica no responde se usa la
+    # primaria y no se vuelve a probar hasta pasados DB_REPLICA_REINTENTO segundos.
+    DATABASE_READ_URL: str | None = None
+    DATABASE_READ_ASYNC_URL: str | None = None
+    DB_LECTURA_PRIMARIA_TRAS_ESCRITURA: float = 5.0
+    DB_REPLICA_REINTENTO: float = 30.0
+
+    # Pool de conexiones
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0           # segundos esperando una conexión libre
+    DB_POOL_RECYCLE: int = 1800             # reciclar conexiones más viejas que esto (segundos)
+    DB_POOL_LIFO: bool = True               # LIFO deja enfriar las conexiones sobrantes
+    # "always": SELECT 1 en cada checkout; "stale": solo si la conexión estuvo ociosa más de
+    # DB_PRE_PING_IDLE_SECONDS; "never": sin ping
+    DB_PRE_PING: str = "stale"
+    DB_PRE_PING_IDLE_SECONDS: float = 60.0
+    # Supabase pooler / PgBouncer en modo transacción: sin prepared statements del lado servidor
+    DB_PGBOUNCER: bool = False
+    # Sin pool propio (cada request abre/cierra); útil detrás de PgBouncer
+    DB_NULLPOOL: bool = False
+
+    # Esquema al arrancar: "verificar" compara alembic_version con la última migración
+    # (una consulta) y solo migra si no coinciden; "migrar" corre siempre upgrade head;
+    # "nada" no toca el esquema (migraciones en el paso de release).
+    DB_ESQUEMA_AL_INICIAR: str = "verificar"
+    # Conexiones que se abren al arrancar para que el primer request no pague el connect/TLS
+    DB_POOL_PREWARM: int = 2
+
+    # Control de admisión (app/admision.py): a lo sumo ADMISION_LIMITE requests en curso por
+    # worker (default DB_POOL_SIZE + DB_MAX_OVERFLOW), de esos ADMISION_LECTURAS listados,
+    # dashboards y reportes (default la mitad). El resto espera por prioridad (crear pedidos
+    # primero) hasta ADMISION_ESPERA segundos, con ADMISION_COLA lugares por clase; si no
+    # entra, 503 + Retry-After. Escrituras con X-Client-Id: ADMISION_TASA por segundo por
+    # dispositivo con ráfagas de ADMISION_RAFAGA (0 = sin límite), si no 429.
+    ADMISION: bool = True
+    ADMISION_LIMITE: int | None = None
+    ADMISION_LECTURAS: int | None = None
+    ADMISION_COLA: int = 100
+    ADMISION_ESPERA: float = 5.0
+    ADMISION_TASA: float = 10.0
+    ADMISION_RAFAGA: int = 30
+
+    # Respuestas JSON/CSV de al menos COMPRESION_MIN_BYTES se comprimen con br (paquete
+    # brotli, opcional) o gzip según Accept-Encoding
+    COMPRESION: bool = True
+    COMPRESION_MIN_BYTES: int = 1024
+
+    # Sentencias SQL más lentas que esto (ms) se registran en el log "app.sql"
+    SLOW_QUERY_MS: float = 200.0
+
+    # Caché de catálogo, jornada activa y dashboards (app/cache.py): "memoria" (por worker),
+    # "sqlite" (archivo compartido por los workers del host) o "redis" (CACHE_REDIS_URL)
+    CACHE_BACKEND: str = "memoria"
+    CACHE_MEMORIA_MAX: int = 1000
+    CACHE_SQLITE_PATH: str = "cache_sopas.db"
+    CACHE_REDIS_URL: str | None = None
+
+    # Segundos que vive el catálogo en caché; con backend "memoria" acota cuánto tarda un
+    # cambio de precio en verse en los demás workers.
+    CATALOGO_CACHE_TTL: float = 30.0
+
+    # Segundos que se reutiliza la jornada activa sin consultarla
+    JORNADA_CACHE_TTL: float = 5.0
+
+    # Segundos que se reutiliza el dashboard de una jornada (cada escritura de pedidos lo invalida)
+    DASHBOARD_CACHE_TTL: float = 10.0
+
+    # client_request_id -> id de pedidos creados hace poco, por worker: un reintento del
+    # celular se contesta con una lectura por PK en vez de validar e insertar de nuevo
+    IDEMPOTENCIA_CACHE_MAX: int = 10000
+    IDEMPOTENCIA_CACHE_TTL: float = 900.0
+    # Un reintento de un pedido ya archivado se detecta si su jornada es de los últimos N
+    # días; más atrás se crearía de nuevo (acota las particiones que mira cada alta)
+    IDEMPOTENCIA_ARCHIVO_DIAS: int = 60
+
+    # GET /pedidos/stream: eventos que guarda cada worker para reanudar con Last-Event-ID,
+    # eventos en cola por cliente antes de cortarlo, y cada cuánto se manda un ping
+    EVENTOS_BUFFER: int = 1000
+    EVENTOS_COLA: int = 1000
+    EVENTOS_HEARTBEAT: float = 15.0
+    # Repartir los eventos entre workers/instancias con LISTEN/NOTIFY (solo Postgres,
+    # necesita conexión directa o pooler en modo sesión: LISTEN no funciona en modo transacción)
+    EVENTOS_PG_NOTIFY: bool = False
+
+    # POST /pedidos: "directa" confirma en la BD antes de responder (201). "cola" valida,
+    # guarda el pedido en una cola SQLite local (WAL) y responde 202 al instante; un worker
+    # la vuelca a la BD en lotes de INGESTA_LOTE cada INGESTA_INTERVALO segundos.
+    PEDIDOS_INGESTA: str = "directa"
+    INGESTA_COLA_PATH: str = "ingesta_pedidos.db"
+    INGESTA_LOTE: int = 200
+    INGESTA_INTERVALO: float = 0.5
+
+    # Pedidos de jornadas cerradas hace más de ARCHIVO_RETENCION_DIAS pasan a pedidos_archivo
+    # (particionada por mes en Postgres); los soft deletes más viejos que PURGA_BORRADOS_DIAS
+    # se borran de verdad. Con ARCHIVO_AL_CERRAR corre al cerrar cada jornada, en segundo plano.
+    ARCHIVO_RETENCION_DIAS: int = 7
+    PURGA_BORRADOS_DIAS: int = 30
+    ARCHIVO_AL_CERRAR: bool = True
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 settings = Settings()
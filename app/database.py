@@ -1,16 +1,276 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import asyncio
+import time
+import uuid
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker, DeclarativeBase, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from fastapi import Depends
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
 from app.config import settings
+from app import metrics
+from app.cache import cache
+from app.instrumentacion import instrumentar_engine
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+POOL_CHECKOUT_ESPERA = metrics.Histograma(
+    "db_pool_checkout_wait_seconds", "Tiempo esperando una conexión libre del pool"
+)
+_pools: dict = {}
+
+def _estado_pools():
+    for nombre, pool in list(_pools.items()):
+        if isinstance(pool, NullPool):
+            continue
+        yield {"pool": nombre, "estado": "en_uso"}, pool.checkedout()
+        yield {"pool": nombre, "estado": "libres"}, pool.checkedin()
+        yield {"pool": nombre, "estado": "overflow"}, max(pool.overflow(), 0)
+
+metrics.Gauge("db_pool_connections", "Conexiones del pool por estado", funcion=_estado_pools)
+
+def _pool_medido(base):
+    # Mide cuánto espera cada checkout (incluye abrir la conexión si hace falta)
+    class PoolMedido(base):
+        nombre = "primaria"
+
+        def _do_get(self):
+            t0 = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                POOL_CHECKOUT_ESPERA.observe(time.perf_counter() - t0, pool=self.nombre)
+
+    PoolMedido.__name__ = f"Medido{base.__name__}"
+    return PoolMedido
+
+def _ping_si_ociosa(sync_engine):
+    # Alternativa a pool_pre_ping: solo se prueba la conexión si estuvo ociosa un rato,
+    # en vez de pagar un SELECT 1 (un round-trip a Supabase) en cada request.
+    @event.listens_for(sync_engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        connection_record.info["devuelta_en"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        devuelta_en = connection_record.info.get("devuelta_en")
+        if devuelta_en is None or time.monotonic() - devuelta_en < settings.DB_PRE_PING_IDLE_SECONDS:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception as e:
+            # El pool descarta esta conexión y reintenta con una nueva
+            raise exc.DisconnectionError() from e
+        finally:
+            cursor.close()
+
+def crear_engine(url: str, nombre: str = "primaria", asincrono: bool = False):
+    kwargs: dict = {"pool_pre_ping": settings.DB_PRE_PING == "always"}
+    connect_args: dict = {}
+
+    if settings.DB_NULLPOOL:
+        kwargs["poolclass"] = NullPool
+    else:
+        pool = _pool_medido(AsyncAdaptedQueuePool if asincrono else QueuePool)
+        pool.nombre = nombre
+        kwargs.update(
+            poolclass=pool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_use_lifo=settings.DB_POOL_LIFO,
+        )
+
+    if settings.DB_PGBOUNCER and asincrono and make_url(url).get_backend_name() == "postgresql":
+        # asyncpg prepara cada sentencia en el servidor; en modo transacción la siguiente
+        # sentencia puede caer en otro backend, así que se desactiva la caché y se usan
+        # nombres únicos. psycopg2 no usa prepared statements, no necesita cambios.
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid.uuid4()}__",
+        )
+    if connect_args:
+        kwargs["connect_args"] = connect_args
+
+    eng = create_async_engine(url, **kwargs) if asincrono else create_engine(url, **kwargs)
+    sync_engine = eng.sync_engine if asincrono else eng
+    if settings.DB_PRE_PING == "stale":
+        _ping_si_ociosa(sync_engine)
+    instrumentar_engine(sync_engine)
+    _pools[nombre if not asincrono else f"{nombre}_async"] = sync_engine.pool
+    return eng
+
+engine = crear_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 class Base(DeclarativeBase):
     pass
 
-def get_db():
+def async_url(url: str) -> str:
+    # postgresql(+psycopg2) -> postgresql+asyncpg, sqlite -> sqlite+aiosqlite
+    u = make_url(url)
+    if u.get_backend_name() == "sqlite":
+        return u.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    query = dict(u.query)
+    # asyncpg no entiende sslmode; usa ssl
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    return u.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_MODE == "async":
+    async_engine = crear_engine(settings.DATABASE_ASYNC_URL or async_url(settings.DATABASE_URL), asincrono=True)
+    # expire_on_commit=False: los objetos devueltos se serializan fuera del greenlet
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, autocommit=False, expire_on_commit=False
+    )
+
+# ---------- réplica de lectura ----------
+# Sin DATABASE_READ_URL las sesiones de lectura son de la primaria, como siempre.
+
+read_engine = None
+ReadSessionLocal = SessionLocal
+if settings.DATABASE_READ_URL:
+    read_engine = crear_engine(settings.DATABASE_READ_URL, nombre="replica")
+    ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False)
+
+async_read_engine = None
+AsyncReadSessionLocal = AsyncSessionLocal
+if settings.DB_MODE == "async" and settings.DATABASE_READ_URL:
+    async_read_engine = crear_engine(
+        settings.DATABASE_READ_ASYNC_URL or async_url(settings.DATABASE_READ_URL), nombre="replica", asincrono=True
+    )
+    AsyncReadSessionLocal = async_sessionmaker(
+        bind=async_read_engine, autoflush=False, autocommit=False, expire_on_commit=False
+    )
+
+LECTURAS = metrics.Contador("db_lecturas_total", "Sesiones de lectura por destino (réplica o primaria y por qué)")
+_replica = {"caida_hasta": 0.0}
+
+def _cliente(request: Request) -> str | None:
+    return request.headers.get("x-client-id")
+
+def _destino_lectura(request: Request) -> str:
+    # replica | primaria_fijada (el cliente escribió hace poco) | primaria_caida
+    cliente = _cliente(request)
+    if cliente and cache.get(f"escritura:{cliente}"):
+        return "primaria_fijada"
+    if time.monotonic() < _replica["caida_hasta"]:
+        return "primaria_caida"
+    return "replica"
+
+def _replica_no_responde():
+    _replica["caida_hasta"] = time.monotonic() + settings.DB_REPLICA_REINTENTO
+
+@event.listens_for(Session, "after_commit")
+def _fijar_cliente(session: Session):
+    # Read-your-writes: tras un commit, ese cliente lee de la primaria por un rato.
+    # Va a la caché para que lo vean todos los workers si el backend es compartido.
+    cliente = session.info.get("client_id")
+    if cliente and read_engine is not None:
+        cache.set(f"escritura:{cliente}", True, settings.DB_LECTURA_PRIMARIA_TRAS_ESCRITURA)
+
+def get_sync_db(request: Request):
     db = SessionLocal()
+    db.info["client_id"] = _cliente(request)
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db(request: Request):
+    async with AsyncSessionLocal() as db:
+        db.info["client_id"] = _cliente(request)
+        yield db
+
+# Las sesiones de lectura dependen de la de get_db, que FastAPI resuelve una vez por
+# request: sin réplica (o si no corresponde usarla) se devuelve esa misma sesión, así
+# un endpoint que pide las dos ocupa una sola conexión del pool y el límite de admisión
+# (DB_POOL_SIZE + DB_MAX_OVERFLOW) sigue siendo una conexión por request. La sesión no
+# pide conexión hasta la primera consulta: si se usa la réplica, la primaria no ocupa nada.
+
+def get_sync_read_db(request: Request, db: Session = Depends(get_sync_db)):
+    destino = _destino_lectura(request) if read_engine is not None else "primaria"
+    if destino == "replica":
+        lectura = ReadSessionLocal()
+        # La conexión se pide ya: si la réplica no responde se usa la primaria en este
+        # mismo request en vez de fallar a mitad del servicio
+        try:
+            lectura.connection()
+        except exc.DBAPIError:
+            lectura.close()
+            _replica_no_responde()
+            destino = "primaria_caida"
+    LECTURAS.inc(destino=destino)
+    if destino != "replica":
+        yield db
+        return
+    try:
+        yield lectura
+    finally:
+        lectura.close()
+
+async def get_async_read_db(request: Request, db: AsyncSession = Depends(get_async_db)):
+    destino = _destino_lectura(request) if async_read_engine is not None else "primaria"
+    if destino == "replica":
+        lectura = AsyncReadSessionLocal()
+        try:
+            await lectura.connection()
+        except exc.DBAPIError:
+            await lectura.close()
+            _replica_no_responde()
+            destino = "primaria_caida"
+    LECTURAS.inc(destino=destino)
+    if destino != "replica":
+        yield db
+        return
+    async with lectura:
+        yield lectura
+
+get_db = get_async_db if settings.DB_MODE == "async" else get_sync_db
+# Para endpoints de solo lectura (listados, dashboard, reportes): réplica si hay
+get_read_db = get_async_read_db if settings.DB_MODE == "async" else get_sync_read_db
+
+async def run_db(db, fn, *args, **kwargs):
+    # Ejecuta un servicio (escrito contra Session) sin bloquear el event loop:
+    # en modo async sobre la conexión asyncpg vía run_sync, en modo sync en el threadpool.
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+async def precalentar_pool(n: int) -> int:
+    # Abre n conexiones en paralelo y las devuelve al pool: el primer request ya no
+    # paga connect + TLS + auth contra Supabase. Devuelve cuántas abrió.
+    n = min(n, settings.DB_POOL_SIZE)
+    if n <= 0 or settings.DB_NULLPOOL:
+        return 0
+    if async_engine is not None:
+        conexiones = await asyncio.gather(*(async_engine.connect().start() for _ in range(n)))
+        for c in conexiones:
+            await c.close()
+    else:
+        conexiones = await asyncio.gather(*(run_in_threadpool(engine.connect) for _ in range(n)))
+        for c in conexiones:
+            c.close()
+    return n
+
+async def cerrar_pools():
+    # Al apagar: las conexiones async (asyncpg/aiosqlite) tienen que cerrarse antes que el loop
+    for eng in (async_engine, async_read_engine):
+        if eng is not None:
+            await eng.dispose()
+    engine.dispose()
+    if read_engine is not None:
+        read_engine.dispose()
+
+def insert_on_conflict(db: Session, model):
+    # INSERT ... ON CONFLICT del dialecto en uso (Postgres en prod, SQLite en local)
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model)
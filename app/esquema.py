@@ -0,0 +1,68 @@
+from pathlib import Path
+
+from sqlalchemy import exc, inspect, text
+
+from app.database import Base, engine
+from app.models import jornada, pedido, pedido_archivo, tipo_sopa, venta_resumen  # noqa: F401
+
+# El esquema lo manejan las migraciones de migrations/ (alembic); esto es lo que
+# usan el arranque de la app, los comandos y los benchmarks. alembic se importa
+# solo cuando hay que migrar: cuesta cientos de ms en un arranque en frío.
+
+RAIZ = Path(__file__).resolve().parent.parent
+VERSIONES = RAIZ / "migrations" / "versions"
+# Revisión que corresponde a lo que creaba create_all antes de tener migraciones
+BASELINE = "0001"
+
+def _config():
+    from alembic.config import Config
+
+    cfg = Config(str(RAIZ / "alembic.ini"))
+    cfg.attributes["desde_app"] = True
+    return cfg
+
+def head_local() -> str | None:
+    # Las revisiones se numeran en orden (0001_, 0002_, ...): la mayor es head.
+    # None si hay alguna con otro formato; entonces se deja decidir a alembic.
+    revisiones = [p.name.split("_", 1)[0] for p in VERSIONES.glob("*.py")]
+    if not revisiones or not all(r.isdigit() for r in revisiones):
+        return None
+    return max(revisiones)
+
+def version_actual() -> str | None:
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except exc.DBAPIError:
+        # Sin tabla alembic_version (BD nueva o creada con create_all)
+        return None
+
+def migrar():
+    # Lleva la BD a head. Una BD creada con create_all (sin alembic_version) se
+    # marca primero como BASELINE para que solo se apliquen los cambios nuevos.
+    from alembic import command
+
+    with engine.connect() as conn:
+        tablas = set(inspect(conn).get_table_names())
+    cfg = _config()
+    if "pedidos" in tablas and "alembic_version" not in tablas:
+        command.stamp(cfg, BASELINE)
+    command.upgrade(cfg, "head")
+
+def preparar_esquema(modo: str) -> str:
+    # Devuelve lo que hizo: "al_dia", "migrado" u "omitido"
+    if modo == "nada":
+        return "omitido"
+    if modo == "verificar":
+        head = head_local()
+        if head is not None and version_actual() == head:
+            return "al_dia"
+    migrar()
+    return "migrado"
+
+def crear_todo():
+    # BD desechables (benchmarks, pruebas): create_all directo y marcar head
+    from alembic import command
+
+    Base.metadata.create_all(bind=engine)
+    command.stamp(_config(), "head")
@@ -0,0 +1,39 @@
+import hashlib
+
+import orjson
+from fastapi import Request
+
+def _opaco(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+def etag_coincide(request: Request, etag: str) -> bool:
+    # If-None-Match usa comparación débil: W/"x" y "x" coinciden
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidatos = {_opaco(c.strip()) for c in header.split(",")}
+    return "*" in candidatos or _opaco(etag) in candidatos
+
+def etag_marca(*partes) -> str:
+    # ETag débil de una colección o de un cálculo: hash de su marca de agua (o de su
+    # contenido) más lo que cambie la respuesta en la misma URL (query string).
+    # Débil porque el mismo recurso puede viajar comprimido o no.
+    datos = orjson.dumps(partes, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS, default=str)
+    return f'W/"{hashlib.blake2b(datos, digest_size=12).hexdigest()}"'
+
+def etag_version(version: int) -> str:
+    # ETag fuerte: la URL ya identifica el recurso, la versión de la fila basta
+    return f'"{version}"'
+
+def versiones_if_match(header: str | None) -> set[int] | None:
+    # None = sin condición (no vino If-Match, o vino "*": basta con que exista).
+    # If-Match usa comparación fuerte: etags débiles o mal formados nunca coinciden,
+    # así que un set vacío termina en 412.
+    if not header or header.strip() == "*":
+        return None
+    versiones = set()
+    for tag in header.split(","):
+        tag = tag.strip()
+        if len(tag) > 2 and tag[0] == tag[-1] == '"' and tag[1:-1].isdigit():
+            versiones.add(int(tag[1:-1]))
+    return versiones
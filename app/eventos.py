@@ -0,0 +1,234 @@
+import asyncio
+import itertools
+import logging
+import threading
+import uuid
+from collections import deque
+from dataclasses import dataclass
+
+import orjson
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app import metrics
+from app.config import settings
+from app.schemas.pedido import CAMPOS_PEDIDO_OUT
+
+# Hub de eventos de pedidos para GET /pedidos/stream (SSE).
+#
+# Los servicios llaman emitir(db, ...) antes del commit. Los eventos quedan en
+# db.info y se publican en after_commit (un rollback los descarta). Con
+# EVENTOS_PG_NOTIFY en Postgres, en vez de publicarse localmente viajan como
+# pg_notify dentro de la misma transacción y cada worker los recibe por LISTEN.
+# Un pedido que no entra en un NOTIFY (notas o direcciones largas) viaja solo como
+# referencia y el listener lee la fila antes de publicarlo.
+
+logger = logging.getLogger("app.eventos")
+
+CANAL_PG = "pedidos_eventos"
+# pg_notify acepta hasta 8000 bytes por payload: los cierres se parten en lotes
+IDS_POR_EVENTO = 100
+MAX_PAYLOAD_PG = 7999
+
+SQL_PEDIDO = f"SELECT {', '.join(CAMPOS_PEDIDO_OUT)} FROM pedidos WHERE id = $1"
+
+EVENTOS_PUBLICADOS = metrics.Contador("eventos_publicados_total", "Eventos de pedidos publicados por tipo")
+
+@dataclass(frozen=True)
+class Evento:
+    id: str
+    tipo: str
+    frame: bytes        # ya formateado para SSE: se codifica una vez por evento, no por cliente
+
+class Suscriptor:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=settings.EVENTOS_COLA)
+        # Si el cliente no da abasto se corta el stream; al reconectar con
+        # Last-Event-ID recupera lo que falte desde el buffer.
+        self.desbordado = False
+
+    def _entregar(self, evento: Evento):
+        if self.desbordado:
+            return
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            self.desbordado = True
+
+_lock = threading.Lock()
+_buffer: deque[Evento] = deque(maxlen=settings.EVENTOS_BUFFER)
+_suscriptores: set[Suscriptor] = set()
+_worker = uuid.uuid4().hex[:8]
+_secuencia = itertools.count(1)
+
+metrics.Gauge(
+    "sse_clientes", "Clientes conectados a /pedidos/stream",
+    funcion=lambda: [({}, len(_suscriptores))],
+)
+
+def _frame(id_: str, tipo: str, datos: bytes) -> bytes:
+    return b"id: " + id_.encode() + b"\nevent: " + tipo.encode() + b"\ndata: " + datos + b"\n\n"
+
+def _nuevo_evento(tipo: str, datos: dict) -> dict:
+    # El id lo pone el worker que emite: así es el mismo en todos los workers
+    # y Last-Event-ID sirve aunque el cliente reconecte a otro.
+    return {"id": f"{_worker}-{next(_secuencia)}", "tipo": tipo, "datos": datos}
+
+def publicar(mensaje: dict):
+    datos = orjson.dumps(mensaje["datos"], option=orjson.OPT_UTC_Z)
+    evento = Evento(mensaje["id"], mensaje["tipo"], _frame(mensaje["id"], mensaje["tipo"], datos))
+    with _lock:
+        _buffer.append(evento)
+        suscriptores = list(_suscriptores)
+    EVENTOS_PUBLICADOS.inc(tipo=evento.tipo)
+    for s in suscriptores:
+        # Se publica desde el threadpool, desde run_sync o desde el listener de Postgres
+        s.loop.call_soon_threadsafe(s._entregar, evento)
+
+def _usar_pg_notify(db: Session) -> bool:
+    return settings.EVENTOS_PG_NOTIFY and db.get_bind().dialect.name == "postgresql"
+
+def emitir(db: Session, tipo: str, datos: dict, referencia: dict | None = None):
+    # referencia: lo mínimo para releer `datos` de la BD si no entran en un NOTIFY
+    mensaje = _nuevo_evento(tipo, datos)
+    if _usar_pg_notify(db):
+        # NOTIFY se entrega al confirmar la transacción, a todos los workers (este incluido).
+        # Un payload de más hace fallar el pg_notify y con él la escritura del pedido.
+        payload = orjson.dumps(mensaje, option=orjson.OPT_UTC_Z)
+        if len(payload) > MAX_PAYLOAD_PG and referencia is not None:
+            payload = orjson.dumps({**mensaje, "datos": None, "ref": referencia})
+        db.execute(select(func.pg_notify(CANAL_PG, payload.decode())))
+        return
+    db.info.setdefault("eventos_pendientes", []).append(mensaje)
+
+def emitir_pedido(db: Session, tipo: str, pedido, campos: tuple[str, ...]):
+    # pedido puede ser un Pedido o una fila de RETURNING con esas columnas
+    emitir(db, tipo, {c: getattr(pedido, c) for c in campos},
+           referencia={"pedido_id": pedido.id, "version": pedido.version})
+
+def emitir_cancelados(db: Session, jornada_id: str, ids: list[str]):
+    for i in range(0, len(ids), IDS_POR_EVENTO):
+        emitir(db, "cancelado", {"jornada_id": jornada_id, "ids": ids[i:i + IDS_POR_EVENTO]})
+
+@event.listens_for(Session, "after_commit")
+def _publicar_pendientes(session: Session):
+    for mensaje in session.info.pop("eventos_pendientes", ()):
+        publicar(mensaje)
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendientes(session: Session):
+    session.info.pop("eventos_pendientes", None)
+
+def suscribir(ultimo_id: str | None) -> tuple[Suscriptor, list[Evento] | None]:
+    # Devuelve el suscriptor y lo que hay que reenviar después de ultimo_id.
+    # None = ese id ya salió del buffer (o es de antes de un reinicio): el cliente debe recargar.
+    suscriptor = Suscriptor(asyncio.get_running_loop())
+    with _lock:
+        _suscriptores.add(suscriptor)
+        if not ultimo_id:
+            return suscriptor, []
+        eventos = list(_buffer)
+    for i, e in enumerate(eventos):
+        if e.id == ultimo_id:
+            return suscriptor, eventos[i + 1:]
+    return suscriptor, None
+
+def desuscribir(suscriptor: Suscriptor):
+    with _lock:
+        _suscriptores.discard(suscriptor)
+
+async def stream_eventos(ultimo_id: str | None):
+    suscriptor, pendientes = suscribir(ultimo_id)
+    try:
+        yield b"retry: 3000\n\n"
+        if pendientes is None:
+            yield _frame(_nuevo_evento("resync", {})["id"], "resync", b"{}")
+        else:
+            for e in pendientes:
+                yield e.frame
+        while not (suscriptor.desbordado and suscriptor.cola.empty()):
+            try:
+                evento = await asyncio.wait_for(suscriptor.cola.get(), settings.EVENTOS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield b": ping\n\n"
+                continue
+            yield evento.frame
+    finally:
+        desuscribir(suscriptor)
+
+# ---------- LISTEN/NOTIFY entre workers ----------
+
+def _dsn_listen() -> str:
+    u = make_url(settings.DATABASE_URL)
+    return u.set(drivername="postgresql").render_as_string(hide_password=False)
+
+async def _cargar_pedido(conn, ref: dict) -> dict:
+    fila = await conn.fetchrow(SQL_PEDIDO, ref["pedido_id"])
+    # Ya no está en pedidos (archivado): va la referencia y la tablet lo pide por GET
+    return dict(fila) if fila is not None else {"id": ref["pedido_id"], "version": ref["version"]}
+
+async def _recibir(conn, payload: str):
+    try:
+        mensaje = orjson.loads(payload)
+        if mensaje.get("ref") is not None:
+            mensaje["datos"] = await _cargar_pedido(conn, mensaje.pop("ref"))
+        publicar(mensaje)
+    except (orjson.JSONDecodeError, KeyError, TypeError):
+        logger.warning("payload de %s inválido: %.200s", CANAL_PG, payload)
+
+async def _escuchar_postgres():
+    import asyncpg
+
+    reconexion = False
+    while True:
+        try:
+            conn = await asyncpg.connect(_dsn_listen())
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("LISTEN %s: no se pudo conectar, reintento en 5s", CANAL_PG, exc_info=True)
+            await asyncio.sleep(5)
+            continue
+        # Las notificaciones se procesan de a una y en orden: las que son referencias
+        # consultan la BD por esta misma conexión, que no admite dos operaciones a la vez
+        recibidos: asyncio.Queue[str] = asyncio.Queue()
+        try:
+            await conn.add_listener(CANAL_PG, lambda _conn, _pid, _canal, payload: recibidos.put_nowait(payload))
+            if reconexion:
+                # Lo notificado mientras estuvo caída se perdió: que los clientes recarguen
+                publicar(_nuevo_evento("resync", {}))
+            reconexion = True
+            while True:
+                try:
+                    payload = await asyncio.wait_for(recibidos.get(), 30)
+                except asyncio.TimeoutError:
+                    # Una conexión ociosa caída no avisa: se prueba cada tanto
+                    await conn.execute("SELECT 1")
+                    continue
+                await _recibir(conn, payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("LISTEN %s: conexión perdida", CANAL_PG, exc_info=True)
+        finally:
+            await conn.close()
+
+_tarea_listen: asyncio.Task | None = None
+
+def iniciar_listener():
+    global _tarea_listen
+    if settings.EVENTOS_PG_NOTIFY and make_url(settings.DATABASE_URL).get_backend_name() == "postgresql":
+        _tarea_listen = asyncio.get_running_loop().create_task(_escuchar_postgres())
+
+async def detener_listener():
+    global _tarea_listen
+    if _tarea_listen is not None:
+        _tarea_listen.cancel()
+        try:
+            await _tarea_listen
+        except asyncio.CancelledError:
+            pass
+        _tarea_listen = None
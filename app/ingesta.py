@@ -0,0 +1,309 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import orjson
+from sqlalchemy import exc
+
+from app import metrics
+from app.config import settings
+
+# Cola de ingesta para POST /pedidos con PEDIDOS_INGESTA=cola.
+#
+# El endpoint valida y calcula el pedido (preparar_pedido), lo guarda en una cola
+# SQLite local en modo WAL y responde 202. Un worker en segundo plano lo vuelca a la
+# BD en lotes con el mismo INSERT ... ON CONFLICT DO NOTHING de /pedidos/batch.
+#
+# Idempotencia por client_request_id en cuatro niveles: UNIQUE en la cola, tabla de
+# procesados (un reintento después del volcado recibe el id real), una búsqueda en la
+# BD antes de encolar (pedidos creados antes de activar la cola, hace más de
+# RETENCION_PROCESADOS o desde otro host) y ON CONFLICT al volcar (si el proceso muere
+# entre el commit y el borrado local, el lote se repite sin duplicar). Varios workers
+# de uvicorn pueden compartir el archivo: cada lote se toma con una marca de tiempo y
+# otro worker lo retoma si queda huérfano.
+
+logger = logging.getLogger("app.ingesta")
+
+# Un lote tomado por un proceso que murió se vuelve a tomar pasado esto (segundos)
+RECLAMO = 60.0
+# Cuánto se recuerdan los client_request_id ya volcados (un reintento del mismo día)
+RETENCION_PROCESADOS = 24 * 3600
+# Tope del backoff cuando la BD no responde
+MAX_ESPERA = 30.0
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS cola (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_request_id TEXT NOT NULL UNIQUE,
+    pedido_id TEXT NOT NULL,
+    fila BLOB NOT NULL,
+    recibido_en REAL NOT NULL,
+    tomado_en REAL
+);
+CREATE TABLE IF NOT EXISTS procesados (
+    client_request_id TEXT PRIMARY KEY,
+    pedido_id TEXT NOT NULL,
+    procesado_en REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rechazados (
+    client_request_id TEXT PRIMARY KEY,
+    fila BLOB NOT NULL,
+    error TEXT,
+    rechazado_en REAL NOT NULL
+);
+"""
+
+_FECHAS = ("created_at", "updated_at")
+
+def _decodificar(blob: bytes) -> dict:
+    fila = orjson.loads(blob)
+    for campo in _FECHAS:
+        fila[campo] = datetime.fromisoformat(fila[campo])
+    return fila
+
+class ColaLocal:
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    @contextmanager
+    def _transaccion(self):
+        with self._lock:
+            if self._conn is None:
+                conn = sqlite3.connect(self.ruta, timeout=30, isolation_level=None, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                # FULL: el 202 sale recién cuando el pedido está en disco
+                conn.execute("PRAGMA synchronous=FULL")
+                conn.executescript(_ESQUEMA)
+                self._conn = conn
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _previo(db: sqlite3.Connection, crid: str) -> str | None:
+        fila = db.execute(
+            "SELECT pedido_id FROM cola WHERE client_request_id = ?"
+            " UNION ALL SELECT pedido_id FROM procesados WHERE client_request_id = ?",
+            (crid, crid),
+        ).fetchone()
+        return fila[0] if fila else None
+
+    def buscar(self, crid: str) -> str | None:
+        # pedido_id si está en la cola o se volcó desde este host hace menos de RETENCION_PROCESADOS
+        with self._transaccion() as db:
+            return self._previo(db, crid)
+
+    def encolar(self, fila: dict) -> tuple[str, str]:
+        # -> (ENCOLADO | DUPLICADO, pedido_id)
+        crid = fila["client_request_id"]
+        with self._transaccion() as db:
+            previo = self._previo(db, crid)
+            if previo:
+                return "DUPLICADO", previo
+            db.execute(
+                "INSERT INTO cola (client_request_id, pedido_id, fila, recibido_en) VALUES (?, ?, ?, ?)",
+                (crid, fila["id"], orjson.dumps(fila), time.time()),
+            )
+        return "ENCOLADO", fila["id"]
+
+    def tomar(self, n: int) -> list[tuple[int, dict]]:
+        ahora = time.time()
+        with self._transaccion() as db:
+            filas = db.execute(
+                "SELECT seq, fila FROM cola WHERE tomado_en IS NULL OR tomado_en < ? ORDER BY seq LIMIT ?",
+                (ahora - RECLAMO, n),
+            ).fetchall()
+            db.executemany("UPDATE cola SET tomado_en = ? WHERE seq = ?", [(ahora, seq) for seq, _ in filas])
+        return [(seq, _decodificar(blob)) for seq, blob in filas]
+
+    def soltar(self, seqs: list[int]):
+        with self._transaccion() as db:
+            db.executemany("UPDATE cola SET tomado_en = NULL WHERE seq = ?", [(s,) for s in seqs])
+
+    def confirmar(self, seqs: list[int], ids: dict[str, str]):
+        # Sale de la cola y queda en procesados para contestar DUPLICADO a los reintentos
+        ahora = time.time()
+        with self._transaccion() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO procesados VALUES (?, ?, ?)",
+                [(crid, pid, ahora) for crid, pid in ids.items()],
+            )
+            db.executemany("DELETE FROM cola WHERE seq = ?", [(s,) for s in seqs])
+            db.execute("DELETE FROM procesados WHERE procesado_en < ?", (ahora - RETENCION_PROCESADOS,))
+
+    def rechazar(self, seq: int, fila: dict, error: str):
+        with self._transaccion() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO rechazados VALUES (?, ?, ?, ?)",
+                (fila["client_request_id"], orjson.dumps(fila), error, time.time()),
+            )
+            db.execute("DELETE FROM cola WHERE seq = ?", (seq,))
+
+    def estado(self) -> dict:
+        with self._transaccion() as db:
+            pendientes, mas_viejo = db.execute("SELECT count(*), min(recibido_en) FROM cola").fetchone()
+            rechazados = db.execute("SELECT count(*) FROM rechazados").fetchone()[0]
+        return {
+            "pendientes": pendientes,
+            "lag_segundos": round(time.time() - mas_viejo, 3) if mas_viejo else 0.0,
+            "rechazados": rechazados,
+        }
+
+_cola: ColaLocal | None = None
+_cola_lock = threading.Lock()
+# Un solo volcado a la vez por proceso
+_volcado_lock = threading.Lock()
+_estado = {"ultimo_volcado": None, "ultimo_error": None}
+
+INGESTA_PEDIDOS = metrics.Contador("ingesta_pedidos_total", "Pedidos de la cola de ingesta por resultado")
+
+def activa() -> bool:
+    return settings.PEDIDOS_INGESTA == "cola"
+
+def cola() -> ColaLocal:
+    global _cola
+    with _cola_lock:
+        if _cola is None:
+            _cola = ColaLocal(settings.INGESTA_COLA_PATH)
+        return _cola
+
+def _en_uso() -> bool:
+    return activa() or os.path.exists(settings.INGESTA_COLA_PATH)
+
+def _gauge(clave: str):
+    return lambda: [({}, cola().estado()[clave])] if _en_uso() else []
+
+metrics.Gauge("ingesta_pendientes", "Pedidos en la cola local sin volcar", funcion=_gauge("pendientes"))
+metrics.Gauge("ingesta_lag_seconds", "Antigüedad del pedido más viejo de la cola", funcion=_gauge("lag_segundos"))
+
+def buscar(crid: str) -> str | None:
+    return cola().buscar(crid)
+
+def encolar(fila: dict) -> tuple[str, str]:
+    resultado, pedido_id = cola().encolar(fila)
+    INGESTA_PEDIDOS.inc(resultado=resultado.lower())
+    return resultado, pedido_id
+
+def duplicado(pedido_id: str) -> tuple[str, str]:
+    # Reintento de un pedido que ya está en la BD (lo encontró pedido_ya_creado)
+    INGESTA_PEDIDOS.inc(resultado="duplicado")
+    return "DUPLICADO", pedido_id
+
+def _volcar(filas: list[dict]) -> dict[str, str]:
+    from app.database import SessionLocal
+    from app.services.pedido_service import volcar_encolados
+
+    db = SessionLocal()
+    try:
+        ids, insertados = volcar_encolados(db, filas)
+    finally:
+        db.close()
+    INGESTA_PEDIDOS.inc(insertados, resultado="insertado")
+    if len(filas) > insertados:
+        INGESTA_PEDIDOS.inc(len(filas) - insertados, resultado="ya_existia")
+    return ids
+
+def _transitorio(e: exc.DBAPIError) -> bool:
+    # Conexión caída / BD no disponible: se reintenta el lote entero más tarde
+    return e.connection_invalidated or isinstance(e, (exc.OperationalError, exc.InterfaceError))
+
+def volcar_lote() -> int:
+    # Vuelca hasta INGESTA_LOTE pedidos. Devuelve cuántos salieron de la cola.
+    with _volcado_lock:
+        tomadas = cola().tomar(settings.INGESTA_LOTE)
+        if not tomadas:
+            return 0
+        seqs = [seq for seq, _ in tomadas]
+        try:
+            ids = _volcar([fila for _, fila in tomadas])
+        except exc.DBAPIError as e:
+            if _transitorio(e):
+                cola().soltar(seqs)
+                raise
+            # Una fila inválida no puede trabar la cola: se prueba de a una y la que
+            # falla pasa a rechazados
+            logger.warning("ingesta: lote de %d falló (%s), se vuelca fila por fila", len(tomadas), e.orig)
+            ids = {}
+            for i, (seq, fila) in enumerate(tomadas):
+                try:
+                    ids.update(_volcar([fila]))
+                except exc.DBAPIError as e_fila:
+                    if _transitorio(e_fila):
+                        cola().confirmar(seqs[:i], ids)
+                        cola().soltar(seqs[i:])
+                        raise
+                    logger.error("ingesta: pedido %s rechazado: %s", fila["client_request_id"], e_fila.orig)
+                    cola().rechazar(seq, fila, str(e_fila.orig))
+                    INGESTA_PEDIDOS.inc(resultado="rechazado")
+        except BaseException:
+            cola().soltar(seqs)
+            raise
+        cola().confirmar(seqs, ids)
+        _estado["ultimo_volcado"] = datetime.now(timezone.utc)
+        _estado["ultimo_error"] = None
+        return len(tomadas)
+
+def estado() -> dict:
+    return {
+        "modo": settings.PEDIDOS_INGESTA,
+        **(cola().estado() if _en_uso() else {"pendientes": 0, "lag_segundos": 0.0, "rechazados": 0}),
+        "lote": settings.INGESTA_LOTE,
+        "intervalo_segundos": settings.INGESTA_INTERVALO,
+        **_estado,
+    }
+
+# ---------- worker ----------
+
+_tarea: asyncio.Task | None = None
+_detener: asyncio.Event | None = None
+
+async def _esperar(segundos: float):
+    try:
+        await asyncio.wait_for(_detener.wait(), segundos)
+    except asyncio.TimeoutError:
+        pass
+
+async def _trabajar():
+    espera = settings.INGESTA_INTERVALO
+    while not _detener.is_set():
+        try:
+            n = await asyncio.to_thread(volcar_lote)
+        except Exception as e:
+            _estado["ultimo_error"] = f"{type(e).__name__}: {e}"[:500]
+            logger.warning("ingesta: no se pudo volcar, reintento en %.1fs", espera, exc_info=True)
+            await _esperar(espera)
+            espera = min(espera * 2, MAX_ESPERA)
+            continue
+        espera = settings.INGESTA_INTERVALO
+        # Con un lote lleno hay más esperando: se sigue sin dormir
+        if n < settings.INGESTA_LOTE:
+            await _esperar(settings.INGESTA_INTERVALO)
+
+def iniciar_ingesta():
+    # También arranca si quedó una cola de antes aunque ahora el modo sea "directa"
+    global _tarea, _detener
+    if _en_uso():
+        _detener = asyncio.Event()
+        _tarea = asyncio.get_running_loop().create_task(_trabajar())
+
+async def detener_ingesta():
+    # Deja terminar el lote en curso; lo que quede en la cola se vuelca al volver a arrancar
+    global _tarea
+    if _tarea is not None:
+        _detener.set()
+        try:
+            await asyncio.wait_for(_tarea, 10)
+        except asyncio.TimeoutError:
+            logger.warning("ingesta: el volcado en curso no terminó a tiempo")
+        _tarea = None
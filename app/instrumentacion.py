@@ -0,0 +1,92 @@
+import logging
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+
+from app import metrics
+from app.config import settings
+
+logger = logging.getLogger("app.sql")
+
+HTTP_DURACION = metrics.Histograma(
+    "http_request_duration_seconds", "Latencia por ruta (plantilla, no path concreto)"
+)
+HTTP_SQL_SENTENCIAS = metrics.Histograma(
+    "http_request_sql_statements", "Sentencias SQL ejecutadas por request",
+    buckets=(0, 1, 2, 3, 4, 5, 8, 13, 21, 50),
+)
+HTTP_SQL_DURACION = metrics.Histograma(
+    "http_request_sql_seconds", "Tiempo total en SQL por request"
+)
+SQL_LENTAS = metrics.Contador("db_slow_queries_total", "Sentencias por encima de SLOW_QUERY_MS")
+
+class EstadisticasRequest:
+    __slots__ = ("scope", "sentencias", "segundos_sql")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.sentencias = 0
+        self.segundos_sql = 0.0
+
+    @property
+    def ruta(self) -> str:
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "desconocida"
+
+# El objeto es mutable y el contexto se copia al threadpool y a run_sync,
+# así que las sentencias ejecutadas allí se suman al mismo request.
+_request_actual: ContextVar[EstadisticasRequest | None] = ContextVar("request_actual", default=None)
+
+def request_actual() -> EstadisticasRequest | None:
+    return _request_actual.get()
+
+class MedicionMiddleware:
+    # ASGI puro: no bufferiza el cuerpo, sirve también para StreamingResponse
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = EstadisticasRequest(scope)
+        token = _request_actual.set(stats)
+        estado = {"codigo": 500}
+
+        async def send_medido(message):
+            if message["type"] == "http.response.start":
+                estado["codigo"] = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_medido)
+        finally:
+            _request_actual.reset(token)
+            labels = {"method": scope["method"], "route": stats.ruta}
+            HTTP_DURACION.observe(time.perf_counter() - t0, status=estado["codigo"], **labels)
+            HTTP_SQL_SENTENCIAS.observe(stats.sentencias, **labels)
+            HTTP_SQL_DURACION.observe(stats.segundos_sql, **labels)
+
+def instrumentar_engine(sync_engine):
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("sql_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        inicio = conn.info.get("sql_inicio")
+        if not inicio:
+            return
+        duracion = time.perf_counter() - inicio.pop()
+
+        stats = _request_actual.get()
+        if stats is not None:
+            stats.sentencias += 1
+            stats.segundos_sql += duracion
+
+        if duracion * 1000 >= settings.SLOW_QUERY_MS:
+            ruta = stats.ruta if stats is not None else "fuera_de_request"
+            SQL_LENTAS.inc(route=ruta)
+            logger.warning("SQL lenta (%.1f ms) en %s: %s", duracion * 1000, ruta, " ".join(statement.split())[:1000])
@@ -1,36 +1,77 @@
+import time
+_inicio_imports = time.perf_counter()
+
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from sqlalchemy.orm import Session
+from fastapi.responses import PlainTextResponse
 
-from app.database import Base, engine, SessionLocal
+from app import arranque, metrics
+from app.admision import AdmisionMiddleware
+from app.compresion import CompresionMiddleware
+from app.eventos import iniciar_listener, detener_listener
+from app.ingesta import iniciar_ingesta, detener_ingesta
+from app.instrumentacion import MedicionMiddleware
+
+from app.config import settings
+from app.database import SessionLocal, cerrar_pools, insert_on_conflict, precalentar_pool
+from app.esquema import preparar_esquema
 from app.models.tipo_sopa import TipoSopa
 
 from app.routers.pedido_router import router as pedido_router
 from app.routers.catalogo_router import router as catalogo_router
 from app.routers.jornada_router import router as jornada_router
+from app.routers.reportes_router import router as reportes_router
 
 from app.models.pedido import Pedido
+from app.models.pedido_archivo import PedidoArchivo
 from app.models.jornada import Jornada
+from app.models.venta_resumen import VentaResumen
+
+arranque.registrar("imports", time.perf_counter() - _inicio_imports)
 
-app = FastAPI(title="Sopas API")
+CATALOGO_INICIAL = [
+    {"codigo": "CON_EMPAQUE", "nombre": "Con empaque", "precio": 180.0},
+    {"codigo": "SIN_EMPAQUE", "nombre": "Sin empaque", "precio": 160.0},
+]
 
 def seed_catalogo():
-    db: Session = SessionLocal()
+    # Un solo INSERT ... ON CONFLICT (codigo) DO NOTHING: no consulta antes y no pisa precios editados
+    db = SessionLocal()
     try:
-        def upsert(codigo: str, nombre: str, precio: float):
-            tipo = db.query(TipoSopa).filter_by(codigo=codigo).first()
-            if not tipo:
-                db.add(TipoSopa(codigo=codigo, nombre=nombre, precio=precio))
-
-        upsert("CON_EMPAQUE", "Con empaque", 180.0)
-        upsert("SIN_EMPAQUE", "Sin empaque", 160.0)
+        db.execute(
+            insert_on_conflict(db, TipoSopa)
+            .values(CATALOGO_INICIAL)
+            .on_conflict_do_nothing(index_elements=["codigo"])
+        )
         db.commit()
     finally:
         db.close()
 
-@app.on_event("startup")
-def startup():
-    Base.metadata.create_all(bind=engine)
-    seed_catalogo()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with arranque.medir("esquema"):
+        esquema = preparar_esquema(settings.DB_ESQUEMA_AL_INICIAR)
+    with arranque.medir("seed"):
+        seed_catalogo()
+    with arranque.medir("pool"):
+        await precalentar_pool(settings.DB_POOL_PREWARM)
+    iniciar_listener()
+    iniciar_ingesta()
+    arranque.reportar(esquema=esquema)
+    yield
+    await detener_ingesta()
+    await detener_listener()
+    await cerrar_pools()
+
+app = FastAPI(title="Sopas API", lifespan=lifespan)
+if settings.COMPRESION:
+    # Antes que MedicionMiddleware: queda adentro y su tiempo entra en la latencia medida
+    app.add_middleware(CompresionMiddleware, minimo=settings.COMPRESION_MIN_BYTES)
+if settings.ADMISION:
+    # Los rechazos (503/429) también quedan medidos
+    app.add_middleware(AdmisionMiddleware)
+app.add_middleware(MedicionMiddleware)
 
 @app.get("/")
 def root():
@@ -40,6 +81,11 @@ def root():
 def health():
     return {"ok": True}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    return metrics.render()
+
 app.include_router(pedido_router)
 app.include_router(catalogo_router)
-app.include_router(jornada_router)
\ No newline at end of file
+app.include_router(jornada_router)
+app.include_router(reportes_router)
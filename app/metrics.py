@@ -0,0 +1,110 @@
+import threading
+from bisect import bisect_left
+
+# Métricas en memoria del worker, expuestas en formato de texto Prometheus en /metrics.
+
+_lock = threading.Lock()
+_registro: list = []
+
+def _etiquetas(labels: dict) -> str:
+    if not labels:
+        return ""
+    partes = ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in sorted(labels.items()))
+    return "{" + partes + "}"
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self._valores: dict[tuple, float] = {}
+        _registro.append(self)
+
+    def inc(self, valor: float = 1.0, **labels):
+        clave = tuple(sorted(labels.items()))
+        with _lock:
+            self._valores[clave] = self._valores.get(clave, 0.0) + valor
+
+    def valor(self, **labels) -> float:
+        return self._valores.get(tuple(sorted(labels.items())), 0.0)
+
+    def muestras(self):
+        with _lock:
+            items = list(self._valores.items())
+        for clave, valor in items:
+            yield self.nombre, dict(clave), valor
+
+class Gauge:
+    tipo = "gauge"
+
+    def __init__(self, nombre: str, ayuda: str, funcion=None):
+        # funcion: callable que devuelve [(labels, valor), ...] al momento de exportar
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.funcion = funcion
+        self._valores: dict[tuple, float] = {}
+        _registro.append(self)
+
+    def set(self, valor: float, **labels):
+        with _lock:
+            self._valores[tuple(sorted(labels.items()))] = valor
+
+    def inc(self, valor: float = 1.0, **labels):
+        clave = tuple(sorted(labels.items()))
+        with _lock:
+            self._valores[clave] = self._valores.get(clave, 0.0) + valor
+
+    def dec(self, valor: float = 1.0, **labels):
+        self.inc(-valor, **labels)
+
+    def muestras(self):
+        if self.funcion is not None:
+            for labels, valor in self.funcion():
+                yield self.nombre, labels, valor
+        with _lock:
+            items = list(self._valores.items())
+        for clave, valor in items:
+            yield self.nombre, dict(clave), valor
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, buckets: tuple = BUCKETS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = tuple(buckets)
+        # labels -> [conteos por bucket..., +Inf], suma
+        self._series: dict[tuple, tuple[list[int], list[float]]] = {}
+        _registro.append(self)
+
+    def observe(self, valor: float, **labels):
+        clave = tuple(sorted(labels.items()))
+        with _lock:
+            conteos, suma = self._series.setdefault(clave, ([0] * (len(self.buckets) + 1), [0.0]))
+            conteos[bisect_left(self.buckets, valor)] += 1
+            suma[0] += valor
+
+    def muestras(self):
+        with _lock:
+            items = [(k, list(c), s[0]) for k, (c, s) in self._series.items()]
+        for clave, conteos, suma in items:
+            labels = dict(clave)
+            acumulado = 0
+            for limite, n in zip(self.buckets + (float("inf"),), conteos):
+                acumulado += n
+                le = "+Inf" if limite == float("inf") else repr(limite)
+                yield f"{self.nombre}_bucket", {**labels, "le": le}, acumulado
+            yield f"{self.nombre}_sum", labels, suma
+            yield f"{self.nombre}_count", labels, acumulado
+
+def render() -> str:
+    lineas: list[str] = []
+    for metrica in list(_registro):
+        lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+        lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+        for nombre, labels, valor in metrica.muestras():
+            lineas.append(f"{nombre}{_etiquetas(labels)} {valor}")
+    return "\n".join(lineas) + "\n"
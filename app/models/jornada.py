@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime, timezone, date
-from sqlalchemy import String, Date, DateTime, Integer, Float
+from sqlalchemy import String, Date, DateTime, Integer, Float, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base
 
@@ -9,11 +9,19 @@ def now_utc():
 
 class Jornada(Base):
     __tablename__ = "jornadas"
+    __table_args__ = (
+        # Solo puede haber una jornada ABIERTA a la vez (create-or-get atómico con ON CONFLICT)
+        Index(
+            "ux_jornadas_una_abierta", "estado", unique=True,
+            postgresql_where=text("estado = 'ABIERTA'"),
+            sqlite_where=text("estado = 'ABIERTA'"),
+        ),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
 
     fecha: Mapped[date] = mapped_column(Date, unique=True, index=True)  # 1 jornada por día
-    estado: Mapped[str] = mapped_column(String(20), default="ABIERTA", index=True)  # ABIERTA / CERRADA
+    estado: Mapped[str] = mapped_column(String(20), default="ABIERTA")  # ABIERTA / CERRADA (ver ux_jornadas_una_abierta)
 
     opened_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=now_utc)
     closed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -27,5 +35,8 @@ class Jornada(Base):
     total_transferencia: Mapped[float] = mapped_column(Float, default=0.0)
     cancelados_al_cierre: Mapped[int] = mapped_column(Integer, default=0)
 
+    # Sus pedidos ya están en pedidos_archivo (ver archivo_service)
+    archivada_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
     # Relación (opcional pero útil)
     pedidos = relationship("Pedido", back_populates="jornada")
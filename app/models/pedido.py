@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import String, Integer, Float, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import String, Integer, Float, Boolean, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base
 from typing import Optional
@@ -10,11 +10,15 @@ def now_utc():
 
 class Pedido(Base):
     __tablename__ = "pedidos"
+    __table_args__ = (
+        # feed de cambios (GET /pedidos/changes): keyset sobre (updated_at, id)
+        Index("ix_pedidos_updated_at_id", "updated_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
 
     cliente: Mapped[str] = mapped_column(String(120))
-    tipo_sopa_codigo: Mapped[str] = mapped_column(String(50), index=True)   # CON_EMPAQUE / SIN_EMPAQUE
+    tipo_sopa_codigo: Mapped[str] = mapped_column(String(50))   # CON_EMPAQUE / SIN_EMPAQUE
     metodo_pago: Mapped[str] = mapped_column(String(30))                    # EFECTIVO / TRANSFERENCIA
     estado: Mapped[str] = mapped_column(String(30), default="PENDIENTE")     # PENDIENTE / ENTREGADO / CANCELADO
 
@@ -34,11 +38,46 @@ class Pedido(Base):
     client_id: Mapped[Optional[str]] = mapped_column(String(80), nullable=True, index=True)
     client_request_id: Mapped[str] = mapped_column(String(80), unique=True, index=True)
 
-    is_deleted: Mapped[bool] = mapped_column(Boolean, default=False, index=True)
+    is_deleted: Mapped[bool] = mapped_column(Boolean, default=False)
     deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
-    es_especial: Mapped[bool] = mapped_column(Boolean, default=False, index=True)
+    es_especial: Mapped[bool] = mapped_column(Boolean, default=False)
     descripcion_especial: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     #nuevo
-    jornada_id: Mapped[str] = mapped_column(String(36), ForeignKey("jornadas.id"), index=True)
+    jornada_id: Mapped[str] = mapped_column(String(36), ForeignKey("jornadas.id"))
     jornada = relationship("Jornada", back_populates="pedidos")
+
+    # Control de concurrencia optimista: cada UPDATE exige la versión leída y la incrementa
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
+# Índices según la forma real de las consultas (los cambios van en migrations/versions).
+# Todas las lecturas por jornada filtran is_deleted = false, así que los índices son
+# parciales: los borrados no ocupan espacio ni se mantienen en cada escritura.
+_activos = Pedido.is_deleted == False
+
+# GET /pedidos (paginado o no), export, dashboard y rollup:
+# WHERE jornada_id = ? AND NOT is_deleted ORDER BY created_at DESC, id DESC, sin sort aparte.
+# id desempata el keyset de las páginas.
+Index(
+    "ix_pedidos_jornada_created_id", Pedido.jornada_id, Pedido.created_at.desc(), Pedido.id.desc(),
+    postgresql_where=_activos, sqlite_where=_activos,
+)
+# GET /pedidos/historico: el mismo keyset sin filtrar por jornada
+Index(
+    "ix_pedidos_created_id", Pedido.created_at.desc(), Pedido.id.desc(),
+    postgresql_where=_activos, sqlite_where=_activos,
+)
+# cerrar_jornada: UPDATE ... WHERE jornada_id = ? AND estado = 'PENDIENTE' AND NOT is_deleted.
+# Solo contiene los pendientes, así que se mantiene chico durante todo el día.
+Index(
+    "ix_pedidos_jornada_pendientes", Pedido.jornada_id,
+    postgresql_where=_activos & (Pedido.estado == "PENDIENTE"),
+    sqlite_where=_activos & (Pedido.estado == "PENDIENTE"),
+)
+# Purga de soft deletes (archivo_service.purgar_borrados): solo contiene los borrados
+Index(
+    "ix_pedidos_borrados", Pedido.deleted_at,
+    postgresql_where=Pedido.is_deleted == True, sqlite_where=Pedido.is_deleted == True,
+)
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Date, DateTime, Index, Table
+from app.database import Base
+from app.models.pedido import Pedido
+
+# Pedidos de jornadas cerradas hace más de ARCHIVO_RETENCION_DIAS (ver archivo_service).
+# Mismas columnas que pedidos más la fecha de la jornada, que es la clave de partición:
+# en Postgres es una tabla particionada por mes (pedidos_archivo_2026_10, ...) y las
+# particiones se crean al archivar. Solo lectura: sin FK, sin UNIQUE de client_request_id
+# (un índice único en una tabla particionada tendría que incluir fecha) y solo tres
+# índices: la PK, jornada_id y client_request_id (reintentos de pedidos ya archivados).
+pedidos_archivo = Table(
+    "pedidos_archivo",
+    Base.metadata,
+    *(Column(c.name, c.type, nullable=c.nullable, primary_key=c.primary_key) for c in Pedido.__table__.columns),
+    Column("fecha", Date, primary_key=True),
+    Column("archivado_at", DateTime(timezone=True), nullable=False),
+    Index("ix_pedidos_archivo_jornada_id", "jornada_id"),
+    Index("ix_pedidos_archivo_client_request_id", "client_request_id"),
+    postgresql_partition_by="RANGE (fecha)",
+)
+
+class PedidoArchivo(Base):
+    __table__ = pedidos_archivo
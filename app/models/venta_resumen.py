@@ -0,0 +1,28 @@
+from datetime import datetime, timezone
+from sqlalchemy import String, Integer, Float, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+class VentaResumen(Base):
+    # Rollup por jornada x tipo de sopa x método de pago; se mantiene incrementalmente
+    # en la misma transacción que cada cambio de pedido (sin contar borrados).
+    __tablename__ = "ventas_resumen"
+
+    jornada_id: Mapped[str] = mapped_column(String(36), ForeignKey("jornadas.id"), primary_key=True)
+    tipo_sopa_codigo: Mapped[str] = mapped_column(String(50), primary_key=True)
+    metodo_pago: Mapped[str] = mapped_column(String(30), primary_key=True)
+
+    pedidos: Mapped[int] = mapped_column(Integer, default=0)
+    pendientes: Mapped[int] = mapped_column(Integer, default=0)
+    entregados: Mapped[int] = mapped_column(Integer, default=0)
+    cancelados: Mapped[int] = mapped_column(Integer, default=0)
+
+    cantidad: Mapped[int] = mapped_column(Integer, default=0)
+    cantidad_entregada: Mapped[int] = mapped_column(Integer, default=0)
+    total: Mapped[float] = mapped_column(Float, default=0.0)
+    recaudado: Mapped[float] = mapped_column(Float, default=0.0)   # solo ENTREGADO
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=now_utc, onupdate=now_utc)
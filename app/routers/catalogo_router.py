@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, run_db
+from app.etag import etag_coincide
 from app.schemas.tipo_sopa import TipoSopaOut, TipoSopaUpdatePrice
-from app.services.catalogo_service import listar_tipos, actualizar_precio
+from app.services.catalogo_service import obtener_catalogo, actualizar_precio
 
 router = APIRouter(prefix="/catalogo", tags=["catalogo"])
 
 @router.get("/tipos-sopa", response_model=list[TipoSopaOut])
-def get_tipos(db: Session = Depends(get_db)):
-    return listar_tipos(db)
+async def get_tipos(request: Request, response: Response, db: Session = Depends(get_db)):
+    catalogo = await run_db(db, obtener_catalogo)
+    etag = f'W/"{catalogo.version}"'
+    if etag_coincide(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return list(catalogo.tipos)
 
 @router.put("/tipos-sopa/{codigo}/precio", response_model=TipoSopaOut)
-def put_precio(codigo: str, payload: TipoSopaUpdatePrice, db: Session = Depends(get_db)):
-    return actualizar_precio(db, codigo, payload.precio)
+async def put_precio(codigo: str, payload: TipoSopaUpdatePrice, db: Session = Depends(get_db)):
+    return await run_db(db, actualizar_precio, codigo, payload.precio)
@@ -1,35 +1,71 @@
-from fastapi import APIRouter, Depends
+from typing import Literal
+import orjson
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.config import settings
+from app.database import get_db, get_read_db, run_db
+from app.etag import etag_coincide, etag_marca
 from app.schemas.jornada_schema import JornadaOut
 from app.services.jornada_service import (
     get_or_create_jornada_activa, listar_jornadas, cerrar_jornada, dashboard_jornada
     )
 from app.database import get_db
-from app.services.jornada_service import abrir_jornada_hoy, obtener_jornada_activa, cerrar_jornada
+from app.services.jornada_service import abrir_jornada_hoy, cerrar_jornada, obtener_jornada
+from app.services.export_service import exportar_pedidos_jornada
+from app.services.archivo_service import mantenimiento
 
 router = APIRouter(prefix="/jornadas", tags=["Jornadas"])
 
 @router.post("/abrir")
-def abrir(db: Session = Depends(get_db)):
-    return abrir_jornada_hoy(db)
+async def abrir(db: Session = Depends(get_db)):
+    return await run_db(db, abrir_jornada_hoy)
 
 @router.get("/activa", response_model=JornadaOut)
-def get_activa(db: Session = Depends(get_db)):
-    return get_or_create_jornada_activa(db)
+async def get_activa(db: Session = Depends(get_db)):
+    return await run_db(db, get_or_create_jornada_activa)
+
+def _mantenimiento_al_cerrar(tareas: BackgroundTasks):
+    # Después de responder: archiva las jornadas vencidas y purga borrados viejos
+    if settings.ARCHIVO_AL_CERRAR:
+        tareas.add_task(mantenimiento)
 
 @router.post("/{jornada_id}/cerrar")
-def cerrar(jornada_id: str, db: Session = Depends(get_db)):
-    return cerrar_jornada(db, jornada_id)
+async def cerrar(jornada_id: str, tareas: BackgroundTasks, db: Session = Depends(get_db)):
+    jornada = await run_db(db, cerrar_jornada, jornada_id)
+    _mantenimiento_al_cerrar(tareas)
+    return jornada
 
 @router.get("", response_model=list[JornadaOut])
-def get_jornadas(estado: str | None = None, limit: int = 50, offset: int = 0, db: Session = Depends(get_db)):
-    return listar_jornadas(db, estado=estado, limit=limit, offset=offset)
+async def get_jornadas(estado: str | None = None, limit: int = 50, offset: int = 0, db: Session = Depends(get_read_db)):
+    return await run_db(db, listar_jornadas, estado=estado, limit=limit, offset=offset)
 
 @router.post("/{jornada_id}/cerrar", response_model=JornadaOut)
-def post_cerrar(jornada_id: str, db: Session = Depends(get_db)):
-    return cerrar_jornada(db, jornada_id)
+async def post_cerrar(jornada_id: str, tareas: BackgroundTasks, db: Session = Depends(get_db)):
+    jornada = await run_db(db, cerrar_jornada, jornada_id)
+    _mantenimiento_al_cerrar(tareas)
+    return jornada
 
 @router.get("/{jornada_id}/dashboard")
-def get_dashboard(jornada_id: str, db: Session = Depends(get_db)):
-    return dashboard_jornada(db, jornada_id)
\ No newline at end of file
+async def get_dashboard(jornada_id: str, request: Request, db: Session = Depends(get_read_db)):
+    # El dashboard ya viene de la caché: el ETag es el hash de su contenido, sin otra consulta
+    datos = await run_db(db, dashboard_jornada, jornada_id)
+    etag = etag_marca(datos)
+    if etag_coincide(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=orjson.dumps(datos), media_type="application/json", headers={"ETag": etag})
+
+@router.get("/{jornada_id}/export")
+async def get_export(
+    jornada_id: str,
+    formato: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    db: Session = Depends(get_db),
+):
+    jornada = await run_db(db, obtener_jornada, jornada_id)
+    media_type = "text/csv" if formato == "csv" else "application/x-ndjson"
+    nombre = f"pedidos_{jornada.fecha.isoformat()}.{formato}"
+    return StreamingResponse(
+        exportar_pedidos_jornada(jornada_id, formato),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'},
+    )
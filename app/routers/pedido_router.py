@@ -1,30 +1,157 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Header, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.schemas.pedido import PedidoCreate, PedidoUpdate, PedidoOut
-from app.services.pedido_service import crear_pedido, listar_pedidos, obtener_pedido, actualizar_pedido, eliminar_pedido,listar_pedidos_de_jornada
+from app import ingesta
+from app.database import get_db, get_read_db, run_db
+from app.etag import etag_coincide, etag_marca, etag_version, versiones_if_match
+from app.eventos import stream_eventos
+from app.schemas.pedido import PedidoCreate, PedidoUpdate, PedidoOut, PedidoBatchResultado, PedidoCambiosOut
+from app.schemas.pedido import PedidosEstadoCambio, PedidoEstadoResultado, PedidoProyectado
+from app.serializacion import respuesta_filas
+from app.services.pedido_service import crear_pedido, obtener_pedido, actualizar_pedido, eliminar_pedido
+from app.services.pedido_service import crear_pedidos_batch, listar_cambios, listar_pagina_pedidos, preparar_pedido
+from app.services.pedido_service import cambiar_estado_pedidos, marca_pedidos, pedido_ya_creado
 from app.services.jornada_service import get_or_create_jornada_activa
 
 router = APIRouter(prefix="/pedidos", tags=["pedidos"])
 
-@router.post("", response_model=PedidoOut, status_code=status.HTTP_201_CREATED)
-def post_pedido(payload: PedidoCreate, db: Session = Depends(get_db)):
-    return crear_pedido(db, payload)
+@router.post(
+    "", response_model=PedidoOut, status_code=status.HTTP_201_CREATED,
+    responses={
+        200: {"model": PedidoOut, "description": "client_request_id repetido: el pedido original"},
+        202: {"model": PedidoBatchResultado, "description": "PEDIDOS_INGESTA=cola: encolado, se guarda en segundo plano"},
+    },
+)
+async def post_pedido(payload: PedidoCreate, response: Response, db: Session = Depends(get_db)):
+    if ingesta.activa():
+        resultado, pedido_id = await _encolar_pedido(db, payload)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"client_request_id": payload.client_request_id, "resultado": resultado,
+                     "pedido_id": pedido_id, "detalle": None},
+        )
+    pedido, creado = await run_db(db, crear_pedido, payload)
+    if not creado:
+        response.status_code = status.HTTP_200_OK
+    return pedido
 
-@router.get("", response_model=list[PedidoOut])
-def get_pedidos(db: Session = Depends(get_db)):
-    jornada = get_or_create_jornada_activa(db)
-    return listar_pedidos_de_jornada(db, jornada.id)
+async def _encolar_pedido(db: Session, payload: PedidoCreate) -> tuple[str, str]:
+    # Un reintento recibe DUPLICADO con el id real: primero se busca en la cola local,
+    # después en la BD; solo si no está en ninguna se valida y se encola
+    crid = payload.client_request_id
+    pedido_id = await run_in_threadpool(ingesta.buscar, crid)
+    if pedido_id is not None:
+        return "DUPLICADO", pedido_id
+    pedido_id = await run_db(db, pedido_ya_creado, crid)
+    if pedido_id is not None:
+        return ingesta.duplicado(pedido_id)
+    fila = await run_db(db, preparar_pedido, payload)
+    return await run_in_threadpool(ingesta.encolar, fila)
+
+@router.post("/batch", response_model=list[PedidoBatchResultado])
+async def post_pedidos_batch(payload: list[PedidoCreate], db: Session = Depends(get_db)):
+    return await run_db(db, crear_pedidos_batch, payload)
+
+@router.post("/estado", response_model=list[PedidoEstadoResultado])
+async def post_pedidos_estado(payload: PedidosEstadoCambio, db: Session = Depends(get_db)):
+    # Marca muchos pedidos ENTREGADO/CANCELADO de una vez; un resultado por id
+    return await run_db(db, cambiar_estado_pedidos, payload)
+
+def filtros_pedidos(
+    estado: str | None = None,
+    metodo_pago: str | None = None,
+    tipo_sopa_codigo: str | None = None,
+    es_especial: bool | None = None,
+    client_id: str | None = None,
+    fields: str | None = Query(default=None, description="Columnas separadas por coma, p. ej. id,cliente,direccion,total"),
+    cursor: str | None = Query(default=None, description="X-Next-Cursor de la página anterior"),
+) -> dict:
+    return dict(
+        estado=estado, metodo_pago=metodo_pago, tipo_sopa_codigo=tipo_sopa_codigo,
+        es_especial=es_especial, client_id=client_id, fields=fields, cursor=cursor,
+    )
+
+def _respuesta_pagina(pagina: dict):
+    headers = {"X-Next-Cursor": pagina["next_cursor"]} if pagina["next_cursor"] else None
+    return respuesta_filas(pagina["campos"], pagina["filas"], headers=headers)
+
+@router.get("", response_model=list[PedidoProyectado])
+async def get_pedidos(
+    request: Request,
+    filtros: dict = Depends(filtros_pedidos),
+    limit: int | None = Query(default=None, description="Sin limit devuelve toda la jornada"),
+    db: Session = Depends(get_db),
+    lectura: Session = Depends(get_read_db),
+):
+    # La jornada activa sale de la primaria (puede crearla; casi siempre viene de la caché),
+    # el listado de la réplica. Sin réplica `lectura` es la misma sesión que `db`.
+    jornada = await run_db(db, get_or_create_jornada_activa)
+    # La marca se lee antes que el listado: si algo cambia en el medio, el ETag queda
+    # viejo y el próximo poll recibe 200, nunca un 304 con datos de menos
+    etag = etag_marca(jornada.id, await run_db(lectura, marca_pedidos, jornada.id), request.url.query)
+    if etag_coincide(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    respuesta = _respuesta_pagina(await run_db(lectura, listar_pagina_pedidos, jornada.id, limit=limit, **filtros))
+    respuesta.headers["ETag"] = etag
+    return respuesta
+
+@router.get("/historico", response_model=list[PedidoProyectado])
+async def get_historico(
+    filtros: dict = Depends(filtros_pedidos),
+    limit: int = 100,
+    db: Session = Depends(get_read_db),
+):
+    # Todas las jornadas, más nuevos primero; se recorre siguiendo X-Next-Cursor
+    return _respuesta_pagina(await run_db(db, listar_pagina_pedidos, limit=limit, **filtros))
+
+@router.get("/changes", response_model=PedidoCambiosOut)
+async def get_cambios(
+    since: str | None = Query(default=None, description="Cursor devuelto por la página anterior"),
+    limit: int = 200,
+    db: Session = Depends(get_db),
+):
+    return await run_db(db, listar_cambios, since=since, limit=limit)
+
+@router.get("/ingesta")
+async def get_ingesta():
+    # Profundidad y atraso de la cola local de este host (PEDIDOS_INGESTA=cola)
+    return await run_in_threadpool(ingesta.estado)
+
+@router.get("/stream")
+async def get_stream(
+    last_event_id: str | None = Header(default=None, description="Lo manda EventSource solo al reconectar"),
+    desde: str | None = Query(default=None, description="Alternativa a Last-Event-ID para clientes sin EventSource"),
+):
+    # SSE: creado / actualizado / eliminado / cancelado (+ resync si hay que recargar GET /pedidos)
+    return StreamingResponse(
+        stream_eventos(last_event_id or desde),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/{pedido_id}", response_model=PedidoOut)
-def get_pedido(pedido_id: str, db: Session = Depends(get_db)):
-    return obtener_pedido(db, pedido_id)
+async def get_pedido(pedido_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    pedido = await run_db(db, obtener_pedido, pedido_id, archivo=True)
+    etag = etag_version(pedido.version)
+    if etag_coincide(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return pedido
 
 @router.patch("/{pedido_id}", response_model=PedidoOut)
-def patch_pedido(pedido_id: str, payload: PedidoUpdate, db: Session = Depends(get_db)):
-    return actualizar_pedido(db, pedido_id, payload)
+async def patch_pedido(
+    pedido_id: str,
+    payload: PedidoUpdate,
+    response: Response,
+    if_match: str | None = Header(default=None, description='ETag del GET, p. ej. "3". 412 si el pedido cambió'),
+    db: Session = Depends(get_db),
+):
+    pedido = await run_db(db, actualizar_pedido, pedido_id, payload, versiones_if_match(if_match))
+    response.headers["ETag"] = etag_version(pedido.version)
+    return pedido
 
 @router.delete("/{pedido_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_pedido(pedido_id: str, db: Session = Depends(get_db)):
-    eliminar_pedido(db, pedido_id)
+async def delete_pedido(pedido_id: str, db: Session = Depends(get_db)):
+    await run_db(db, eliminar_pedido, pedido_id)
     return None
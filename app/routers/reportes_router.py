@@ -0,0 +1,17 @@
+from datetime import date
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from app.database import get_read_db, run_db
+from app.services.reportes_service import reporte_ventas
+
+router = APIRouter(prefix="/reportes", tags=["reportes"])
+
+@router.get("/ventas")
+async def get_ventas(
+    desde: date | None = None,
+    hasta: date | None = None,
+    group_by: str = Query("fecha", description="Lista separada por comas: fecha, jornada_id, tipo_sopa_codigo, metodo_pago"),
+    db: Session = Depends(get_read_db),
+):
+    dims = [g.strip() for g in group_by.split(",") if g.strip()]
+    return await run_db(db, reporte_ventas, desde=desde, hasta=hasta, group_by=dims)
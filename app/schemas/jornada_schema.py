@@ -7,6 +7,7 @@ class JornadaOut(BaseModel):
     estado: str
     created_at: datetime
     closed_at: datetime | None = None
+    archivada_at: datetime | None = None
 
     class Config:
         from_attributes = True
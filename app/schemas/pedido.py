@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, create_model
 from datetime import datetime
 from typing import Optional
 
@@ -28,12 +28,32 @@ class PedidoUpdate(BaseModel):
     es_especial: Optional[bool] = None
     descripcion_especial: Optional[str] = None
 
+class PedidoBatchResultado(BaseModel):
+    client_request_id: str
+    resultado: str                      # CREADO / DUPLICADO / RECHAZADO
+    pedido_id: str | None = None
+    detalle: str | None = None
+
+class PedidosEstadoCambio(BaseModel):
+    # ids, o jornada_id + estado_actual (p. ej. todos los PENDIENTE de la jornada)
+    estado: str
+    ids: list[str] | None = None
+    jornada_id: str | None = None
+    estado_actual: str | None = None
+
+class PedidoEstadoResultado(BaseModel):
+    pedido_id: str
+    resultado: str                      # ACTUALIZADO / SIN_CAMBIO / NO_EXISTE / RECHAZADO / CONFLICTO
+    estado: str | None = None
+    version: int | None = None
+    updated_at: datetime | None = None
+    detalle: str | None = None
+
 class PedidoOut(BaseModel):
     id: str
     jornada_id: str
     client_id: str | None = None
     client_request_id: str
-    client_id: str | None
     is_deleted: bool
     deleted_at: datetime | None
     tipo_sopa_codigo: str
@@ -49,6 +69,23 @@ class PedidoOut(BaseModel):
     descripcion_especial: Optional[str] = None
     created_at: datetime
     updated_at: datetime
+    version: int
+
+    class Config:
+        from_attributes = True
+
+# Orden de columnas = orden de campos de PedidoOut (lo usa el camino rápido de listados)
+CAMPOS_PEDIDO_OUT = tuple(PedidoOut.model_fields)
+
+# Fila de GET /pedidos y /pedidos/historico: con fields= solo vienen las columnas pedidas
+# (las de PedidoOut más cliente), así que en el esquema todas son opcionales
+PedidoProyectado = create_model(
+    "PedidoProyectado",
+    **{nombre: (campo.annotation | None, None) for nombre, campo in PedidoOut.model_fields.items()},
+    cliente=(str | None, None),
+)
 
-class Config:
-    from_attributes = True
+class PedidoCambiosOut(BaseModel):
+    cambios: list[PedidoOut]
+    next_cursor: str | None = None
+    has_more: bool = False
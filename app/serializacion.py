@@ -0,0 +1,16 @@
+import orjson
+from fastapi import Response
+
+def json_filas(campos: tuple[str, ...], filas) -> bytes:
+    # Filas (tuplas) -> JSON sin pasar por modelos Pydantic. OPT_UTC_Z deja las fechas
+    # igual que Pydantic ("...Z" para UTC), así la respuesta es idéntica a response_model.
+    return orjson.dumps([dict(zip(campos, fila)) for fila in filas], option=orjson.OPT_UTC_Z)
+
+def respuesta_filas(campos: tuple[str, ...], filas, status_code: int = 200, headers: dict | None = None) -> Response:
+    # Response cruda: FastAPI no re-valida ni re-serializa aunque la ruta tenga response_model
+    return Response(
+        content=json_filas(campos, filas),
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers,
+    )
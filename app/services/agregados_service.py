@@ -0,0 +1,80 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, union_all
+
+from app.models.jornada import Jornada
+from app.models.pedido import Pedido
+from app.models.pedido_archivo import PedidoArchivo
+
+DIMENSIONES = ("estado", "metodo_pago", "tipo_sopa_codigo", "es_especial")
+
+class ResumenPedidos:
+    # Resultado de un solo GROUP BY; los totales se derivan en memoria filtrando grupos
+    def __init__(self, grupos: list[dict]):
+        self.grupos = grupos
+
+    def _filtrar(self, filtro: dict):
+        return (g for g in self.grupos if all(g[k] == v for k, v in filtro.items()))
+
+    def contar(self, **filtro) -> int:
+        return sum(g["pedidos"] for g in self._filtrar(filtro))
+
+    def cantidad(self, **filtro) -> int:
+        return sum(g["cantidad"] for g in self._filtrar(filtro))
+
+    def total(self, **filtro) -> float:
+        return float(sum(g["total"] for g in self._filtrar(filtro)))
+
+    def por(self, dimension: str, **filtro) -> dict:
+        salida: dict = {}
+        for g in self._filtrar(filtro):
+            d = salida.setdefault(g[dimension], {"pedidos": 0, "cantidad": 0, "total": 0.0})
+            d["pedidos"] += g["pedidos"]
+            d["cantidad"] += g["cantidad"]
+            d["total"] += float(g["total"])
+        return salida
+
+def agregar_pedidos(db: Session, jornada_id: str, modelo=Pedido) -> ResumenPedidos:
+    # Conteos y sumas de la jornada en un solo round-trip (sin contar borrados).
+    # modelo = PedidoArchivo para una jornada archivada (ver archivo_service.modelo_de_jornada)
+    dimensiones = [getattr(modelo, d) for d in DIMENSIONES]
+    filas = db.execute(
+        select(
+            *dimensiones,
+            func.count(modelo.id).label("pedidos"),
+            func.coalesce(func.sum(modelo.cantidad), 0).label("cantidad"),
+            func.coalesce(func.sum(modelo.total), 0.0).label("total"),
+        )
+        .where(modelo.jornada_id == jornada_id, modelo.is_deleted == False)
+        .group_by(*dimensiones)
+    ).mappings().all()
+    return ResumenPedidos([dict(f) for f in filas])
+
+def _filas_de(modelo, jornada_id: str, *condiciones):
+    return select(
+        *(getattr(modelo, d) for d in DIMENSIONES), modelo.id, modelo.cantidad, modelo.total,
+    ).where(modelo.jornada_id == jornada_id, modelo.is_deleted == False, *condiciones)
+
+def agregar_pedidos_de_jornada(db: Session, jornada_id: str) -> ResumenPedidos:
+    # Como agregar_pedidos, pero eligiendo pedidos o pedidos_archivo en la misma consulta
+    # en vez de leer antes jornadas.archivada_at. El EXISTS no depende de la fila: Postgres
+    # lo evalúa una vez (One-Time Filter) y solo recorre la tabla que corresponde.
+    archivada = (
+        select(Jornada.id)
+        .where(Jornada.id == jornada_id, Jornada.archivada_at.is_not(None))
+        .exists()
+    )
+    filas = union_all(
+        _filas_de(Pedido, jornada_id, ~archivada),
+        _filas_de(PedidoArchivo, jornada_id, archivada),
+    ).subquery()
+    dimensiones = [filas.c[d] for d in DIMENSIONES]
+    grupos = db.execute(
+        select(
+            *dimensiones,
+            func.count(filas.c.id).label("pedidos"),
+            func.coalesce(func.sum(filas.c.cantidad), 0).label("cantidad"),
+            func.coalesce(func.sum(filas.c.total), 0.0).label("total"),
+        )
+        .group_by(*dimensiones)
+    ).mappings().all()
+    return ResumenPedidos([dict(g) for g in grupos])
@@ -0,0 +1,117 @@
+import logging
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, literal, text, Date, DateTime
+
+from app import metrics
+from app.cache import invalidar_al_confirmar
+from app.config import settings
+from app.database import SessionLocal
+from app.models.jornada import Jornada
+from app.models.pedido import Pedido
+from app.models.pedido_archivo import PedidoArchivo, pedidos_archivo
+
+# Dos niveles de almacenamiento para pedidos:
+#
+# * pedidos: la jornada abierta y las cerradas hace menos de ARCHIVO_RETENCION_DIAS.
+#   Su tamaño (y el de sus índices y su vacuum) depende de la retención, no del historial.
+# * pedidos_archivo: el resto, una partición por mes en Postgres. Solo lectura.
+#
+# archivar_jornada mueve una jornada entera en una transacción (INSERT ... SELECT +
+# DELETE) y marca jornadas.archivada_at; los lectores eligen la tabla con
+# modelo_de_jornada. purgar_borrados elimina de verdad los soft deletes viejos.
+
+logger = logging.getLogger("app.archivo")
+
+ARCHIVO_PEDIDOS = metrics.Contador("archivo_pedidos_total", "Pedidos movidos al archivo o purgados")
+
+COLUMNAS_PEDIDO = [c.name for c in Pedido.__table__.columns]
+
+def modelo_de_jornada(db: Session, jornada_id: str):
+    # Pedido o PedidoArchivo: mismas columnas, distinta tabla
+    archivada = db.execute(select(Jornada.archivada_at).where(Jornada.id == jornada_id)).scalar()
+    return PedidoArchivo if archivada else Pedido
+
+def asegurar_particion(db: Session, fecha: date):
+    # Partición mensual pedidos_archivo_AAAA_MM (solo Postgres; en SQLite es una tabla común)
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    desde = fecha.replace(day=1)
+    hasta = (desde + timedelta(days=32)).replace(day=1)
+    db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS pedidos_archivo_{desde:%Y_%m} PARTITION OF pedidos_archivo "
+        f"FOR VALUES FROM ('{desde.isoformat()}') TO ('{hasta.isoformat()}')"
+    ))
+
+def archivar_jornada(db: Session, jornada_id: str) -> int:
+    # Devuelve cuántos pedidos pasaron al archivo. Hace commit.
+    # FOR UPDATE: dos procesos de mantenimiento a la vez no archivan la misma jornada
+    j = db.get(Jornada, jornada_id, with_for_update=True)
+    if not j or j.estado != "CERRADA" or j.archivada_at is not None:
+        db.rollback()
+        return 0
+
+    ahora = datetime.now(timezone.utc)
+    asegurar_particion(db, j.fecha)
+    # Los borrados no se archivan: el rollup y los reportes ya no los cuentan
+    q = (
+        select(
+            *Pedido.__table__.columns,
+            literal(j.fecha, Date),
+            literal(ahora, DateTime(timezone=True)),
+        )
+        .where(Pedido.jornada_id == j.id, Pedido.is_deleted == False)
+    )
+    movidos = db.execute(
+        pedidos_archivo.insert().from_select([*COLUMNAS_PEDIDO, "fecha", "archivado_at"], q)
+    ).rowcount
+    db.execute(delete(Pedido).where(Pedido.jornada_id == j.id).execution_options(synchronize_session=False))
+
+    j.archivada_at = ahora
+    invalidar_al_confirmar(db, f"pedidos:{j.id}")
+    db.commit()
+    ARCHIVO_PEDIDOS.inc(movidos, accion="archivado")
+    return movidos
+
+def archivar_vencidas(db: Session, dias: int | None = None) -> dict[str, int]:
+    # Jornadas cerradas hace más de `dias`; una transacción por jornada para no
+    # tener abierta una sola gigante la primera vez que corre sobre todo el historial
+    dias = settings.ARCHIVO_RETENCION_DIAS if dias is None else dias
+    limite = datetime.now(timezone.utc) - timedelta(days=dias)
+    ids = db.execute(
+        select(Jornada.id)
+        .where(Jornada.estado == "CERRADA", Jornada.archivada_at.is_(None), Jornada.closed_at < limite)
+        .order_by(Jornada.fecha)
+    ).scalars().all()
+    db.rollback()
+    return {jornada_id: archivar_jornada(db, jornada_id) for jornada_id in ids}
+
+def purgar_borrados(db: Session, dias: int | None = None) -> int:
+    # Soft deletes más viejos que `dias`: a esa altura ningún dispositivo los necesita
+    # en el feed de cambios. Hace commit.
+    dias = settings.PURGA_BORRADOS_DIAS if dias is None else dias
+    limite = datetime.now(timezone.utc) - timedelta(days=dias)
+    purgados = db.execute(
+        delete(Pedido)
+        .where(Pedido.is_deleted == True, Pedido.deleted_at < limite)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    ARCHIVO_PEDIDOS.inc(purgados, accion="purgado")
+    return purgados
+
+def mantenimiento(dias: int | None = None, purgar_dias: int | None = None) -> dict:
+    # Sesión propia: corre como BackgroundTask después de cerrar jornada o desde el comando
+    db = SessionLocal()
+    try:
+        archivadas = archivar_vencidas(db, dias)
+        purgados = purgar_borrados(db, purgar_dias)
+    except Exception:
+        logger.exception("archivo: falló el mantenimiento")
+        raise
+    finally:
+        db.close()
+    if archivadas or purgados:
+        logger.info("archivo: %d jornadas (%d pedidos) archivadas, %d borrados purgados",
+                    len(archivadas), sum(archivadas.values()), purgados)
+    return {"jornadas": archivadas, "purgados": purgados}
@@ -1,22 +1,70 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from fastapi import HTTPException
+from app.cache import cache
+from app.config import settings
 from app.models.tipo_sopa import TipoSopa
 
+@dataclass(frozen=True)
+class TipoSopaCacheado:
+    # Copia inmutable de una fila de tipos_sopa; no depende de la sesión que la cargó
+    id: str
+    codigo: str
+    nombre: str
+    precio: float
+    created_at: datetime
+    updated_at: datetime
+
+@dataclass(frozen=True)
+class Catalogo:
+    tipos: tuple[TipoSopaCacheado, ...]
+    version: str
+
+def _cargar_catalogo(db: Session) -> Catalogo:
+    filas = db.execute(select(TipoSopa).order_by(TipoSopa.codigo.asc())).scalars().all()
+    tipos = tuple(
+        TipoSopaCacheado(
+            id=t.id, codigo=t.codigo, nombre=t.nombre, precio=t.precio,
+            created_at=t.created_at, updated_at=t.updated_at,
+        )
+        for t in filas
+    )
+    # La versión sale del contenido: dos workers con los mismos datos dan el mismo ETag
+    huella = "|".join(f"{t.codigo}:{t.precio}:{t.updated_at.isoformat()}" for t in tipos)
+    version = hashlib.sha1(huella.encode()).hexdigest()[:16]
+    return Catalogo(tipos=tipos, version=version)
+
+def obtener_catalogo(db: Session) -> Catalogo:
+    # Al vencer el TTL se recarga de la BD: así un precio cambiado en otro worker
+    # nunca dura más de un TTL en este (con backend compartido, ni eso).
+    return cache.obtener("catalogo", lambda: _cargar_catalogo(db), settings.CATALOGO_CACHE_TTL, tags=("catalogo",))
+
+def invalidar_catalogo():
+    cache.invalidar("catalogo")
+
 def listar_tipos(db: Session):
-    return db.execute(select(TipoSopa).order_by(TipoSopa.codigo.asc())).scalars().all()
+    return list(obtener_catalogo(db).tipos)
 
-def get_por_codigo(db: Session, codigo: str) -> TipoSopa:
-    tipo = db.execute(select(TipoSopa).where(TipoSopa.codigo == codigo)).scalar_one_or_none()
-    if not tipo:
-        raise HTTPException(status_code=404, detail="Tipo de sopa no existe")
-    return tipo
+def mapa_tipos(db: Session) -> dict[str, TipoSopaCacheado]:
+    return {t.codigo: t for t in obtener_catalogo(db).tipos}
+
+def get_por_codigo(db: Session, codigo: str) -> TipoSopaCacheado:
+    for tipo in obtener_catalogo(db).tipos:
+        if tipo.codigo == codigo:
+            return tipo
+    raise HTTPException(status_code=404, detail="Tipo de sopa no existe")
 
 def actualizar_precio(db: Session, codigo: str, precio: float) -> TipoSopa:
     if precio <= 0:
         raise HTTPException(status_code=400, detail="El precio debe ser mayor que 0")
-    tipo = get_por_codigo(db, codigo)
+    tipo = db.execute(select(TipoSopa).where(TipoSopa.codigo == codigo)).scalar_one_or_none()
+    if not tipo:
+        raise HTTPException(status_code=404, detail="Tipo de sopa no existe")
     tipo.precio = precio
     db.commit()
+    invalidar_catalogo()
     db.refresh(tipo)
     return tipo
@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Iterator
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.models.pedido import Pedido
+from app.services.archivo_service import modelo_de_jornada
+
+LOTE_EXPORT = 1000
+
+# Solo las columnas que usa contabilidad; nunca se materializan entidades ORM
+COLUMNAS_EXPORT = (
+    Pedido.id,
+    Pedido.jornada_id,
+    Pedido.client_request_id,
+    Pedido.client_id,
+    Pedido.cliente,
+    Pedido.tipo_sopa_codigo,
+    Pedido.metodo_pago,
+    Pedido.estado,
+    Pedido.cantidad,
+    Pedido.total,
+    Pedido.monto_pagado,
+    Pedido.vuelto,
+    Pedido.es_especial,
+    Pedido.created_at,
+    Pedido.updated_at,
+)
+NOMBRES_EXPORT = [c.key for c in COLUMNAS_EXPORT]
+
+def _texto(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor
+
+def _lineas_ndjson(filas) -> bytes:
+    return "".join(
+        json.dumps({k: _texto(v) for k, v in zip(NOMBRES_EXPORT, fila)}, ensure_ascii=False) + "\n"
+        for fila in filas
+    ).encode()
+
+def _lineas_csv(filas, encabezado: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if encabezado:
+        writer.writerow(NOMBRES_EXPORT)
+    writer.writerows([_texto(v) for v in fila] for fila in filas)
+    return buffer.getvalue().encode()
+
+def exportar_pedidos_jornada(jornada_id: str, formato: str) -> Iterator[bytes]:
+    # Sesión propia: el generador sigue vivo mientras se envía la respuesta.
+    # yield_per activa el cursor del lado servidor (stream_results) y la memoria
+    # queda acotada a LOTE_EXPORT filas sin importar el tamaño de la jornada.
+    # Una jornada archivada se lee de pedidos_archivo con las mismas columnas.
+    db = SessionLocal()
+    try:
+        modelo = modelo_de_jornada(db, jornada_id)
+        result = db.execute(
+            select(*(getattr(modelo, c) for c in NOMBRES_EXPORT))
+            .where(modelo.jornada_id == jornada_id, modelo.is_deleted == False)
+            .order_by(modelo.created_at.asc(), modelo.id.asc())
+            .execution_options(yield_per=LOTE_EXPORT)
+        )
+        if formato == "csv":
+            encabezado = True
+            for filas in result.partitions():
+                yield _lineas_csv(filas, encabezado)
+                encabezado = False
+            if encabezado:
+                yield _lineas_csv([], True)
+        else:
+            for filas in result.partitions():
+                yield _lineas_ndjson(filas)
+    finally:
+        db.close()
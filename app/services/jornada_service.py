@@ -1,105 +1,164 @@
+from dataclasses import dataclass
 from datetime import date, datetime, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, case
+from sqlalchemy import select, update
 from fastapi import HTTPException
 
+from app.cache import cache, invalidar_al_confirmar
+from app.config import settings
+from app.database import insert_on_conflict
+from app.eventos import emitir_cancelados
 from app.models.jornada import Jornada
 from app.models.pedido import Pedido
+from app.services.agregados_service import agregar_pedidos, agregar_pedidos_de_jornada
+from app.services.reportes_service import reconstruir_resumen
 
 VALID_ESTADO_PEDIDO = {"PENDIENTE", "ENTREGADO", "CANCELADO"}
 
-def obtener_jornada_activa(db: Session) -> Jornada:
-    j = db.execute(
+@dataclass(frozen=True)
+class JornadaActiva:
+    # Copia inmutable de la jornada abierta; es lo que necesitan crear/listar pedidos
+    id: str
+    fecha: date
+    estado: str
+    created_at: datetime
+    closed_at: datetime | None
+
+def invalidar_jornada_activa():
+    cache.invalidar("jornadas")
+
+def _buscar_abierta(db: Session) -> Jornada | None:
+    return db.execute(
         select(Jornada).where(Jornada.estado == "ABIERTA")
     ).scalars().first()
 
+def resolver_jornada_activa(db: Session, crear: bool = False) -> JornadaActiva:
+    # Cacheada por JORNADA_CACHE_TTL con el tag "jornadas": abrir/cerrar la invalidan
+    # (en todos los workers si el backend es compartido; si no, el TTL acota al resto).
+    # Solo se cachea una jornada leída de la BD: la que se crea acá queda en la
+    # transacción del llamador y entra en la caché cuando otro request la lea confirmada.
+    try:
+        return cache.obtener(
+            "jornada_activa", lambda: _leer_jornada_activa(db), settings.JORNADA_CACHE_TTL, tags=("jornadas",)
+        )
+    except HTTPException as e:
+        if not crear or e.status_code != 404:
+            raise
+    return _crear_jornada_hoy(db)
+
+def _copia(j: Jornada) -> JornadaActiva:
+    return JornadaActiva(id=j.id, fecha=j.fecha, estado=j.estado, created_at=j.created_at, closed_at=j.closed_at)
+
+def _leer_jornada_activa(db: Session) -> JornadaActiva:
+    j = _buscar_abierta(db)
     if not j:
         raise HTTPException(status_code=404, detail="No hay jornada activa. Abra una jornada primero.")
-    return j
+    return _copia(j)
+
+def _insertar_jornada_hoy(db: Session, hoy: date):
+    # Create-or-get atómico: si otro request inserta la de hoy a la vez, este no
+    # inserta nada (ni falla) y la relee. No hace commit.
+    db.execute(
+        insert_on_conflict(db, Jornada)
+        .values(fecha=hoy, estado="ABIERTA")
+        .on_conflict_do_nothing(index_elements=["fecha"])
+    )
+
+def _crear_jornada_hoy(db: Session) -> JornadaActiva:
+    _insertar_jornada_hoy(db, hoy_fecha_local())
+    j = _buscar_abierta(db)
+    if not j:
+        raise HTTPException(status_code=400, detail="La jornada de hoy ya fue cerrada.")
+    invalidar_al_confirmar(db, "jornadas")
+    return _copia(j)
+
+def obtener_jornada_activa(db: Session) -> JornadaActiva:
+    return resolver_jornada_activa(db)
+
+def jornada_abierta_para_escribir(db: Session) -> JornadaActiva:
+    # Para dar de alta pedidos. La jornada activa sale de la caché y, con el backend
+    # "memoria", otro worker pudo haberla cerrado hace menos de JORNADA_CACHE_TTL: se
+    # relee su estado por PK con FOR SHARE (como volcar_encolados). Un cierre simultáneo
+    # espera a que el alta confirme y la cancela con el resto; si ya estaba cerrada se
+    # descarta la caché y se resuelve de nuevo.
+    for _ in range(2):
+        jornada = resolver_jornada_activa(db)
+        estado = db.execute(
+            select(Jornada.estado).where(Jornada.id == jornada.id).with_for_update(read=True)
+        ).scalar()
+        if estado == "ABIERTA":
+            return jornada
+        invalidar_jornada_activa()
+    raise HTTPException(status_code=404, detail="No hay jornada activa. Abra una jornada primero.")
 
 def abrir_jornada_hoy(db: Session) -> Jornada:
-    hoy = date.today()
-
-    # Si ya existe jornada hoy, devolverla
-    existente = db.execute(
-        select(Jornada).where(Jornada.fecha == hoy)
-    ).scalars().first()
-
-    if existente:
-        # Si estaba cerrada, no la reabrimos por ahora (decisión simple)
-        if existente.estado != "ABIERTA":
-            raise HTTPException(status_code=400, detail="La jornada de hoy ya fue cerrada.")
-        return existente
-
-    # Cerrar cualquier jornada abierta anterior (por seguridad)
-    abierta = db.execute(select(Jornada).where(Jornada.estado == "ABIERTA")).scalars().first()
-    if abierta:
-        abierta.estado = "CERRADA"
-        db.add(abierta)
+    hoy = hoy_fecha_local()
+
+    # Cerrar cualquier jornada abierta anterior (por seguridad). Si la de hoy ya existe
+    # no hay otra abierta (ux_jornadas_una_abierta) y esto no toca nada. Con closed_at,
+    # como en 0003: archivar_vencidas elige las jornadas por esa fecha.
+    db.execute(
+        update(Jornada)
+        .where(Jornada.estado == "ABIERTA", Jornada.fecha != hoy)
+        .values(estado="CERRADA", closed_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+    _insertar_jornada_hoy(db, hoy)
+
+    j = db.execute(select(Jornada).where(Jornada.fecha == hoy)).scalars().one()
+    # Si estaba cerrada, no la reabrimos por ahora (decisión simple)
+    if j.estado != "ABIERTA":
+        db.rollback()
+        raise HTTPException(status_code=400, detail="La jornada de hoy ya fue cerrada.")
 
-    j = Jornada(fecha=hoy, estado="ABIERTA")
-    db.add(j)
+    invalidar_al_confirmar(db, "jornadas")
     db.commit()
     db.refresh(j)
     return j
 
-def cerrar_jornada(db: Session, jornada_id: str) -> Jornada:
+def obtener_jornada(db: Session, jornada_id: str) -> Jornada:
     j = db.get(Jornada, jornada_id)
+    if not j:
+        raise HTTPException(status_code=404, detail="Jornada no existe")
+    return j
+
+def cerrar_jornada(db: Session, jornada_id: str) -> Jornada:
+    # FOR UPDATE: serializa con otro cierre simultáneo y con los lotes de la cola de ingesta
+    j = db.get(Jornada, jornada_id, with_for_update=True)
     if not j:
         raise HTTPException(status_code=404, detail="Jornada no existe")
 
     if j.estado != "ABIERTA":
         raise HTTPException(status_code=400, detail="La jornada ya está cerrada")
 
-    # 1) Cancelar pendientes
-    pendientes = db.execute(
-        select(Pedido).where(Pedido.jornada_id == j.id, Pedido.estado == "PENDIENTE")
-    ).scalars().all()
-
-    for p in pendientes:
-        p.estado = "CANCELADO"
+    ahora = datetime.now(timezone.utc)
 
-    cancelados = len(pendientes)
+    # 1) Cancelar pendientes en un solo UPDATE (sin cargar los pedidos)
+    cancelados = db.execute(
+        update(Pedido)
+        .where(Pedido.jornada_id == j.id, Pedido.estado == "PENDIENTE", Pedido.is_deleted == False)
+        .values(estado="CANCELADO", updated_at=ahora, version=Pedido.version + 1)
+        .returning(Pedido.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
 
     # 2) Calcular snapshot (total pedidos y recaudado solo entregados)
-    # Recaudado: suma total de ENTREGADO
-    total_pedidos = db.execute(
-        select(func.count(Pedido.id)).where(Pedido.jornada_id == j.id)
-    ).scalar_one()
-
-    total_recaudado = db.execute(
-        select(func.coalesce(func.sum(Pedido.total), 0.0)).where(
-            Pedido.jornada_id == j.id,
-            Pedido.estado == "ENTREGADO"
-        )
-    ).scalar_one()
-
-    total_efectivo = db.execute(
-        select(func.coalesce(func.sum(Pedido.total), 0.0)).where(
-            Pedido.jornada_id == j.id,
-            Pedido.estado == "ENTREGADO",
-            Pedido.metodo_pago == "EFECTIVO"
-        )
-    ).scalar_one()
-
-    total_transferencia = db.execute(
-        select(func.coalesce(func.sum(Pedido.total), 0.0)).where(
-            Pedido.jornada_id == j.id,
-            Pedido.estado == "ENTREGADO",
-            Pedido.metodo_pago == "TRANSFERENCIA"
-        )
-    ).scalar_one()
+    resumen = agregar_pedidos(db, j.id)
 
     # 3) Guardar snapshot y cerrar
-    from datetime import datetime, timezone
     j.estado = "CERRADA"
-    j.closed_at = datetime.now(timezone.utc)
+    j.closed_at = ahora
+
+    j.total_pedidos = resumen.contar()
+    j.total_recaudado = resumen.total(estado="ENTREGADO")
+    j.total_efectivo = resumen.total(estado="ENTREGADO", metodo_pago="EFECTIVO")
+    j.total_transferencia = resumen.total(estado="ENTREGADO", metodo_pago="TRANSFERENCIA")
+    j.cancelados_al_cierre = len(cancelados)
 
-    j.total_pedidos = int(total_pedidos or 0)
-    j.total_recaudado = float(total_recaudado or 0.0)
-    j.total_efectivo = float(total_efectivo or 0.0)
-    j.total_transferencia = float(total_transferencia or 0.0)
-    j.cancelados_al_cierre = cancelados
+    # El rollup de la jornada se recalcula completo: las cancelaciones masivas no pasan por los deltas
+    reconstruir_resumen(db, j.id)
+    emitir_cancelados(db, j.id, cancelados)
+    invalidar_al_confirmar(db, "jornadas", f"pedidos:{j.id}")
 
     db.add(j)
     db.commit()
@@ -110,19 +169,11 @@ def hoy_fecha_local() -> date:
     # Si quieres, luego lo cambiamos a “domingo actual”
     return datetime.now().date()  
 
-def get_or_create_jornada_activa(db: Session) -> Jornada:
-    j = db.execute(
-        select(Jornada).where(Jornada.estado == "ACTIVA").order_by(Jornada.created_at.desc())
-    ).scalars().first()
-
-    if j:
-        return j
-
-    nueva = Jornada(fecha=hoy_fecha_local(), estado="ACTIVA")
-    db.add(nueva)
+def get_or_create_jornada_activa(db: Session) -> JornadaActiva:
+    jornada = resolver_jornada_activa(db, crear=True)
+    # Confirma la jornada si hubo que crearla (sin cambios pendientes no va a la BD)
     db.commit()
-    db.refresh(nueva)
-    return nueva
+    return jornada
 
 def listar_jornadas(db: Session, estado: str | None = None, limit: int = 50, offset: int = 0):
     q = select(Jornada).order_by(Jornada.created_at.desc())
@@ -131,42 +182,25 @@ def listar_jornadas(db: Session, estado: str | None = None, limit: int = 50, off
     return db.execute(q.limit(limit).offset(offset)).scalars().all()
 
 def dashboard_jornada(db: Session, jornada_id: str):
-    # Ejemplos básicos (puedes ampliarlo)
-    base = select(Pedido).where(Pedido.jornada_id == jornada_id, Pedido.is_deleted == False)
-
-    total_pedidos = db.execute(select(func.count()).select_from(base.subquery())).scalar() or 0
-
-    total_recaudado = db.execute(
-        select(func.coalesce(func.sum(Pedido.total), 0.0)).where(
-            Pedido.jornada_id == jornada_id,
-            Pedido.is_deleted == False,
-            Pedido.estado == "ENTREGADO"
-        )
-    ).scalar() or 0.0
-
-    pendientes = db.execute(
-        select(func.count()).select_from(Pedido).where(
-            Pedido.jornada_id == jornada_id, Pedido.estado == "PENDIENTE", Pedido.is_deleted == False
-        )
-    ).scalar() or 0
-
-    entregados = db.execute(
-        select(func.count()).select_from(Pedido).where(
-            Pedido.jornada_id == jornada_id, Pedido.estado == "ENTREGADO", Pedido.is_deleted == False
-        )
-    ).scalar() or 0
+    # Cada escritura de pedidos de la jornada invalida el tag pedidos:<jornada_id>
+    return cache.obtener(
+        f"dashboard:{jornada_id}", lambda: _calcular_dashboard(db, jornada_id),
+        settings.DASHBOARD_CACHE_TTL, tags=(f"pedidos:{jornada_id}",),
+    )
 
-    cancelados = db.execute(
-        select(func.count()).select_from(Pedido).where(
-            Pedido.jornada_id == jornada_id, Pedido.estado == "CANCELADO", Pedido.is_deleted == False
-        )
-    ).scalar() or 0
+def _calcular_dashboard(db: Session, jornada_id: str) -> dict:
+    resumen = agregar_pedidos_de_jornada(db, jornada_id)
 
     return {
         "jornada_id": jornada_id,
-        "total_pedidos": total_pedidos,
-        "total_recaudado": float(total_recaudado),
-        "pendientes": pendientes,
-        "entregados": entregados,
-        "cancelados": cancelados,
-    }
\ No newline at end of file
+        "total_pedidos": resumen.contar(),
+        "total_recaudado": resumen.total(estado="ENTREGADO"),
+        "pendientes": resumen.contar(estado="PENDIENTE"),
+        "entregados": resumen.contar(estado="ENTREGADO"),
+        "cancelados": resumen.contar(estado="CANCELADO"),
+        "total_efectivo": resumen.total(estado="ENTREGADO", metodo_pago="EFECTIVO"),
+        "total_transferencia": resumen.total(estado="ENTREGADO", metodo_pago="TRANSFERENCIA"),
+        "especiales": resumen.contar(es_especial=True),
+        "por_tipo_sopa": resumen.por("tipo_sopa_codigo"),
+        "por_metodo_pago": resumen.por("metodo_pago"),
+    }
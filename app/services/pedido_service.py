@@ -1,13 +1,74 @@
+import base64
+import binascii
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, update, func, literal, or_, and_, tuple_
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm.exc import StaleDataError
 from fastapi import HTTPException
+from app import metrics
+from app.cache import invalidar_al_confirmar
+from app.config import settings
+from app.database import insert_on_conflict
+from app.eventos import emitir, emitir_pedido
+from app.models.jornada import Jornada
 from app.models.pedido import Pedido
-from app.services.catalogo_service import get_por_codigo
-from app.services.jornada_service import obtener_jornada_activa
+from app.models.pedido_archivo import PedidoArchivo
+from app.schemas.pedido import CAMPOS_PEDIDO_OUT
+from app.services.catalogo_service import get_por_codigo, mapa_tipos
+from app.services.jornada_service import hoy_fecha_local, jornada_abierta_para_escribir, obtener_jornada_activa
+from app.services.reportes_service import estado_venta, registrar_cambio, registrar_cambios
 
 VALID_METODO = {"EFECTIVO", "TRANSFERENCIA"}
 VALID_ESTADO = {"PENDIENTE", "ENTREGADO", "CANCELADO"}
 
+MAX_PEDIDOS_BATCH = 500
+MAX_CAMBIOS_PAGINA = 500
+MAX_PEDIDOS_PAGINA = 500
+# Las filas más nuevas que esto se dejan para el siguiente poll: así una transacción
+# que confirma tarde con un updated_at anterior al cursor no se pierde.
+MARGEN_CAMBIOS = timedelta(seconds=2)
+
+COLUMNAS_PEDIDO_OUT = tuple(getattr(Pedido, c) for c in CAMPOS_PEDIDO_OUT)
+COLUMNAS_ARCHIVO_OUT = tuple(getattr(PedidoArchivo, c) for c in CAMPOS_PEDIDO_OUT)
+# Lo que se puede pedir con fields=. cliente no está en PedidoOut pero la app de reparto lo necesita.
+CAMPOS_PROYECTABLES = (*CAMPOS_PEDIDO_OUT, "cliente")
+
+IDEMPOTENCIA_CACHE = metrics.Contador("idempotencia_cache_total", "Búsquedas de client_request_id en la caché por resultado")
+PEDIDOS_REINTENTOS = metrics.Contador("pedidos_reintentos_total", "POST /pedidos repetidos, por dónde se detectaron")
+
+# LRU con TTL de client_request_id -> id de los pedidos creados (o vistos) hace poco
+_lock_recientes = threading.Lock()
+_recientes: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+def _recordar(ids: dict[str, str]):
+    expira = time.monotonic() + settings.IDEMPOTENCIA_CACHE_TTL
+    with _lock_recientes:
+        for crid, pedido_id in ids.items():
+            _recientes[crid] = (pedido_id, expira)
+            _recientes.move_to_end(crid)
+        while len(_recientes) > settings.IDEMPOTENCIA_CACHE_MAX:
+            _recientes.popitem(last=False)
+
+def _recordado(crid: str) -> str | None:
+    with _lock_recientes:
+        entrada = _recientes.get(crid)
+        if entrada is not None and entrada[1] <= time.monotonic():
+            del _recientes[crid]
+            entrada = None
+        if entrada is not None:
+            _recientes.move_to_end(crid)
+    IDEMPOTENCIA_CACHE.inc(resultado="hit" if entrada else "miss")
+    return entrada[0] if entrada else None
+
+def olvidar_recientes():
+    with _lock_recientes:
+        _recientes.clear()
+
 def _calcular_total_y_vuelto(tipo_precio: float, cantidad: int, pago_exacto: bool, monto_pagado: float):
     total = float(tipo_precio) * int(cantidad)
     if pago_exacto:
@@ -17,7 +78,7 @@ def _calcular_total_y_vuelto(tipo_precio: float, cantidad: int, pago_exacto: boo
     vuelto = float(monto_pagado) - total
     return total, vuelto, float(monto_pagado)
 
-def crear_pedido(db: Session, payload) -> Pedido:
+def _validar_pedido_nuevo(payload):
     if payload.metodo_pago not in VALID_METODO:
         raise HTTPException(status_code=400, detail="MetodoPago inválido")
     if payload.cantidad <= 0:
@@ -31,17 +92,15 @@ def crear_pedido(db: Session, payload) -> Pedido:
     if not payload.es_especial:
         payload.descripcion_especial = None
 
-    tipo = get_por_codigo(db, payload.tipo_sopa_codigo)
-
+def _construir_fila(payload, tipo_precio: float, jornada_id: str) -> dict:
     total, vuelto, monto_final = _calcular_total_y_vuelto(
-        tipo_precio=tipo.precio,
+        tipo_precio=tipo_precio,
         cantidad=payload.cantidad,
         pago_exacto=payload.pago_con_monto_exacto,
         monto_pagado=payload.monto_pagado,
     )
-    jornada = obtener_jornada_activa(db)
-    pedido = Pedido(
-        jornada_id=jornada.id,
+    return dict(
+        jornada_id=jornada_id,
         client_request_id=payload.client_request_id,
         client_id=payload.client_id,
 
@@ -55,28 +114,257 @@ def crear_pedido(db: Session, payload) -> Pedido:
         total=total,
         vuelto=vuelto,
         estado="PENDIENTE",
- 
 
         es_especial=getattr(payload, "es_especial", False),
         descripcion_especial=getattr(payload, "descripcion_especial", None),
     )
 
-    db.add(pedido)
+def _archivo_reciente():
+    # Reintentos de pedidos que ya pasaron a pedidos_archivo: ahí el ON CONFLICT de pedidos
+    # no los frena. Se buscan solo en las jornadas de los últimos IDEMPOTENCIA_ARCHIVO_DIAS:
+    # con fecha, Postgres descarta las particiones viejas y el costo no crece con el historial.
+    return PedidoArchivo.fecha >= hoy_fecha_local() - timedelta(days=settings.IDEMPOTENCIA_ARCHIVO_DIAS)
+
+def _archivados(db: Session, crids: list[str]) -> dict[str, str]:
+    return dict(db.execute(
+        select(PedidoArchivo.client_request_id, PedidoArchivo.id)
+        .where(PedidoArchivo.client_request_id.in_(crids), _archivo_reciente())
+    ).all())
+
+def _insertar_pedido(db: Session, fila: dict):
+    # INSERT ... SELECT ... WHERE NOT EXISTS (archivo reciente) ON CONFLICT DO NOTHING
+    # RETURNING: el chequeo del archivo va en el mismo round-trip que el alta
+    columnas = Pedido.__table__.c
+    archivado = (
+        select(PedidoArchivo.id)
+        .where(PedidoArchivo.client_request_id == fila["client_request_id"], _archivo_reciente())
+        .exists()
+    )
+    nueva = select(*(literal(v, columnas[k].type).label(k) for k, v in fila.items())).where(~archivado)
+    return db.execute(
+        insert_on_conflict(db, Pedido)
+        .from_select(list(fila), nueva)
+        .on_conflict_do_nothing(index_elements=["client_request_id"])
+        .returning(*COLUMNAS_PEDIDO_OUT)
+    ).first()
+
+def _pedido_archivado(db: Session, crid: str):
+    return db.execute(
+        select(*COLUMNAS_ARCHIVO_OUT).where(PedidoArchivo.client_request_id == crid)
+    ).first()
+
+def crear_pedido(db: Session, payload) -> tuple[object, bool]:
+    # Devuelve (pedido, creado). Un reenvío del mismo client_request_id devuelve el pedido
+    # original con creado=False: sin IntegrityError ni transacción desperdiciada.
+    crid = payload.client_request_id
+    pedido_id = _recordado(crid)
+    if pedido_id is not None:
+        # Reintento reciente en este worker: ni validación ni catálogo ni jornada
+        fila = db.execute(select(*COLUMNAS_PEDIDO_OUT).where(Pedido.id == pedido_id)).first()
+        if fila is not None:
+            PEDIDOS_REINTENTOS.inc(detectado="cache")
+            return fila, False
+
+    _validar_pedido_nuevo(payload)
+
+    tipo = get_por_codigo(db, payload.tipo_sopa_codigo)
+    jornada = jornada_abierta_para_escribir(db)
+    fila = _construir_fila(payload, tipo.precio, jornada.id)
+
+    creado = _insertar_pedido(db, fila)
+    if creado is None:
+        # Ya existía (en pedidos o en el archivo): el reintento llegó a otro worker o
+        # después del TTL
+        existente = db.execute(
+            select(*COLUMNAS_PEDIDO_OUT).where(Pedido.client_request_id == crid)
+        ).first() or _pedido_archivado(db, crid)
+        db.rollback()
+        if existente is None:
+            # Chocó con una fila que ya no está en ninguna de las dos tablas (se purgó
+            # o se archivó entre el INSERT y esta lectura): que el cliente reintente
+            raise HTTPException(status_code=409, detail="El pedido cambió mientras se creaba, reintente")
+        _recordar({crid: existente.id})
+        PEDIDOS_REINTENTOS.inc(detectado="insert")
+        return existente, False
+
+    registrar_cambio(db, None, estado_venta(fila))
+    emitir_pedido(db, "creado", creado, CAMPOS_PEDIDO_OUT)
+    invalidar_al_confirmar(db, f"pedidos:{creado.jornada_id}")
     db.commit()
-    db.refresh(pedido)
-    return pedido
+    _recordar({crid: creado.id})
+    return creado, True
+
+def pedido_ya_creado(db: Session, crid: str) -> str | None:
+    # Para la cola de ingesta, antes de encolar: id del pedido ya guardado con ese
+    # client_request_id (caché de reintentos, después pedidos y el archivo). Si la BD
+    # no responde devuelve None y el pedido se encola igual: la cola existe para seguir
+    # aceptando pedidos así, y el volcado descarta el duplicado.
+    pedido_id = _recordado(crid)
+    if pedido_id is not None:
+        return pedido_id
+    try:
+        pedido_id = db.execute(
+            select(Pedido.id).where(Pedido.client_request_id == crid)
+            .union_all(select(PedidoArchivo.id).where(PedidoArchivo.client_request_id == crid, _archivo_reciente()))
+        ).scalar()
+    except DBAPIError:
+        db.rollback()
+        return None
+    if pedido_id is not None:
+        _recordar({crid: pedido_id})
+    return pedido_id
+
+def preparar_pedido(db: Session, payload) -> dict:
+    # Para la cola de ingesta: mismas validaciones y cálculo que crear_pedido, sin escribir.
+    # id y fechas se fijan al recibirlo, no cuando la fila llega a la BD.
+    _validar_pedido_nuevo(payload)
+
+    tipo = get_por_codigo(db, payload.tipo_sopa_codigo)
+    # La de la caché alcanza: volcar_encolados vuelve a revisar su estado con FOR SHARE
+    jornada = obtener_jornada_activa(db)
+    ahora = datetime.now(timezone.utc)
+    fila = _construir_fila(payload, tipo.precio, jornada.id)
+    fila.update(id=str(uuid.uuid4()), created_at=ahora, updated_at=ahora)
+    return fila
+
+def insertar_filas(db: Session, filas: list[dict]) -> tuple[list, dict[str, str]]:
+    # Un único INSERT ... ON CONFLICT (client_request_id) DO NOTHING RETURNING para filas ya
+    # validadas. Solo las que entraron suman al rollup y emiten evento. Devuelve las filas
+    # insertadas y {client_request_id: id} de las que ya existían (reintentos), también
+    # las que ya están en el archivo y por eso no se insertan.
+    archivados = _archivados(db, [f["client_request_id"] for f in filas])
+    filas = [f for f in filas if f["client_request_id"] not in archivados]
+    if not filas:
+        return [], archivados
+    stmt = (
+        insert_on_conflict(db, Pedido)
+        .values(filas)
+        .on_conflict_do_nothing(index_elements=["client_request_id"])
+        .returning(*COLUMNAS_PEDIDO_OUT)
+    )
+    insertados = db.execute(stmt).all()
+    creados = {p.client_request_id for p in insertados}
+    registrar_cambios(db, [(None, estado_venta(f)) for f in filas if f["client_request_id"] in creados])
+    for p in insertados:
+        emitir_pedido(db, "creado", p, CAMPOS_PEDIDO_OUT)
+    invalidar_al_confirmar(db, *{f"pedidos:{p.jornada_id}" for p in insertados})
+
+    existentes_ids = [f["client_request_id"] for f in filas if f["client_request_id"] not in creados]
+    existentes: dict[str, str] = dict(archivados)
+    if existentes_ids:
+        existentes.update(db.execute(
+            select(Pedido.client_request_id, Pedido.id)
+            .where(Pedido.client_request_id.in_(existentes_ids))
+        ).all())
+    return insertados, existentes
+
+def volcar_encolados(db: Session, filas: list[dict]) -> tuple[dict[str, str], int]:
+    # Vuelca un lote de la cola de ingesta (app/ingesta.py). Las jornadas se leen FOR SHARE:
+    # un cierre en curso espera a que el lote confirme, y si la jornada ya se cerró mientras
+    # sus pedidos esperaban en la cola, entran como CANCELADO (lo que habría hecho el cierre).
+    # Devuelve {client_request_id: id} de todo el lote y cuántos se insertaron.
+    estados = dict(db.execute(
+        select(Jornada.id, Jornada.estado)
+        .where(Jornada.id.in_({f["jornada_id"] for f in filas}))
+        .with_for_update(read=True)
+    ).all())
+    for f in filas:
+        if estados.get(f["jornada_id"]) != "ABIERTA":
+            f["estado"] = "CANCELADO"
+
+    insertados, existentes = insertar_filas(db, filas)
+    db.commit()
+    ids = {**{p.client_request_id: p.id for p in insertados}, **existentes}
+    _recordar(ids)
+    return ids, len(insertados)
+
+def crear_pedidos_batch(db: Session, payloads: list) -> list[dict]:
+    # Sincronización de la cola offline: catálogo y jornada se resuelven una sola vez
+    # y todo el lote entra en un único INSERT ... ON CONFLICT DO NOTHING.
+    if len(payloads) > MAX_PEDIDOS_BATCH:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_PEDIDOS_BATCH} pedidos por lote")
+
+    tipos = mapa_tipos(db)
+    jornada = jornada_abierta_para_escribir(db)
+
+    resultados: list[dict] = []
+    filas: list[dict] = []
+    vistos: set[str] = set()
+
+    for payload in payloads:
+        resultado = {"client_request_id": payload.client_request_id, "resultado": None,
+                     "pedido_id": None, "detalle": None}
+        resultados.append(resultado)
+
+        if payload.client_request_id in vistos:
+            resultado["resultado"] = "DUPLICADO"
+            continue
+        vistos.add(payload.client_request_id)
+
+        try:
+            _validar_pedido_nuevo(payload)
+            tipo = tipos.get(payload.tipo_sopa_codigo)
+            if not tipo:
+                raise HTTPException(status_code=404, detail="Tipo de sopa no existe")
+            filas.append(_construir_fila(payload, tipo.precio, jornada.id))
+        except HTTPException as e:
+            resultado["resultado"] = "RECHAZADO"
+            resultado["detalle"] = e.detail
+
+    creados: dict[str, str] = {}
+    existentes: dict[str, str] = {}
+    if filas:
+        # Los que no vuelven en RETURNING ya existían (reintento del dispositivo)
+        insertados, existentes = insertar_filas(db, filas)
+        creados = {p.client_request_id: p.id for p in insertados}
+    db.commit()
+    _recordar({**creados, **existentes})
+
+    for resultado in resultados:
+        crid = resultado["client_request_id"]
+        if resultado["resultado"] == "RECHAZADO":
+            continue
+        if resultado["resultado"] is None and crid in creados:
+            resultado["resultado"] = "CREADO"
+            resultado["pedido_id"] = creados[crid]
+        else:
+            resultado["resultado"] = "DUPLICADO"
+            resultado["pedido_id"] = creados.get(crid) or existentes.get(crid)
+    return resultados
 
 def listar_pedidos(db: Session):
     return db.execute(select(Pedido).order_by(Pedido.created_at.desc())).scalars().all()
 
-def obtener_pedido(db: Session, pedido_id: str) -> Pedido:
+def obtener_pedido(db: Session, pedido_id: str, archivo: bool = False) -> Pedido:
+    # archivo=True: si no está en pedidos se busca en pedidos_archivo (solo lectura, GET).
+    # Un pedido borrado (soft delete) no existe para la API: solo viaja por el feed de cambios.
     pedido = db.get(Pedido, pedido_id)
+    if pedido is not None and pedido.is_deleted:
+        pedido = None
+    elif not pedido and archivo:
+        pedido = db.execute(select(PedidoArchivo).where(PedidoArchivo.id == pedido_id)).scalars().first()
     if not pedido:
         raise HTTPException(status_code=404, detail="Pedido no existe")
     return pedido
 
-def actualizar_pedido(db: Session, pedido_id: str, payload) -> Pedido:
-    pedido = obtener_pedido(db, pedido_id)
+def _leer_pedido(db: Session, pedido_id: str):
+    fila = db.execute(
+        select(*COLUMNAS_PEDIDO_OUT).where(Pedido.id == pedido_id, Pedido.is_deleted == False)
+    ).first()
+    if fila is None:
+        raise HTTPException(status_code=404, detail="Pedido no existe")
+    return fila
+
+def actualizar_pedido(db: Session, pedido_id: str, payload, versiones: set[int] | None = None):
+    # Lee columnas (sin ORM), valida y escribe con un único UPDATE condicionado a la
+    # versión leída con RETURNING: sin setattr + flush ni refresh posterior.
+    # versiones = etags de If-Match (None = sin condición).
+    actual = _leer_pedido(db, pedido_id)
+    if versiones is not None and actual.version not in versiones:
+        raise HTTPException(
+            status_code=412,
+            detail=f"El pedido fue modificado (versión actual {actual.version})",
+        )
     data = payload.model_dump(exclude_unset=True)
 
     # 1) Validaciones base
@@ -88,8 +376,8 @@ def actualizar_pedido(db: Session, pedido_id: str, payload) -> Pedido:
         raise HTTPException(status_code=400, detail="Cantidad inválida")
 
     # 2) Reglas de ESPECIAL (sin mutar aún)
-    es_especial_actual = pedido.es_especial
-    desc_actual = pedido.descripcion_especial
+    es_especial_actual = actual.es_especial
+    desc_actual = actual.descripcion_especial
 
     # valores "finales" (si no vienen en el PATCH, se quedan como estaban)
     nuevo_es_especial = data.get("es_especial", es_especial_actual)
@@ -112,36 +400,272 @@ def actualizar_pedido(db: Session, pedido_id: str, payload) -> Pedido:
     if "es_especial" in data and (nuevo_es_especial is False):
         data["descripcion_especial"] = None
 
-    # 3) Aplicar cambios simples
-    for k, v in data.items():
-        setattr(pedido, k, v)
+    if not data:
+        return actual
 
-    # 4) Recalcular total/vuelto si cambió lo que afecta el cálculo
+    # 3) Recalcular total/vuelto si cambió lo que afecta el cálculo
     if any(k in data for k in ["tipo_sopa_codigo", "cantidad", "pago_con_monto_exacto", "monto_pagado"]):
-        tipo = get_por_codigo(db, pedido.tipo_sopa_codigo)
+        final = {**actual._asdict(), **data}
+        tipo = get_por_codigo(db, final["tipo_sopa_codigo"])
         total, vuelto, monto_final = _calcular_total_y_vuelto(
             tipo_precio=tipo.precio,
-            cantidad=pedido.cantidad,
-            pago_exacto=pedido.pago_con_monto_exacto,
-            monto_pagado=pedido.monto_pagado,
+            cantidad=final["cantidad"],
+            pago_exacto=final["pago_con_monto_exacto"],
+            monto_pagado=final["monto_pagado"],
         )
-        pedido.total = total
-        pedido.vuelto = vuelto
-        pedido.monto_pagado = monto_final
+        data.update(total=total, vuelto=vuelto, monto_pagado=monto_final)
+
+    # 4) UPDATE ... WHERE id = :id AND version = :v RETURNING (y que no se haya borrado)
+    fila = db.execute(
+        update(Pedido)
+        .where(Pedido.id == pedido_id, Pedido.version == actual.version, Pedido.is_deleted == False)
+        .values(**data, updated_at=datetime.now(timezone.utc), version=Pedido.version + 1)
+        .returning(*COLUMNAS_PEDIDO_OUT)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if fila is None:
+        # Otro dispositivo escribió entre la lectura y el UPDATE
+        db.rollback()
+        raise HTTPException(status_code=409, detail="El pedido cambió mientras se actualizaba, vuelve a intentar")
 
+    registrar_cambio(db, estado_venta(actual), estado_venta(fila))
+    emitir_pedido(db, "actualizado", fila, CAMPOS_PEDIDO_OUT)
+    invalidar_al_confirmar(db, f"pedidos:{fila.jornada_id}")
     db.commit()
-    db.refresh(pedido)
-    return pedido
+    return fila
 
+# Lo que hace falta leer antes del UPDATE masivo: versión, borrado y lo que aporta al rollup
+COLUMNAS_ESTADO_VENTA = (
+    Pedido.id, Pedido.version, Pedido.is_deleted, Pedido.jornada_id,
+    Pedido.tipo_sopa_codigo, Pedido.metodo_pago, Pedido.estado, Pedido.cantidad, Pedido.total,
+)
 
-def eliminar_pedido(db: Session, pedido_id: str):
-    pedido = obtener_pedido(db, pedido_id)
-    db.delete(pedido)
+def cambiar_estado_pedidos(db: Session, payload) -> list[dict]:
+    # POST /pedidos/estado: fin del recorrido de reparto, muchos pedidos a un mismo estado.
+    # * ids: una lectura + un UPDATE ... WHERE (id, version) IN (...) RETURNING. La
+    #   versión leída hace de If-Match por fila: lo que cambió en el medio vuelve CONFLICTO.
+    # * jornada_id + estado_actual: un solo UPDATE; el estado anterior ya se conoce.
+    # Rollup, eventos y caché quedan igual que con un PATCH por pedido.
+    if payload.estado not in VALID_ESTADO:
+        raise HTTPException(status_code=400, detail="Estado inválido")
+    if payload.ids is not None:
+        if payload.jornada_id is not None or payload.estado_actual is not None:
+            raise HTTPException(status_code=400, detail="Use ids o jornada_id + estado_actual, no ambos")
+        if len(payload.ids) > MAX_PEDIDOS_BATCH:
+            raise HTTPException(status_code=400, detail=f"Máximo {MAX_PEDIDOS_BATCH} pedidos por cambio")
+        return _cambiar_estado_ids(db, list(dict.fromkeys(payload.ids)), payload.estado)
+    if payload.jornada_id is None or payload.estado_actual is None:
+        raise HTTPException(status_code=400, detail="Se requieren ids, o jornada_id y estado_actual")
+    if payload.estado_actual not in VALID_ESTADO:
+        raise HTTPException(status_code=400, detail="Estado inválido")
+    return _cambiar_estado_filtro(db, payload.jornada_id, payload.estado_actual, payload.estado)
+
+def _aplicar_estado(db: Session, condicion, estado: str) -> list:
+    return db.execute(
+        update(Pedido)
+        .where(condicion)
+        .values(estado=estado, updated_at=datetime.now(timezone.utc), version=Pedido.version + 1)
+        .returning(*COLUMNAS_PEDIDO_OUT)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+def _confirmar_estados(db: Session, cambios: list[tuple]):
+    # cambios = [(estado_venta antes, fila de RETURNING), ...]
+    if cambios:
+        registrar_cambios(db, [(antes, estado_venta(fila)) for antes, fila in cambios])
+        for _, fila in cambios:
+            emitir_pedido(db, "actualizado", fila, CAMPOS_PEDIDO_OUT)
+        invalidar_al_confirmar(db, *{f"pedidos:{fila.jornada_id}" for _, fila in cambios})
     db.commit()
 
+def _resultado_estado(fila, resultado: str = "ACTUALIZADO") -> dict:
+    return {"pedido_id": fila.id, "resultado": resultado, "estado": fila.estado,
+            "version": fila.version, "updated_at": fila.updated_at, "detalle": None}
+
+def _cambiar_estado_ids(db: Session, ids: list[str], estado: str) -> list[dict]:
+    actuales = {f.id: f for f in db.execute(select(*COLUMNAS_ESTADO_VENTA).where(Pedido.id.in_(ids)))}
+
+    resultados: dict[str, dict] = {}
+    candidatos = []
+    for pedido_id in ids:
+        actual = actuales.get(pedido_id)
+        if actual is None:
+            resultados[pedido_id] = {"pedido_id": pedido_id, "resultado": "NO_EXISTE", "detalle": "Pedido no existe"}
+        elif actual.is_deleted:
+            resultados[pedido_id] = {"pedido_id": pedido_id, "resultado": "RECHAZADO", "detalle": "Pedido eliminado"}
+        elif actual.estado == estado:
+            resultados[pedido_id] = {"pedido_id": pedido_id, "resultado": "SIN_CAMBIO", "estado": estado, "version": actual.version}
+        else:
+            candidatos.append(actual)
+
+    cambios = []
+    if candidatos:
+        filas = _aplicar_estado(
+            db, tuple_(Pedido.id, Pedido.version).in_([(a.id, a.version) for a in candidatos]), estado
+        )
+        for fila in filas:
+            cambios.append((estado_venta(actuales[fila.id]), fila))
+            resultados[fila.id] = _resultado_estado(fila)
+        for a in candidatos:
+            resultados.setdefault(a.id, {
+                "pedido_id": a.id, "resultado": "CONFLICTO",
+                "detalle": "El pedido cambió mientras se actualizaba, vuelve a intentar",
+            })
+    _confirmar_estados(db, cambios)
+    return [resultados[pedido_id] for pedido_id in ids]
+
+def _cambiar_estado_filtro(db: Session, jornada_id: str, estado_actual: str, estado: str) -> list[dict]:
+    if estado_actual == estado:
+        return []
+    filas = _aplicar_estado(
+        db, and_(Pedido.jornada_id == jornada_id, Pedido.estado == estado_actual, Pedido.is_deleted == False), estado
+    )
+    # Todas venían de estado_actual: el "antes" del rollup es la misma fila con ese estado
+    _confirmar_estados(db, [({**estado_venta(f), "estado": estado_actual}, f) for f in filas])
+    return [_resultado_estado(f) for f in filas]
+
+
+def eliminar_pedido(db: Session, pedido_id: str):
+    # Soft delete: el borrado viaja a los demás dispositivos por el feed de cambios.
+    # Borrar dos veces no es error (reintento de un dispositivo offline).
+    pedido = db.get(Pedido, pedido_id)
+    if not pedido:
+        raise HTTPException(status_code=404, detail="Pedido no existe")
+    if pedido.is_deleted:
+        return
+    registrar_cambio(db, estado_venta(pedido), None)
+    pedido.is_deleted = True
+    pedido.deleted_at = datetime.now(timezone.utc)
+    emitir(db, "eliminado", {"id": pedido.id, "jornada_id": pedido.jornada_id, "deleted_at": pedido.deleted_at})
+    invalidar_al_confirmar(db, f"pedidos:{pedido.jornada_id}")
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="El pedido cambió mientras se eliminaba, vuelve a intentar")
+
 def listar_pedidos_de_jornada(db: Session, jornada_id: str):
     return db.execute(
         select(Pedido)
         .where(Pedido.jornada_id == jornada_id, Pedido.is_deleted == False)
         .order_by(Pedido.created_at.desc())
-    ).scalars().all()
\ No newline at end of file
+    ).scalars().all()
+
+def listar_filas_de_jornada(db: Session, jornada_id: str):
+    # Igual que listar_pedidos_de_jornada pero solo columnas: sin identity map ni objetos ORM
+    return db.execute(
+        select(*COLUMNAS_PEDIDO_OUT)
+        .where(Pedido.jornada_id == jornada_id, Pedido.is_deleted == False)
+        .order_by(Pedido.created_at.desc())
+    ).all()
+
+def _codificar_cursor(momento: datetime, pedido_id: str) -> str:
+    raw = f"{momento.isoformat()}|{pedido_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decodificar_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        momento, pedido_id = raw.split("|", 1)
+        return datetime.fromisoformat(momento), pedido_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def listar_cambios(db: Session, since: str | None = None, limit: int = 200) -> dict:
+    # Incluye tombstones (is_deleted=True) para que los borrados también se sincronicen
+    if limit <= 0 or limit > MAX_CAMBIOS_PAGINA:
+        raise HTTPException(status_code=400, detail=f"limit debe estar entre 1 y {MAX_CAMBIOS_PAGINA}")
+
+    q = select(Pedido).where(Pedido.updated_at < datetime.now(timezone.utc) - MARGEN_CAMBIOS)
+    if since:
+        momento, pedido_id = _decodificar_cursor(since)
+        q = q.where(or_(
+            Pedido.updated_at > momento,
+            and_(Pedido.updated_at == momento, Pedido.id > pedido_id),
+        ))
+
+    cambios = db.execute(
+        q.order_by(Pedido.updated_at.asc(), Pedido.id.asc()).limit(limit + 1)
+    ).scalars().all()
+
+    has_more = len(cambios) > limit
+    cambios = cambios[:limit]
+    if cambios:
+        next_cursor = _codificar_cursor(cambios[-1].updated_at, cambios[-1].id)
+    else:
+        next_cursor = since
+
+    return {"cambios": cambios, "next_cursor": next_cursor, "has_more": has_more}
+
+def _campos_pedidos(fields: str | None) -> tuple[str, ...]:
+    if not fields:
+        return CAMPOS_PEDIDO_OUT
+    campos = tuple(dict.fromkeys(c.strip() for c in fields.split(",") if c.strip()))
+    desconocidos = [c for c in campos if c not in CAMPOS_PROYECTABLES]
+    if not campos or desconocidos:
+        raise HTTPException(status_code=400, detail=f"fields inválido: {', '.join(desconocidos) or fields}")
+    return campos
+
+def marca_pedidos(db: Session, jornada_id: str) -> tuple:
+    # Marca de agua para el ETag de GET /pedidos: una consulta agregada sobre
+    # ix_pedidos_jornada_created_id en vez del listado. count cambia con altas y
+    # borrados, sum(version) con cada cambio y max(updated_at) por si ambos coinciden.
+    return tuple(db.execute(
+        select(func.count(), func.coalesce(func.sum(Pedido.version), 0), func.max(Pedido.updated_at))
+        .where(Pedido.jornada_id == jornada_id, Pedido.is_deleted == False)
+    ).one())
+
+def listar_pagina_pedidos(
+    db: Session,
+    jornada_id: str | None = None,
+    *,
+    estado: str | None = None,
+    metodo_pago: str | None = None,
+    tipo_sopa_codigo: str | None = None,
+    es_especial: bool | None = None,
+    client_id: str | None = None,
+    fields: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
+) -> dict:
+    # GET /pedidos (jornada_id dado) y /pedidos/historico (todas las jornadas).
+    # Keyset sobre (created_at DESC, id DESC): cada página es un rango del índice
+    # ix_pedidos_jornada_created_id / ix_pedidos_created_id, sin OFFSET ni sort.
+    # limit=None = sin paginar (GET /pedidos de siempre, toda la jornada).
+    if limit is not None and (limit <= 0 or limit > MAX_PEDIDOS_PAGINA):
+        raise HTTPException(status_code=400, detail=f"limit debe estar entre 1 y {MAX_PEDIDOS_PAGINA}")
+    if estado is not None and estado not in VALID_ESTADO:
+        raise HTTPException(status_code=400, detail="Estado inválido")
+    if metodo_pago is not None and metodo_pago not in VALID_METODO:
+        raise HTTPException(status_code=400, detail="MetodoPago inválido")
+
+    campos = _campos_pedidos(fields)
+    # created_at e id van al final aunque no se pidan: hacen falta para el cursor y
+    # json_filas los ignora porque zip corta en el largo de campos
+    columnas = [getattr(Pedido, c) for c in campos] + [Pedido.created_at, Pedido.id]
+
+    q = select(*columnas).where(Pedido.is_deleted == False)
+    if jornada_id is not None:
+        q = q.where(Pedido.jornada_id == jornada_id)
+    filtros = {
+        "estado": estado, "metodo_pago": metodo_pago, "tipo_sopa_codigo": tipo_sopa_codigo,
+        "es_especial": es_especial, "client_id": client_id,
+    }
+    for columna, valor in filtros.items():
+        if valor is not None:
+            q = q.where(getattr(Pedido, columna) == valor)
+    if cursor:
+        momento, pedido_id = _decodificar_cursor(cursor)
+        # Comparación de tuplas (no OR/AND): Postgres la usa como límite del índice
+        q = q.where(tuple_(Pedido.created_at, Pedido.id) < tuple_(momento, pedido_id))
+
+    q = q.order_by(Pedido.created_at.desc(), Pedido.id.desc())
+    if limit is not None:
+        q = q.limit(limit + 1)
+    filas = db.execute(q).all()
+
+    next_cursor = None
+    if limit is not None and len(filas) > limit:
+        filas = filas[:limit]
+        next_cursor = _codificar_cursor(filas[-1][-2], filas[-1][-1])
+    return {"campos": campos, "filas": filas, "next_cursor": next_cursor}
@@ -0,0 +1,157 @@
+from datetime import date, datetime, timezone
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, func, case, literal, union_all
+from fastapi import HTTPException
+
+from app.database import insert_on_conflict
+from app.models.jornada import Jornada
+from app.models.pedido import Pedido
+from app.models.pedido_archivo import pedidos_archivo
+from app.models.venta_resumen import VentaResumen
+
+METRICAS = ("pedidos", "pendientes", "entregados", "cancelados",
+            "cantidad", "cantidad_entregada", "total", "recaudado")
+GROUP_BY_VALIDOS = {
+    "fecha": Jornada.fecha,
+    "jornada_id": VentaResumen.jornada_id,
+    "tipo_sopa_codigo": VentaResumen.tipo_sopa_codigo,
+    "metodo_pago": VentaResumen.metodo_pago,
+}
+
+def estado_venta(p) -> dict | None:
+    # Lo que aporta un pedido al rollup (acepta Pedido o dict con las mismas claves)
+    get = p.get if isinstance(p, dict) else lambda k, d=None: getattr(p, k, d)
+    if get("is_deleted", False):
+        return None
+    return {
+        "jornada_id": get("jornada_id"),
+        "tipo_sopa_codigo": get("tipo_sopa_codigo"),
+        "metodo_pago": get("metodo_pago"),
+        "estado": get("estado") or "PENDIENTE",
+        "cantidad": int(get("cantidad") or 0),
+        "total": float(get("total") or 0.0),
+    }
+
+def _vector(e: dict) -> dict:
+    entregado = e["estado"] == "ENTREGADO"
+    return {
+        "pedidos": 1,
+        "pendientes": int(e["estado"] == "PENDIENTE"),
+        "entregados": int(entregado),
+        "cancelados": int(e["estado"] == "CANCELADO"),
+        "cantidad": e["cantidad"],
+        "cantidad_entregada": e["cantidad"] if entregado else 0,
+        "total": e["total"],
+        "recaudado": e["total"] if entregado else 0.0,
+    }
+
+def registrar_cambios(db: Session, cambios: list[tuple[dict | None, dict | None]]):
+    # cambios = [(estado_venta antes, estado_venta después), ...]; None = no cuenta.
+    # Se agrupan los deltas por clave y se aplican en un solo upsert con suma.
+    deltas: dict[tuple, dict] = {}
+    for antes, despues in cambios:
+        for estado, signo in ((antes, -1), (despues, 1)):
+            if estado is None:
+                continue
+            clave = (estado["jornada_id"], estado["tipo_sopa_codigo"], estado["metodo_pago"])
+            acumulado = deltas.setdefault(clave, dict.fromkeys(METRICAS, 0))
+            for k, v in _vector(estado).items():
+                acumulado[k] += signo * v
+
+    filas = [
+        {"jornada_id": j, "tipo_sopa_codigo": t, "metodo_pago": m, **d}
+        for (j, t, m), d in deltas.items()
+        if any(d.values())
+    ]
+    if not filas:
+        return
+
+    stmt = insert_on_conflict(db, VentaResumen).values(filas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["jornada_id", "tipo_sopa_codigo", "metodo_pago"],
+        set_={
+            **{k: getattr(VentaResumen, k) + getattr(stmt.excluded, k) for k in METRICAS},
+            "updated_at": datetime.now(timezone.utc),
+        },
+    )
+    db.execute(stmt)
+
+def registrar_cambio(db: Session, antes: dict | None, despues: dict | None):
+    registrar_cambios(db, [(antes, despues)])
+
+def _pedidos_vigentes(jornada_id: str | None):
+    # pedidos + pedidos_archivo: reconstruir todo no puede perder las jornadas archivadas
+    partes = []
+    for tabla in (Pedido.__table__, pedidos_archivo):
+        q = select(
+            tabla.c.jornada_id, tabla.c.tipo_sopa_codigo, tabla.c.metodo_pago,
+            tabla.c.estado, tabla.c.cantidad, tabla.c.total,
+        ).where(tabla.c.is_deleted == False)
+        if jornada_id:
+            q = q.where(tabla.c.jornada_id == jornada_id)
+        partes.append(q)
+    return union_all(*partes).subquery("p")
+
+def reconstruir_resumen(db: Session, jornada_id: str | None = None) -> int:
+    # Recalcula el rollup desde pedidos (backfill o cierre de jornada). No hace commit.
+    borrar = delete(VentaResumen)
+    if jornada_id:
+        borrar = borrar.where(VentaResumen.jornada_id == jornada_id)
+    db.execute(borrar)
+
+    p = _pedidos_vigentes(jornada_id).c
+    entregado = p.estado == "ENTREGADO"
+    q = (
+        select(
+            p.jornada_id,
+            p.tipo_sopa_codigo,
+            p.metodo_pago,
+            func.count(),
+            func.sum(case((p.estado == "PENDIENTE", 1), else_=0)),
+            func.sum(case((entregado, 1), else_=0)),
+            func.sum(case((p.estado == "CANCELADO", 1), else_=0)),
+            func.coalesce(func.sum(p.cantidad), 0),
+            func.coalesce(func.sum(case((entregado, p.cantidad), else_=0)), 0),
+            func.coalesce(func.sum(p.total), 0.0),
+            func.coalesce(func.sum(case((entregado, p.total), else_=0.0)), 0.0),
+            literal(datetime.now(timezone.utc)),
+        )
+        .group_by(p.jornada_id, p.tipo_sopa_codigo, p.metodo_pago)
+    )
+
+    columnas = ["jornada_id", "tipo_sopa_codigo", "metodo_pago", *METRICAS, "updated_at"]
+    return db.execute(VentaResumen.__table__.insert().from_select(columnas, q)).rowcount
+
+def reporte_ventas(db: Session, desde: date | None = None, hasta: date | None = None,
+                   group_by: list[str] | None = None) -> list[dict]:
+    # Lee solo el rollup (una fila por jornada x tipo x método): O(días), no O(pedidos)
+    group_by = group_by or ["fecha"]
+    invalidos = [g for g in group_by if g not in GROUP_BY_VALIDOS]
+    if invalidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"group_by inválido: {', '.join(invalidos)}. Use: {', '.join(GROUP_BY_VALIDOS)}",
+        )
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=400, detail="desde no puede ser mayor que hasta")
+
+    dims = [GROUP_BY_VALIDOS[g].label(g) for g in group_by]
+    q = (
+        select(*dims, *[func.sum(getattr(VentaResumen, m)).label(m) for m in METRICAS])
+        .join(Jornada, Jornada.id == VentaResumen.jornada_id)
+        .group_by(*[GROUP_BY_VALIDOS[g] for g in group_by])
+        .having(func.sum(VentaResumen.pedidos) > 0)
+        .order_by(*[GROUP_BY_VALIDOS[g] for g in group_by])
+    )
+    if desde:
+        q = q.where(Jornada.fecha >= desde)
+    if hasta:
+        q = q.where(Jornada.fecha <= hasta)
+
+    salida = []
+    for fila in db.execute(q).mappings():
+        d = dict(fila)
+        for m in ("total", "recaudado"):
+            d[m] = float(d[m] or 0.0)
+        salida.append(d)
+    return salida
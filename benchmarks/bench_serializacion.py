@@ -0,0 +1,87 @@
+"""Costo por fila de GET /pedidos: camino ORM + Pydantic vs columnas + orjson.
+
+    python -m benchmarks.bench_serializacion --pedidos 5000
+
+"antes" reproduce lo que hacía FastAPI con response_model=list[PedidoOut]:
+entidades ORM -> validación PedidoOut -> dump a JSON-compatible -> json.dumps.
+"después" es listar_filas_de_jornada + json_filas. Se mide con y sin la
+consulta para separar el costo de BD del de CPU.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+def _medir(fn, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+    return statistics.median(tiempos)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="Default: SQLite temporal")
+    parser.add_argument("--pedidos", type=int, default=5000)
+    parser.add_argument("--repeticiones", type=int, default=15)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url or (
+        f"sqlite:///{os.path.join(tempfile.gettempdir(), 'sopas_bench_serializacion.db')}"
+    )
+
+    from pydantic import TypeAdapter
+    from benchmarks.datos import sembrar
+    from app.database import SessionLocal
+    from app.schemas.pedido import CAMPOS_PEDIDO_OUT, PedidoOut
+    from app.serializacion import json_filas
+    from app.services.pedido_service import listar_filas_de_jornada, listar_pedidos_de_jornada
+
+    jornada_id = sembrar(1, args.pedidos, reset=args.database_url is None)["jornada_abierta"]
+    adapter = TypeAdapter(list[PedidoOut])
+
+    def antes_cpu(objs):
+        validados = adapter.validate_python(objs)
+        return json.dumps(adapter.dump_python(validados, mode="json"), ensure_ascii=False,
+                          separators=(",", ":")).encode()
+
+    db = SessionLocal()
+    try:
+        objs = listar_pedidos_de_jornada(db, jornada_id)
+        filas = listar_filas_de_jornada(db, jornada_id)
+        assert json.loads(antes_cpu(objs)) == json.loads(json_filas(CAMPOS_PEDIDO_OUT, filas))
+        n = len(filas)
+
+        def antes_total():
+            db.expunge_all()
+            antes_cpu(listar_pedidos_de_jornada(db, jornada_id))
+
+        def despues_total():
+            json_filas(CAMPOS_PEDIDO_OUT, listar_filas_de_jornada(db, jornada_id))
+
+        resultados = {
+            "filas": n,
+            "antes_us_por_fila": {
+                "solo_serializacion": round(_medir(lambda: antes_cpu(objs), args.repeticiones) / n * 1e6, 3),
+                "con_consulta": round(_medir(antes_total, args.repeticiones) / n * 1e6, 3),
+            },
+            "despues_us_por_fila": {
+                "solo_serializacion": round(
+                    _medir(lambda: json_filas(CAMPOS_PEDIDO_OUT, filas), args.repeticiones) / n * 1e6, 3),
+                "con_consulta": round(_medir(despues_total, args.repeticiones) / n * 1e6, 3),
+            },
+        }
+    finally:
+        db.close()
+
+    for clave in ("solo_serializacion", "con_consulta"):
+        a = resultados["antes_us_por_fila"][clave]
+        d = resultados["despues_us_por_fila"][clave]
+        resultados.setdefault("mejora_x", {})[clave] = round(a / d, 1) if d else None
+    print(json.dumps(resultados, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Compara dos JSON del harness y falla si hay regresiones.
+
+    python -m benchmarks.comparar base.json nuevo.json --umbral 15
+
+Sale con código 1 si algún escenario empeora su p95 o su rps más de --umbral
+por ciento, si hace más sentencias SQL por request que la base (margen 0.25) o
+si alguna consulta caliente dejó de usar su índice (planes del nuevo JSON).
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.planes import fallas
+
+def _cambio(base: float, nuevo: float) -> float:
+    return (nuevo - base) / base * 100 if base else 0.0
+
+def comparar(base: dict, nuevo: dict, umbral: float) -> tuple[list[str], list[str]]:
+    lineas, regresiones = [], []
+    lineas.append(f"{'escenario':<20} {'rps':>18} {'p95 ms':>20} {'sql/req':>14}")
+    for nombre, b in base["resultados"].items():
+        n = nuevo["resultados"].get(nombre)
+        if n is None:
+            lineas.append(f"{nombre:<20} (no está en el nuevo)")
+            continue
+        d_rps = _cambio(b["rps"], n["rps"])
+        d_p95 = _cambio(b["p95_ms"], n["p95_ms"])
+        sql_b, sql_n = b.get("sql_por_request"), n.get("sql_por_request")
+        lineas.append(
+            f"{nombre:<20} {b['rps']:>7} → {n['rps']:<7}({d_rps:+.0f}%) "
+            f"{b['p95_ms']:>7} → {n['p95_ms']:<7}({d_p95:+.0f}%) {sql_b} → {sql_n}"
+        )
+        if d_rps < -umbral:
+            regresiones.append(f"{nombre}: rps {d_rps:+.1f}%")
+        if d_p95 > umbral:
+            regresiones.append(f"{nombre}: p95 {d_p95:+.1f}%")
+        # margen chico: recargas de caché por TTL meten alguna sentencia suelta
+        if sql_b is not None and sql_n is not None and sql_n > sql_b + 0.25:
+            regresiones.append(f"{nombre}: sentencias SQL por request {sql_b} → {sql_n}")
+    regresiones += [f"plan {p}" for p in fallas(nuevo.get("planes", {}))]
+    return lineas, regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("nuevo")
+    parser.add_argument("--umbral", type=float, default=15.0, help="Tolerancia en porcentaje")
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.nuevo, encoding="utf-8") as f:
+        nuevo = json.load(f)
+
+    lineas, regresiones = comparar(base, nuevo, args.umbral)
+    print("\n".join(lineas))
+    if regresiones:
+        print("\nRegresiones:\n  " + "\n  ".join(regresiones))
+        sys.exit(1)
+    print("\nSin regresiones")
+
+if __name__ == "__main__":
+    main()
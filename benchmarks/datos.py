@@ -0,0 +1,126 @@
+"""Generador de datos para los benchmarks.
+
+Produce payloads de PedidoCreate parecidos a un domingo real y siembra N
+jornadas con M pedidos cada una (la última queda ABIERTA con fecha de hoy).
+Importa la app, así que DATABASE_URL tiene que estar definida antes.
+"""
+import random
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+
+NOMBRES = ["Carlos Pérez", "María López", "José Martínez", "Ana Gómez", "Luis Rivera",
+           "Rosa Castillo", "Pedro Ruiz", "Karla Mendoza", "Jorge Sánchez", "Elena Torres"]
+BARRIOS = ["Managua Centro", "Altamira", "Carretera Sur", "Bello Horizonte", "Las Colinas",
+           "Villa Fontana", "Ciudad Jardín", "Linda Vista", "Bolonia", "Los Robles"]
+ESPECIALES = ["Sin cebolla", "Extra queso", "Para llevar en dos bolsas", "Poco chile"]
+
+def payload_pedido(rng: random.Random | None = None, client_id: str = "bench") -> dict:
+    rng = rng or random
+    tipo = rng.choice(["CON_EMPAQUE", "CON_EMPAQUE", "SIN_EMPAQUE"])
+    cantidad = rng.choices([1, 2, 3, 4], weights=[60, 25, 10, 5])[0]
+    metodo = "TRANSFERENCIA" if rng.random() < 0.2 else "EFECTIVO"
+    exacto = metodo == "TRANSFERENCIA" or rng.random() < 0.7
+    precio = 180.0 if tipo == "CON_EMPAQUE" else 160.0
+    especial = rng.random() < 0.05
+    return {
+        "client_request_id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "client_id": client_id,
+        "cliente": rng.choice(NOMBRES),
+        "tipo_sopa_codigo": tipo,
+        "metodo_pago": metodo,
+        "cantidad": cantidad,
+        "direccion": f"{rng.choice(BARRIOS)}, casa {rng.randint(1, 300)}",
+        "pago_con_monto_exacto": exacto,
+        # paga con el billete redondo siguiente
+        "monto_pagado": 0 if exacto else float(((precio * cantidad) // 500 + 1) * 500),
+        "es_especial": especial,
+        "descripcion_especial": rng.choice(ESPECIALES) if especial else None,
+    }
+
+def _filas_jornada(rng, jornada_id: str, fecha: date, n: int, abierta: bool, precios: dict):
+    from app.schemas.pedido import PedidoCreate
+    from app.services.pedido_service import _construir_fila
+
+    inicio = datetime.combine(fecha, time(7, 0), tzinfo=timezone.utc)
+    filas = []
+    for i in range(n):
+        payload = PedidoCreate(**payload_pedido(rng))
+        fila = _construir_fila(payload, precios[payload.tipo_sopa_codigo], jornada_id)
+        momento = inicio + timedelta(seconds=int(i * 8 * 3600 / max(n, 1)))
+        if abierta:
+            fila["estado"] = rng.choices(["PENDIENTE", "ENTREGADO"], weights=[40, 60])[0]
+        else:
+            fila["estado"] = rng.choices(["ENTREGADO", "CANCELADO"], weights=[90, 10])[0]
+        fila.update(id=str(uuid.uuid4()), created_at=momento, updated_at=momento)
+        filas.append(fila)
+    return filas
+
+def sembrar(jornadas: int, pedidos_por_jornada: int, semilla: int = 42, reset: bool = False) -> dict:
+    from sqlalchemy import insert, text
+    from app.database import Base, SessionLocal, engine
+    from app.esquema import crear_todo
+    from app.main import seed_catalogo
+    from app.models.jornada import Jornada
+    from app.models.pedido import Pedido
+    from app.cache import cache
+    from app.services.catalogo_service import mapa_tipos
+    from app.services.reportes_service import reconstruir_resumen
+
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    crear_todo()
+    seed_catalogo()
+    # Con CACHE_BACKEND=sqlite/redis la caché sobrevive entre corridas
+    cache.limpiar()
+
+    rng = random.Random(semilla)
+    db = SessionLocal()
+    try:
+        precios = {codigo: t.precio for codigo, t in mapa_tipos(db).items()}
+        hoy = date.today()
+        ids = []
+        for k in range(jornadas):
+            fecha = hoy - timedelta(days=7 * (jornadas - 1 - k))
+            abierta = k == jornadas - 1
+            jid = str(uuid.uuid4())
+            db.add(Jornada(id=jid, fecha=fecha, estado="ABIERTA" if abierta else "CERRADA"))
+            db.flush()
+            filas = _filas_jornada(rng, jid, fecha, pedidos_por_jornada, abierta, precios)
+            for i in range(0, len(filas), 1000):
+                db.execute(insert(Pedido), filas[i:i + 1000])
+            ids.append(jid)
+        reconstruir_resumen(db)
+        db.commit()
+        # Estadísticas al día, como en una BD con autovacuum: si no, los planes no son realistas
+        db.execute(text("ANALYZE"))
+        db.commit()
+    finally:
+        db.close()
+    return {"jornadas": ids, "jornada_abierta": ids[-1] if ids else None}
+
+def preparar_jornada_abierta(pedidos: int, semilla: int) -> str:
+    # Para medir cerrar_jornada: cierra la abierta y crea otra con pedidos pendientes
+    from sqlalchemy import insert, update
+    from app.database import SessionLocal
+    from app.models.jornada import Jornada
+    from app.models.pedido import Pedido
+    from app.services.catalogo_service import mapa_tipos
+    from app.services.jornada_service import invalidar_jornada_activa
+
+    rng = random.Random(semilla)
+    db = SessionLocal()
+    try:
+        precios = {codigo: t.precio for codigo, t in mapa_tipos(db).items()}
+        db.execute(update(Jornada).where(Jornada.estado == "ABIERTA").values(estado="CERRADA"))
+        jid = str(uuid.uuid4())
+        fecha = date(2000, 1, 1) + timedelta(days=semilla)
+        db.add(Jornada(id=jid, fecha=fecha, estado="ABIERTA"))
+        db.flush()
+        filas = _filas_jornada(rng, jid, fecha, pedidos, True, precios)
+        for i in range(0, len(filas), 1000):
+            db.execute(insert(Pedido), filas[i:i + 1000])
+        db.commit()
+        invalidar_jornada_activa()
+        return jid
+    finally:
+        db.close()
@@ -0,0 +1,155 @@
+"""Chequeo de planes: las consultas calientes tienen que usar sus índices.
+
+    python -m benchmarks.planes                        # SQLite temporal sembrado
+    python -m benchmarks.planes --database-url postgresql+psycopg2://...
+
+Ejecuta los servicios reales (listar, histórico, dashboard, cambios, cerrar_jornada) dentro
+de una transacción que se descarta al final, captura el SQL que emiten y corre
+EXPLAIN sobre cada sentencia. En Postgres se desactiva enable_seqscan: con tablas
+chicas el planner prefiere un seq scan aunque el índice sirva, y así lo que se
+mide es si existe un índice utilizable. Sale con 1 si alguna consulta no usa el
+índice esperado, recorre pedidos completo o necesita un sort aparte.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+
+# nombre -> (servicio, prefijo de la sentencia a revisar, índices aceptados, exige orden por índice)
+def _consultas():
+    from app.services.agregados_service import agregar_pedidos_de_jornada
+    from app.services.jornada_service import cerrar_jornada
+    from app.services.pedido_service import listar_cambios, listar_pagina_pedidos, marca_pedidos
+
+    def pendientes(db, jornada_id):
+        # Lo que pide la app de reparto: una página de pendientes con cuatro columnas
+        return listar_pagina_pedidos(db, jornada_id, estado="PENDIENTE", fields="id,cliente,direccion,total", limit=50)
+
+    return {
+        "listar_pedidos": (listar_pagina_pedidos, "SELECT", {"ix_pedidos_jornada_created_id"}, True),
+        # Con pocos pendientes el planner puede preferir el índice parcial de pendientes y
+        # ordenar ese puñado de filas: ambos planes sirven
+        "listar_pendientes": (pendientes, "SELECT", {"ix_pedidos_jornada_created_id", "ix_pedidos_jornada_pendientes"}, False),
+        "historico": (lambda db, _: listar_pagina_pedidos(db, limit=100), "SELECT", {"ix_pedidos_created_id"}, True),
+        "dashboard": (agregar_pedidos_de_jornada, "SELECT", {"ix_pedidos_jornada_created_id"}, False),
+        "marca_pedidos": (marca_pedidos, "SELECT", {"ix_pedidos_jornada_created_id"}, False),
+        "cambios": (lambda db, _: listar_cambios(db), "SELECT", {"ix_pedidos_updated_at_id"}, True),
+        "cerrar_jornada": (cerrar_jornada, "UPDATE pedidos", {"ix_pedidos_jornada_pendientes"}, False),
+    }
+
+def _plan_sqlite(conn, sql, params) -> dict:
+    filas = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params).all()
+    detalles = [f[-1] for f in filas]
+    return {
+        "indices": sorted({m for d in detalles for m in re.findall(r"USING (?:COVERING )?INDEX (\w+)", d)}),
+        "seq_scan": any(re.fullmatch(r"SCAN pedidos", d) for d in detalles),
+        "sort": any("USE TEMP B-TREE FOR ORDER BY" in d for d in detalles),
+        "plan": detalles,
+    }
+
+def _plan_postgres(conn, sql, params) -> dict:
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql, params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    indices, seq_scan, sort, lineas = set(), False, False, []
+
+    def recorrer(nodo, nivel=0):
+        nonlocal seq_scan, sort
+        tipo = nodo["Node Type"]
+        lineas.append("  " * nivel + tipo + (f" using {nodo['Index Name']}" if "Index Name" in nodo else ""))
+        if "Index Name" in nodo:
+            indices.add(nodo["Index Name"])
+        if tipo == "Seq Scan" and nodo.get("Relation Name") == "pedidos":
+            seq_scan = True
+        if tipo in ("Sort", "Incremental Sort"):
+            sort = True
+        for hijo in nodo.get("Plans", []):
+            recorrer(hijo, nivel + 1)
+
+    recorrer(plan[0]["Plan"])
+    return {"indices": sorted(indices), "seq_scan": seq_scan, "sort": sort, "plan": lineas}
+
+def revisar_planes(jornada_id: str) -> dict:
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from app.database import engine
+
+    resultados = {}
+    with engine.connect() as conn:
+        trans = conn.begin()
+        if conn.dialect.name == "sqlite":
+            # pysqlite no abre la transacción antes de un SAVEPOINT: sin este BEGIN el
+            # RELEASE del commit de cerrar_jornada confirmaría de verdad
+            conn.exec_driver_sql("BEGIN")
+        # Los commits de los servicios solo liberan un savepoint; todo se descarta al final
+        db = Session(bind=conn, join_transaction_mode="create_savepoint")
+        capturadas: list[tuple[str, object]] = []
+
+        def capturar(conn_, cursor, statement, parameters, context, executemany):
+            capturadas.append((statement, parameters))
+
+        try:
+            for nombre, (servicio, prefijo, esperados, sin_sort) in _consultas().items():
+                capturadas.clear()
+                event.listen(conn, "before_cursor_execute", capturar)
+                try:
+                    servicio(db, jornada_id)
+                finally:
+                    event.remove(conn, "before_cursor_execute", capturar)
+                sql, params = next(
+                    (s, p) for s, p in capturadas
+                    if s.lstrip().upper().startswith(prefijo.upper()) and "pedidos" in s
+                )
+                explicar = _plan_postgres if conn.dialect.name == "postgresql" else _plan_sqlite
+                plan = explicar(conn, sql, params)
+                plan["esperados"] = sorted(esperados)
+                plan["ok"] = (
+                    bool(esperados & set(plan["indices"]))
+                    and not plan["seq_scan"]
+                    and not (sin_sort and plan["sort"])
+                )
+                resultados[nombre] = plan
+        finally:
+            db.close()
+            trans.rollback()
+    return resultados
+
+def fallas(planes: dict) -> list[str]:
+    return [
+        f"{nombre}: usa {p['indices'] or 'ningún índice'} (esperado {p['esperados']})"
+        + (", seq scan sobre pedidos" if p["seq_scan"] else "")
+        + (", sort aparte" if p["sort"] else "")
+        for nombre, p in planes.items() if not p["ok"]
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"),
+                        help="Default: SQLite temporal (se recrea siempre)")
+    parser.add_argument("--jornada", help="Jornada a usar (default: la abierta recién sembrada)")
+    parser.add_argument("--pedidos", type=int, default=300)
+    args = parser.parse_args()
+
+    sembrar_datos = not args.database_url
+    if sembrar_datos:
+        args.database_url = f"sqlite:///{os.path.join(tempfile.gettempdir(), 'sopas_planes.db')}"
+    os.environ["DATABASE_URL"] = args.database_url
+
+    jornada_id = args.jornada
+    if not jornada_id:
+        from benchmarks.datos import sembrar
+        jornada_id = sembrar(3, args.pedidos, reset=sembrar_datos)["jornada_abierta"]
+
+    planes = revisar_planes(jornada_id)
+    print(json.dumps(planes, indent=2, ensure_ascii=False))
+    problemas = fallas(planes)
+    if problemas:
+        print("\nPlanes con regresión:\n  " + "\n  ".join(problemas), file=sys.stderr)
+        sys.exit(1)
+    print("\nPlanes OK", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
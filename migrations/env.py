@@ -0,0 +1,54 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import text
+
+from app.database import Base, engine
+# Registrar todos los modelos en Base.metadata (autogenerate compara contra esto)
+from app.models import jornada, pedido, pedido_archivo, tipo_sopa, venta_resumen  # noqa: F401
+
+config = context.config
+
+# Desde la app (app/esquema.py) el logging ya está configurado
+if config.config_file_name is not None and not config.attributes.get("desde_app"):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Varios workers arrancando a la vez no deben migrar en paralelo
+LOCK_MIGRACIONES = 72_150_001
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    with engine.connect() as connection:
+        postgres = connection.dialect.name == "postgresql"
+        if postgres:
+            connection.execute(text("SELECT pg_advisory_lock(:k)"), {"k": LOCK_MIGRACIONES})
+            connection.commit()
+        try:
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                # SQLite no tiene ALTER completo: alembic recrea la tabla cuando hace falta
+                render_as_batch=connection.dialect.name == "sqlite",
+            )
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            if postgres:
+                connection.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": LOCK_MIGRACIONES})
+                connection.commit()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,99 @@
+"""esquema inicial
+
+El esquema tal como lo dejaba create_all antes de usar migraciones: jornadas,
+tipos_sopa y pedidos con sus índices de una columna. Las BD que ya existían se
+marcan con `alembic stamp 0001` (app/esquema.py lo hace solo) y reciben todo lo
+demás desde 0002.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 15:09:51
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('jornadas',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('opened_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('closed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('total_pedidos', sa.Integer(), nullable=False),
+    sa.Column('total_recaudado', sa.Float(), nullable=False),
+    sa.Column('total_efectivo', sa.Float(), nullable=False),
+    sa.Column('total_transferencia', sa.Float(), nullable=False),
+    sa.Column('cancelados_al_cierre', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_jornadas_estado', 'jornadas', ['estado'], unique=False)
+    op.create_index('ix_jornadas_fecha', 'jornadas', ['fecha'], unique=True)
+
+    op.create_table('tipos_sopa',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('codigo', sa.String(length=50), nullable=False),
+    sa.Column('nombre', sa.String(length=120), nullable=False),
+    sa.Column('precio', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tipos_sopa_codigo', 'tipos_sopa', ['codigo'], unique=True)
+
+    op.create_table('pedidos',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('cliente', sa.String(length=120), nullable=False),
+    sa.Column('tipo_sopa_codigo', sa.String(length=50), nullable=False),
+    sa.Column('metodo_pago', sa.String(length=30), nullable=False),
+    sa.Column('estado', sa.String(length=30), nullable=False),
+    sa.Column('cantidad', sa.Integer(), nullable=False),
+    sa.Column('direccion', sa.String(length=250), nullable=False),
+    sa.Column('pago_con_monto_exacto', sa.Boolean(), nullable=False),
+    sa.Column('monto_pagado', sa.Float(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('vuelto', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('client_id', sa.String(length=80), nullable=True),
+    sa.Column('client_request_id', sa.String(length=80), nullable=False),
+    sa.Column('is_deleted', sa.Boolean(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('es_especial', sa.Boolean(), nullable=False),
+    sa.Column('descripcion_especial', sa.Text(), nullable=True),
+    sa.Column('jornada_id', sa.String(length=36), nullable=False),
+    sa.ForeignKeyConstraint(['jornada_id'], ['jornadas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_pedidos_client_id', 'pedidos', ['client_id'], unique=False)
+    op.create_index('ix_pedidos_client_request_id', 'pedidos', ['client_request_id'], unique=True)
+    op.create_index('ix_pedidos_es_especial', 'pedidos', ['es_especial'], unique=False)
+    op.create_index('ix_pedidos_is_deleted', 'pedidos', ['is_deleted'], unique=False)
+    op.create_index('ix_pedidos_jornada_id', 'pedidos', ['jornada_id'], unique=False)
+    op.create_index('ix_pedidos_tipo_sopa_codigo', 'pedidos', ['tipo_sopa_codigo'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pedidos_tipo_sopa_codigo', table_name='pedidos')
+    op.drop_index('ix_pedidos_jornada_id', table_name='pedidos')
+    op.drop_index('ix_pedidos_is_deleted', table_name='pedidos')
+    op.drop_index('ix_pedidos_es_especial', table_name='pedidos')
+    op.drop_index('ix_pedidos_client_request_id', table_name='pedidos')
+    op.drop_index('ix_pedidos_client_id', table_name='pedidos')
+
+    op.drop_table('pedidos')
+    op.drop_index('ix_tipos_sopa_codigo', table_name='tipos_sopa')
+
+    op.drop_table('tipos_sopa')
+    op.drop_index('ix_jornadas_fecha', table_name='jornadas')
+    op.drop_index('ix_jornadas_estado', table_name='jornadas')
+
+    op.drop_table('jornadas')
@@ -0,0 +1,31 @@
+"""indice feed de cambios
+
+ix_pedidos_updated_at_id (updated_at, id): GET /pedidos/changes pagina por ese
+keyset. En Postgres con CONCURRENTLY.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 15:09:52
+
+"""
+from alembic import op
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def _concurrente():
+    return {"postgresql_concurrently": True} if op.get_bind().dialect.name == "postgresql" else {}
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_pedidos_updated_at_id', 'pedidos', ['updated_at', 'id'], **_concurrente())
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_pedidos_updated_at_id', table_name='pedidos', **_concurrente())
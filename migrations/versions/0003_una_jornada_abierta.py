@@ -0,0 +1,56 @@
+"""una jornada abierta
+
+ux_jornadas_una_abierta: índice único parcial (estado) WHERE estado = 'ABIERTA',
+sobre el que jornada_service hace el create-or-get con ON CONFLICT.
+
+Antes de crearlo se limpian los datos que lo harían fallar:
+
+* Jornadas con estado ACTIVA (las creaba por error una versión anterior) pasan a CERRADA.
+* Si quedó más de una ABIERTA (dos aperturas simultáneas), queda abierta solo la de
+  fecha más reciente; las demás se cierran con closed_at = ahora, sin snapshot.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 15:09:53
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+ABIERTA = sa.text("estado = 'ABIERTA'")
+
+
+def upgrade() -> None:
+    ahora = datetime.now(timezone.utc)
+    op.execute(
+        sa.text(
+            "UPDATE jornadas SET estado = 'CERRADA', closed_at = COALESCE(closed_at, :ahora) "
+            "WHERE estado NOT IN ('ABIERTA', 'CERRADA')"
+        ).bindparams(sa.bindparam("ahora", ahora, type_=sa.DateTime(timezone=True)))
+    )
+    op.execute(
+        sa.text(
+            "UPDATE jornadas SET estado = 'CERRADA', closed_at = COALESCE(closed_at, :ahora) "
+            "WHERE estado = 'ABIERTA' AND fecha < (SELECT max(fecha) FROM jornadas WHERE estado = 'ABIERTA')"
+        ).bindparams(sa.bindparam("ahora", ahora, type_=sa.DateTime(timezone=True)))
+    )
+
+    concurrente = {"postgresql_concurrently": True} if op.get_bind().dialect.name == "postgresql" else {}
+    # La limpieza queda confirmada antes de crear el índice (CONCURRENTLY va fuera de transacción)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ux_jornadas_una_abierta', 'jornadas', ['estado'], unique=True,
+            postgresql_where=ABIERTA, sqlite_where=ABIERTA, **concurrente,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ux_jornadas_una_abierta', table_name='jornadas')
@@ -0,0 +1,79 @@
+"""ventas resumen
+
+ventas_resumen: rollup por jornada x tipo de sopa x método de pago que
+reportes_service mantiene con cada cambio de pedido. Se llena acá mismo desde los
+pedidos existentes (lo mismo que `python -m app.commands.reconstruir_resumen`), así
+los reportes de una BD que ya tenía historial no arrancan vacíos.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 15:09:54
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+# Solo las columnas de pedidos que usa el backfill, tal como están en esta revisión
+pedidos = sa.table(
+    'pedidos',
+    sa.column('jornada_id', sa.String),
+    sa.column('tipo_sopa_codigo', sa.String),
+    sa.column('metodo_pago', sa.String),
+    sa.column('estado', sa.String),
+    sa.column('cantidad', sa.Integer),
+    sa.column('total', sa.Float),
+    sa.column('is_deleted', sa.Boolean),
+)
+
+
+def upgrade() -> None:
+    ventas_resumen = op.create_table('ventas_resumen',
+    sa.Column('jornada_id', sa.String(length=36), nullable=False),
+    sa.Column('tipo_sopa_codigo', sa.String(length=50), nullable=False),
+    sa.Column('metodo_pago', sa.String(length=30), nullable=False),
+    sa.Column('pedidos', sa.Integer(), nullable=False),
+    sa.Column('pendientes', sa.Integer(), nullable=False),
+    sa.Column('entregados', sa.Integer(), nullable=False),
+    sa.Column('cancelados', sa.Integer(), nullable=False),
+    sa.Column('cantidad', sa.Integer(), nullable=False),
+    sa.Column('cantidad_entregada', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('recaudado', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['jornada_id'], ['jornadas.id'], ),
+    sa.PrimaryKeyConstraint('jornada_id', 'tipo_sopa_codigo', 'metodo_pago')
+    )
+
+    p = pedidos.c
+    entregado = p.estado == 'ENTREGADO'
+    q = (
+        sa.select(
+            p.jornada_id,
+            p.tipo_sopa_codigo,
+            p.metodo_pago,
+            sa.func.count(),
+            sa.func.sum(sa.case((p.estado == 'PENDIENTE', 1), else_=0)),
+            sa.func.sum(sa.case((entregado, 1), else_=0)),
+            sa.func.sum(sa.case((p.estado == 'CANCELADO', 1), else_=0)),
+            sa.func.coalesce(sa.func.sum(p.cantidad), 0),
+            sa.func.coalesce(sa.func.sum(sa.case((entregado, p.cantidad), else_=0)), 0),
+            sa.func.coalesce(sa.func.sum(p.total), 0.0),
+            sa.func.coalesce(sa.func.sum(sa.case((entregado, p.total), else_=0.0)), 0.0),
+            sa.literal(datetime.now(timezone.utc), sa.DateTime(timezone=True)),
+        )
+        .where(p.is_deleted == sa.false())
+        .group_by(p.jornada_id, p.tipo_sopa_codigo, p.metodo_pago)
+    )
+    op.execute(ventas_resumen.insert().from_select([c.name for c in ventas_resumen.columns], q))
+
+
+def downgrade() -> None:
+    op.drop_table('ventas_resumen')
@@ -0,0 +1,27 @@
+"""version de pedidos
+
+pedidos.version: contador de concurrencia optimista (If-Match / ETag en
+GET y PATCH /pedidos/{id}). Las filas existentes arrancan en 1.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 15:09:55
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('pedidos', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('pedidos') as batch_op:
+        batch_op.drop_column('version')
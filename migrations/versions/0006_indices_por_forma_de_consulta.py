@@ -0,0 +1,73 @@
+"""indices por forma de consulta
+
+Reemplaza los índices de una columna por índices parciales que calzan con las
+consultas calientes, y quita los índices sobre columnas de baja selectividad
+(booleanos, tipo de sopa, estado de jornada) que solo encarecían cada escritura:
+
+* ix_pedidos_jornada_created: (jornada_id, created_at DESC) WHERE NOT is_deleted
+  -> listar pedidos de la jornada, export, dashboard, rollup.
+* ix_pedidos_jornada_pendientes: (jornada_id) WHERE NOT is_deleted AND estado = 'PENDIENTE'
+  -> cancelación masiva en cerrar_jornada.
+* ix_jornadas_estado sobra: ux_jornadas_una_abierta ya resuelve la jornada abierta.
+
+En Postgres se crean/borran con CONCURRENTLY para no bloquear escrituras.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 15:10:11
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+ACTIVOS = {"postgresql": "is_deleted = false", "sqlite": "is_deleted = 0"}
+PENDIENTES = " AND estado = 'PENDIENTE'"
+
+# (tabla, índice, columnas) que ya no se usan
+VIEJOS = [
+    ("jornadas", "ix_jornadas_estado", ["estado"]),
+    ("pedidos", "ix_pedidos_es_especial", ["es_especial"]),
+    ("pedidos", "ix_pedidos_is_deleted", ["is_deleted"]),
+    ("pedidos", "ix_pedidos_jornada_id", ["jornada_id"]),
+    ("pedidos", "ix_pedidos_tipo_sopa_codigo", ["tipo_sopa_codigo"]),
+]
+
+
+def _opciones():
+    dialecto = op.get_bind().dialect.name
+    activos = ACTIVOS.get(dialecto, ACTIVOS["postgresql"])
+    concurrente = {"postgresql_concurrently": True} if dialecto == "postgresql" else {}
+    return activos, concurrente
+
+
+def upgrade() -> None:
+    activos, concurrente = _opciones()
+    # CONCURRENTLY no puede correr dentro de una transacción
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_pedidos_jornada_created', 'pedidos',
+            ['jornada_id', sa.literal_column('created_at DESC')],
+            postgresql_where=sa.text(activos), sqlite_where=sa.text(activos), **concurrente,
+        )
+        op.create_index(
+            'ix_pedidos_jornada_pendientes', 'pedidos', ['jornada_id'],
+            postgresql_where=sa.text(activos + PENDIENTES), sqlite_where=sa.text(activos + PENDIENTES),
+            **concurrente,
+        )
+        for tabla, nombre, _ in VIEJOS:
+            op.drop_index(nombre, table_name=tabla, **concurrente)
+
+
+def downgrade() -> None:
+    _, concurrente = _opciones()
+    with op.get_context().autocommit_block():
+        for tabla, nombre, columnas in VIEJOS:
+            op.create_index(nombre, tabla, columnas, **concurrente)
+        op.drop_index('ix_pedidos_jornada_pendientes', table_name='pedidos', **concurrente)
+        op.drop_index('ix_pedidos_jornada_created', table_name='pedidos', **concurrente)
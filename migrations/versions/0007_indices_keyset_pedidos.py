@@ -0,0 +1,52 @@
+"""indices keyset de pedidos
+
+GET /pedidos y /pedidos/historico paginan por (created_at DESC, id DESC):
+
+* ix_pedidos_jornada_created_id reemplaza a ix_pedidos_jornada_created: suma id
+  para que el desempate del cursor también salga del índice.
+* ix_pedidos_created_id: el mismo orden sin jornada, para el histórico.
+
+El nuevo se crea antes de borrar el viejo, así las lecturas nunca quedan sin
+índice. En Postgres con CONCURRENTLY.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 18:02:40
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+ACTIVOS = {"postgresql": "is_deleted = false", "sqlite": "is_deleted = 0"}
+
+CREATED = sa.literal_column('created_at DESC')
+ID = sa.literal_column('id DESC')
+
+
+def _opciones():
+    dialecto = op.get_bind().dialect.name
+    activos = sa.text(ACTIVOS.get(dialecto, ACTIVOS["postgresql"]))
+    concurrente = {"postgresql_concurrently": True} if dialecto == "postgresql" else {}
+    return {"postgresql_where": activos, "sqlite_where": activos, **concurrente}, concurrente
+
+
+def upgrade() -> None:
+    parcial, concurrente = _opciones()
+    with op.get_context().autocommit_block():
+        op.create_index('ix_pedidos_jornada_created_id', 'pedidos', ['jornada_id', CREATED, ID], **parcial)
+        op.create_index('ix_pedidos_created_id', 'pedidos', [CREATED, ID], **parcial)
+        op.drop_index('ix_pedidos_jornada_created', table_name='pedidos', **concurrente)
+
+
+def downgrade() -> None:
+    parcial, concurrente = _opciones()
+    with op.get_context().autocommit_block():
+        op.create_index('ix_pedidos_jornada_created', 'pedidos', ['jornada_id', CREATED], **parcial)
+        op.drop_index('ix_pedidos_created_id', table_name='pedidos', **concurrente)
+        op.drop_index('ix_pedidos_jornada_created_id', table_name='pedidos', **concurrente)
@@ -0,0 +1,73 @@
+"""archivo de pedidos
+
+* pedidos_archivo: pedidos de jornadas cerradas hace más de ARCHIVO_RETENCION_DIAS.
+  En Postgres particionada por RANGE (fecha); las particiones mensuales las crea
+  archivo_service al archivar.
+* jornadas.archivada_at: la jornada ya se movió al archivo.
+* ix_pedidos_borrados: (deleted_at) WHERE is_deleted, para la purga de soft deletes.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 19:40:12
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+BORRADOS = {"postgresql": "is_deleted = true", "sqlite": "is_deleted = 1"}
+
+
+def upgrade() -> None:
+    op.add_column('jornadas', sa.Column('archivada_at', sa.DateTime(timezone=True), nullable=True))
+
+    op.create_table('pedidos_archivo',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('cliente', sa.String(length=120), nullable=False),
+    sa.Column('tipo_sopa_codigo', sa.String(length=50), nullable=False),
+    sa.Column('metodo_pago', sa.String(length=30), nullable=False),
+    sa.Column('estado', sa.String(length=30), nullable=False),
+    sa.Column('cantidad', sa.Integer(), nullable=False),
+    sa.Column('direccion', sa.String(length=250), nullable=False),
+    sa.Column('pago_con_monto_exacto', sa.Boolean(), nullable=False),
+    sa.Column('monto_pagado', sa.Float(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('vuelto', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('client_id', sa.String(length=80), nullable=True),
+    sa.Column('client_request_id', sa.String(length=80), nullable=False),
+    sa.Column('is_deleted', sa.Boolean(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('es_especial', sa.Boolean(), nullable=False),
+    sa.Column('descripcion_especial', sa.Text(), nullable=True),
+    sa.Column('jornada_id', sa.String(length=36), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('archivado_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id', 'fecha'),
+    postgresql_partition_by='RANGE (fecha)',
+    )
+    op.create_index('ix_pedidos_archivo_jornada_id', 'pedidos_archivo', ['jornada_id'], unique=False)
+
+    dialecto = op.get_bind().dialect.name
+    borrados = sa.text(BORRADOS.get(dialecto, BORRADOS["postgresql"]))
+    concurrente = {"postgresql_concurrently": True} if dialecto == "postgresql" else {}
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_pedidos_borrados', 'pedidos', ['deleted_at'],
+            postgresql_where=borrados, sqlite_where=borrados, **concurrente,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pedidos_borrados', table_name='pedidos')
+    op.drop_index('ix_pedidos_archivo_jornada_id', table_name='pedidos_archivo')
+    op.drop_table('pedidos_archivo')
+    with op.batch_alter_table('jornadas') as batch_op:
+        batch_op.drop_column('archivada_at')
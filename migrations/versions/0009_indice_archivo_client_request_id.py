@@ -0,0 +1,29 @@
+"""indice de client_request_id en el archivo
+
+ix_pedidos_archivo_client_request_id: crear_pedido, /pedidos/batch y la cola de
+ingesta buscan ahí los reintentos de pedidos ya archivados, que el UNIQUE de
+pedidos ya no frena. No es único: en la tabla particionada tendría que incluir
+fecha. En Postgres se crea sobre la tabla padre y cada partición recibe el suyo
+(CONCURRENTLY no se admite en tablas particionadas; el archivo solo lo escribe el
+mantenimiento).
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 21:05:33
+
+"""
+from alembic import op
+
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_pedidos_archivo_client_request_id', 'pedidos_archivo', ['client_request_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pedidos_archivo_client_request_id', table_name='pedidos_archivo')
@@ -0,0 +1,33 @@
+"""closed_at de jornadas cerradas
+
+abrir_jornada_hoy cerraba la jornada abierta de un día anterior sin fijar
+closed_at, y archivar_vencidas elige por closed_at: esas jornadas nunca pasaban
+al archivo. Se completa con la fecha de la migración, como en 0003 (se archivan
+pasados ARCHIVO_RETENCION_DIAS desde acá). No tiene vuelta atrás.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 22:14:08
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        sa.text("UPDATE jornadas SET closed_at = :ahora WHERE estado = 'CERRADA' AND closed_at IS NULL")
+        .bindparams(sa.bindparam("ahora", datetime.now(timezone.utc), type_=sa.DateTime(timezone=True)))
+    )
+
+
+def downgrade() -> None:
+    pass
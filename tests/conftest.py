@@ -0,0 +1,65 @@
+"""Pruebas contra la app real sobre un SQLite temporal.
+
+    pip install -r requirements.txt -r tests/requirements.txt
+    python -m pytest -q
+
+La configuración sale del entorno al importar app.config, así que se fija acá,
+antes de que cualquier prueba importe la app.
+"""
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+DIRECTORIO = Path(tempfile.mkdtemp(prefix="sopas-tests-"))
+
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{DIRECTORIO / 'sopas.db'}",
+    DB_MODE="sync",
+    DB_ESQUEMA_AL_INICIAR="migrar",
+    CACHE_BACKEND="memoria",
+    INGESTA_COLA_PATH=str(DIRECTORIO / "ingesta.db"),
+    PEDIDOS_INGESTA="directa",
+    EVENTOS_PG_NOTIFY="false",
+    ARCHIVO_AL_CERRAR="false",
+    ADMISION_TASA="0",
+)
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    # El lifespan migra la BD vacía desde 0001 y siembra el catálogo
+    with TestClient(app) as c:
+        assert c.post("/jornadas/abrir").status_code == 200
+        yield c
+
+@pytest.fixture
+def db(client):
+    from app.database import SessionLocal
+
+    sesion = SessionLocal()
+    try:
+        yield sesion
+    finally:
+        sesion.close()
+
+def payload_pedido(**cambios) -> dict:
+    datos = {
+        "client_request_id": str(uuid.uuid4()),
+        "client_id": "tablet-1",
+        "cliente": "María López",
+        "tipo_sopa_codigo": "CON_EMPAQUE",
+        "metodo_pago": "EFECTIVO",
+        "cantidad": 2,
+        "direccion": "Altamira, casa 12",
+        "pago_con_monto_exacto": True,
+        "monto_pagado": 0,
+        "es_especial": False,
+        "descripcion_especial": None,
+    }
+    datos.update(cambios)
+    return datos
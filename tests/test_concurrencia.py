@@ -0,0 +1,88 @@
+from sqlalchemy import update
+
+from app.database import SessionLocal
+from app.models.pedido import Pedido
+from app.services import pedido_service
+from tests.conftest import payload_pedido
+
+def _crear(client) -> dict:
+    r = client.post("/pedidos", json=payload_pedido())
+    assert r.status_code == 201
+    return r.json()
+
+def test_get_devuelve_etag_y_304(client):
+    pedido = _crear(client)
+    r = client.get(f"/pedidos/{pedido['id']}")
+    assert r.headers["etag"] == '"1"'
+    r = client.get(f"/pedidos/{pedido['id']}", headers={"If-None-Match": '"1"'})
+    assert r.status_code == 304
+
+def test_patch_con_if_match_vigente_sube_la_version(client):
+    pedido = _crear(client)
+    r = client.patch(f"/pedidos/{pedido['id']}", json={"estado": "ENTREGADO"}, headers={"If-Match": '"1"'})
+    assert r.status_code == 200
+    assert r.headers["etag"] == '"2"'
+    assert r.json()["version"] == 2
+    assert r.json()["estado"] == "ENTREGADO"
+
+def test_patch_con_if_match_viejo_responde_412(client):
+    pedido = _crear(client)
+    client.patch(f"/pedidos/{pedido['id']}", json={"cantidad": 3})
+    r = client.patch(f"/pedidos/{pedido['id']}", json={"estado": "ENTREGADO"}, headers={"If-Match": '"1"'})
+    assert r.status_code == 412
+    # If-Match compara fuerte: un etag débil nunca coincide
+    r = client.patch(f"/pedidos/{pedido['id']}", json={"estado": "ENTREGADO"}, headers={"If-Match": 'W/"2"'})
+    assert r.status_code == 412
+    assert client.get(f"/pedidos/{pedido['id']}").json()["estado"] == "PENDIENTE"
+
+def test_patch_sin_if_match_que_pierde_la_carrera_responde_409(client, monkeypatch):
+    pedido = _crear(client)
+    leer = pedido_service._leer_pedido
+
+    def leer_y_escribir_otro(db, pedido_id):
+        actual = leer(db, pedido_id)
+        # Otro dispositivo confirma su cambio entre la lectura y el UPDATE
+        otra = SessionLocal()
+        otra.execute(update(Pedido).where(Pedido.id == pedido_id).values(cantidad=5, version=Pedido.version + 1))
+        otra.commit()
+        otra.close()
+        return actual
+
+    monkeypatch.setattr(pedido_service, "_leer_pedido", leer_y_escribir_otro)
+    r = client.patch(f"/pedidos/{pedido['id']}", json={"estado": "ENTREGADO"})
+    assert r.status_code == 409
+    monkeypatch.undo()
+
+    actual = client.get(f"/pedidos/{pedido['id']}").json()
+    assert (actual["estado"], actual["cantidad"], actual["version"]) == ("PENDIENTE", 5, 2)
+
+def test_cambio_masivo_marca_conflicto_por_pedido(client):
+    a, b = _crear(client), _crear(client)
+    client.patch(f"/pedidos/{b['id']}", json={"estado": "ENTREGADO"})
+    r = client.post("/pedidos/estado", json={"ids": [a["id"], b["id"], "no-existe"], "estado": "ENTREGADO"})
+    assert r.status_code == 200
+    assert [x["resultado"] for x in r.json()] == ["ACTUALIZADO", "SIN_CAMBIO", "NO_EXISTE"]
+
+def test_pedido_borrado_no_se_lee_ni_se_modifica(client):
+    pedido = _crear(client)
+    assert client.delete(f"/pedidos/{pedido['id']}").status_code == 204
+    assert client.delete(f"/pedidos/{pedido['id']}").status_code == 204
+
+    assert client.get(f"/pedidos/{pedido['id']}").status_code == 404
+    assert client.patch(f"/pedidos/{pedido['id']}", json={"cantidad": 300}).status_code == 404
+    with SessionLocal() as db:
+        assert db.get(Pedido, pedido["id"]).cantidad == pedido["cantidad"]
+
+def test_patch_de_un_pedido_borrado_en_medio_responde_409(client, monkeypatch):
+    pedido = _crear(client)
+    leer = pedido_service._leer_pedido
+
+    def leer_y_borrar(db, pedido_id):
+        fila = leer(db, pedido_id)
+        with SessionLocal() as otra:
+            otra.execute(update(Pedido).where(Pedido.id == pedido_id).values(is_deleted=True))
+            otra.commit()
+        return fila
+
+    monkeypatch.setattr(pedido_service, "_leer_pedido", leer_y_borrar)
+    assert client.patch(f"/pedidos/{pedido['id']}", json={"cantidad": 3}).status_code == 409
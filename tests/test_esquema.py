@@ -0,0 +1,54 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine
+
+from app.database import Base
+from app.esquema import RAIZ, head_local
+
+def _correr(url: str, *args: str):
+    env = {**os.environ, "DATABASE_URL": url}
+    subprocess.run([sys.executable, *args], cwd=RAIZ, env=env, check=True, capture_output=True)
+
+def test_bd_sin_alembic_se_marca_como_0001_y_recibe_todo(tmp_path):
+    ruta = tmp_path / "previa.db"
+    url = f"sqlite:///{ruta}"
+    # 0001 es el esquema que dejaba create_all antes de las migraciones; sin
+    # alembic_version queda igual que una BD de producción de esa época
+    _correr(url, "-m", "alembic", "upgrade", "0001")
+    con = sqlite3.connect(ruta)
+    con.executescript("""
+        DROP TABLE alembic_version;
+        INSERT INTO jornadas VALUES
+            ('j0', '2026-09-30', 'ACTIVA', '2026-09-30 10:00:00', NULL, '2026-09-30 10:00:00', 0, 0, 0, 0, 0),
+            ('j1', '2026-10-01', 'ABIERTA', '2026-10-01 10:00:00', NULL, '2026-10-01 10:00:00', 0, 0, 0, 0, 0),
+            ('j2', '2026-10-02', 'ABIERTA', '2026-10-02 10:00:00', NULL, '2026-10-02 10:00:00', 0, 0, 0, 0, 0);
+        INSERT INTO pedidos (id, cliente, tipo_sopa_codigo, metodo_pago, estado, cantidad, direccion,
+            pago_con_monto_exacto, monto_pagado, total, vuelto, created_at, updated_at,
+            client_request_id, is_deleted, es_especial, jornada_id)
+        VALUES ('p1', 'Ana', 'CON_EMPAQUE', 'EFECTIVO', 'ENTREGADO', 2, 'Bolonia', 1, 0, 360, 0,
+            '2026-10-02 10:00:00', '2026-10-02 10:00:00', 'r1', 0, 0, 'j2');
+    """)
+    con.commit()
+    con.close()
+
+    _correr(url, "-c", "from app.esquema import migrar; migrar()")
+
+    con = sqlite3.connect(ruta)
+    assert con.execute("SELECT version_num FROM alembic_version").fetchall() == [(head_local(),)]
+    assert con.execute("SELECT id FROM jornadas WHERE estado = 'ABIERTA'").fetchall() == [("j2",)]
+    assert con.execute("SELECT version FROM pedidos WHERE id = 'p1'").fetchall() == [(1,)]
+    assert con.execute(
+        "SELECT jornada_id, pedidos, entregados, cantidad, recaudado FROM ventas_resumen"
+    ).fetchall() == [("j2", 1, 1, 2, 360.0)]
+    con.close()
+
+    # Y queda igual a lo que declaran los modelos
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        assert compare_metadata(MigrationContext.configure(conn), Base.metadata) == []
+    engine.dispose()
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timezone
+
+import orjson
+
+from app import eventos
+from app.schemas.pedido import CAMPOS_PEDIDO_OUT
+
+class SesionPostgres:
+    # Lo justo para emitir(): guarda el payload de cada pg_notify
+    def __init__(self):
+        self.info = {}
+        self.payloads = []
+
+    def execute(self, stmt):
+        canal, payload = (arg.value for arg in stmt.selected_columns[0].clauses)
+        assert canal == eventos.CANAL_PG
+        self.payloads.append(payload)
+
+class Fila:
+    def __init__(self, **campos):
+        self.__dict__.update(campos)
+
+def _pedido(**cambios) -> Fila:
+    datos = {c: None for c in CAMPOS_PEDIDO_OUT}
+    datos.update(id="p1", version=3, jornada_id="j1", estado="PENDIENTE",
+                 created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc))
+    datos.update(cambios)
+    return Fila(**datos)
+
+def test_pedido_que_no_entra_en_un_notify_viaja_como_referencia(monkeypatch):
+    monkeypatch.setattr(eventos, "_usar_pg_notify", lambda db: True)
+    db = SesionPostgres()
+    eventos.emitir_pedido(db, "creado", _pedido(descripcion_especial="x"), CAMPOS_PEDIDO_OUT)
+    eventos.emitir_pedido(db, "actualizado", _pedido(descripcion_especial="x" * 20000), CAMPOS_PEDIDO_OUT)
+
+    chico, grande = (orjson.loads(p) for p in db.payloads)
+    assert chico["datos"]["descripcion_especial"] == "x" and "ref" not in chico
+    assert len(db.payloads[1]) <= eventos.MAX_PAYLOAD_PG
+    assert grande["datos"] is None
+    assert grande["ref"] == {"pedido_id": "p1", "version": 3}
+
+def test_listener_lee_la_fila_de_una_referencia(monkeypatch):
+    publicados = []
+    monkeypatch.setattr(eventos, "publicar", publicados.append)
+
+    class Conexion:
+        async def fetchrow(self, sql, pedido_id):
+            assert sql == eventos.SQL_PEDIDO
+            return {"id": pedido_id, "version": 4, "descripcion_especial": "x" * 20000} if pedido_id == "p1" else None
+
+    mensaje = {"id": "w-1", "tipo": "actualizado", "datos": None}
+    for pedido_id in ("p1", "p2"):
+        payload = orjson.dumps({**mensaje, "ref": {"pedido_id": pedido_id, "version": 3}}).decode()
+        asyncio.run(eventos._recibir(Conexion(), payload))
+
+    assert publicados[0]["datos"]["version"] == 4
+    assert len(publicados[0]["datos"]["descripcion_especial"]) == 20000
+    # Ya no está en pedidos: se publica la referencia
+    assert publicados[1]["datos"] == {"id": "p2", "version": 3}
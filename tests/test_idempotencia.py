@@ -0,0 +1,105 @@
+import itertools
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import ingesta
+from app.config import settings
+from app.services.pedido_service import olvidar_recientes
+from tests.conftest import payload_pedido
+
+@pytest.fixture
+def modo_cola(client, monkeypatch):
+    # Sin reiniciar la app no arranca el volcado: lo encolado queda en la cola local
+    monkeypatch.setattr(settings, "PEDIDOS_INGESTA", "cola")
+    monkeypatch.setattr(ingesta, "_cola", None)
+
+def test_reintento_en_cola_de_un_pedido_ya_guardado(client, modo_cola, monkeypatch):
+    pedido = payload_pedido()
+    monkeypatch.setattr(settings, "PEDIDOS_INGESTA", "directa")
+    creado = client.post("/pedidos", json=pedido)
+    assert creado.status_code == 201
+    monkeypatch.setattr(settings, "PEDIDOS_INGESTA", "cola")
+
+    # Ni en la cola ni en la caché de reintentos: lo tiene que encontrar en la BD
+    olvidar_recientes()
+    r = client.post("/pedidos", json=pedido)
+    assert r.status_code == 202
+    assert r.json()["resultado"] == "DUPLICADO"
+    assert r.json()["pedido_id"] == creado.json()["id"]
+    assert ingesta.cola().buscar(pedido["client_request_id"]) is None
+
+def test_reintento_de_un_pedido_encolado(client, modo_cola):
+    pedido = payload_pedido()
+    primero = client.post("/pedidos", json=pedido)
+    assert primero.status_code == 202
+    assert primero.json()["resultado"] == "ENCOLADO"
+
+    segundo = client.post("/pedidos", json=pedido)
+    assert segundo.json()["resultado"] == "DUPLICADO"
+    assert segundo.json()["pedido_id"] == primero.json()["pedido_id"]
+
+_dias_atras = itertools.count(1)
+
+@pytest.fixture
+def archivado(db):
+    # Pedido de una jornada vieja que ya pasó a pedidos_archivo
+    from app.models.jornada import Jornada
+    from app.models.pedido import Pedido
+    from app.services.archivo_service import archivar_jornada
+    from app.services.jornada_service import hoy_fecha_local
+
+    # Dentro de IDEMPOTENCIA_ARCHIVO_DIAS; una jornada por fecha
+    jornada = Jornada(fecha=hoy_fecha_local() - timedelta(days=next(_dias_atras)),
+                      estado="CERRADA", closed_at=datetime.now(timezone.utc))
+    pedido = payload_pedido()
+    fila = Pedido(jornada=jornada, client_request_id=pedido["client_request_id"], cliente="Ana",
+                  tipo_sopa_codigo="CON_EMPAQUE", metodo_pago="EFECTIVO", estado="ENTREGADO",
+                  cantidad=1, direccion="Centro", pago_con_monto_exacto=True,
+                  monto_pagado=0, total=0, vuelto=0)
+    db.add(fila)
+    db.commit()
+    pedido_id = fila.id
+    assert archivar_jornada(db, jornada.id) == 1
+    olvidar_recientes()
+    return pedido, pedido_id
+
+def _en_pedidos(db, crid: str) -> int:
+    from sqlalchemy import func, select
+    from app.models.pedido import Pedido
+
+    return db.execute(select(func.count()).where(Pedido.client_request_id == crid)).scalar()
+
+def test_reintento_de_un_pedido_archivado(client, db, archivado):
+    pedido, pedido_id = archivado
+    r = client.post("/pedidos", json=pedido)
+    assert r.status_code == 200
+    assert r.json()["id"] == pedido_id
+
+    olvidar_recientes()
+    lote = client.post("/pedidos/batch", json=[pedido, payload_pedido()]).json()
+    assert lote[0] == {"client_request_id": pedido["client_request_id"], "resultado": "DUPLICADO",
+                       "pedido_id": pedido_id, "detalle": None}
+    assert lote[1]["resultado"] == "CREADO"
+    assert _en_pedidos(db, pedido["client_request_id"]) == 0
+
+def test_reintento_en_cola_de_un_pedido_archivado(client, db, archivado, modo_cola):
+    pedido, pedido_id = archivado
+    r = client.post("/pedidos", json=pedido)
+    assert r.json()["resultado"] == "DUPLICADO"
+    assert r.json()["pedido_id"] == pedido_id
+
+def test_alta_mira_el_archivo_en_el_mismo_insert(client):
+    from sqlalchemy import event
+    from app.database import engine
+
+    consultas = []
+    def capturar(conn, cursor, statement, *args):
+        consultas.append(statement.lstrip().upper())
+    event.listen(engine, "before_cursor_execute", capturar)
+    try:
+        assert client.post("/pedidos", json=payload_pedido()).status_code == 201
+    finally:
+        event.remove(engine, "before_cursor_execute", capturar)
+    assert not [c for c in consultas if c.startswith("SELECT") and "PEDIDOS_ARCHIVO" in c]
+    assert [c for c in consultas if c.startswith("INSERT INTO PEDIDOS ") and "PEDIDOS_ARCHIVO" in c]
@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.jornada import Jornada
+from app.services.jornada_service import abrir_jornada_hoy, hoy_fecha_local
+
+@pytest.fixture
+def sesiones(tmp_path):
+    # BD propia: la de la app ya tiene abierta la jornada de hoy
+    engine = create_engine(f"sqlite:///{tmp_path / 'jornadas.db'}", connect_args={"timeout": 30})
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+def _abrir(Sesion) -> str:
+    with Sesion() as db:
+        return abrir_jornada_hoy(db).id
+
+def test_abrir_en_paralelo_crea_una_sola_jornada(sesiones):
+    with ThreadPoolExecutor(8) as ex:
+        ids = set(ex.map(lambda _: _abrir(sesiones), range(16)))
+    assert len(ids) == 1
+    with sesiones() as db:
+        assert db.execute(select(Jornada.estado)).scalars().all() == ["ABIERTA"]
+
+def test_abrir_cierra_la_de_un_dia_anterior(sesiones):
+    with sesiones() as db:
+        db.add(Jornada(id="ayer", fecha=hoy_fecha_local() - timedelta(days=1), estado="ABIERTA"))
+        db.commit()
+    hoy = _abrir(sesiones)
+    assert _abrir(sesiones) == hoy
+    with sesiones() as db:
+        estados = dict(db.execute(select(Jornada.id, Jornada.estado)).all())
+    assert estados == {"ayer": "CERRADA", hoy: "ABIERTA"}
+
+def test_alta_no_usa_una_jornada_cacheada_que_otro_worker_cerro(client, db):
+    from sqlalchemy import update
+    from app.services.jornada_service import invalidar_jornada_activa, obtener_jornada_activa
+    from tests.conftest import payload_pedido
+
+    jornada = obtener_jornada_activa(db)  # queda en la caché de este worker
+    # Otro worker la cierra: su invalidación no llega a la caché en memoria de este
+    db.execute(update(Jornada).where(Jornada.id == jornada.id).values(estado="CERRADA"))
+    db.commit()
+    try:
+        assert client.post("/pedidos", json=payload_pedido()).status_code == 404
+        assert client.post("/pedidos/batch", json=[payload_pedido()]).status_code == 404
+    finally:
+        db.execute(update(Jornada).where(Jornada.id == jornada.id).values(estado="ABIERTA"))
+        db.commit()
+        invalidar_jornada_activa()
+    assert client.post("/pedidos", json=payload_pedido()).status_code == 201
+
+def test_dashboard_de_jornada_archivada_en_una_consulta(client, db):
+    from datetime import date, datetime, timezone
+    from sqlalchemy import event
+    from app.database import engine
+    from app.models.pedido import Pedido
+    from app.services.archivo_service import archivar_jornada
+
+    jornada = Jornada(fecha=date(2019, 6, 1), estado="CERRADA", closed_at=datetime.now(timezone.utc))
+    for estado, total in (("ENTREGADO", 5.0), ("CANCELADO", 3.0)):
+        db.add(Pedido(jornada=jornada, client_request_id=f"dash-{estado}", cliente="Ana",
+                      tipo_sopa_codigo="CON_EMPAQUE", metodo_pago="EFECTIVO", estado=estado,
+                      cantidad=1, direccion="Centro", pago_con_monto_exacto=True,
+                      monto_pagado=total, total=total, vuelto=0))
+    db.commit()
+    jornada_id = jornada.id
+    assert archivar_jornada(db, jornada_id) == 2
+
+    consultas = []
+    def contar(conn, cursor, statement, *args):
+        consultas.append(statement)
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        datos = client.get(f"/jornadas/{jornada_id}/dashboard").json()
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    assert len(consultas) == 1
+    assert (datos["total_pedidos"], datos["entregados"], datos["cancelados"]) == (2, 1, 1)
+    assert datos["total_recaudado"] == 5.0
+
+def test_la_jornada_cerrada_al_abrir_se_archiva(sesiones):
+    from app.models.pedido import Pedido
+    from app.services.archivo_service import archivar_vencidas
+
+    with sesiones() as db:
+        ayer = Jornada(id="ayer", fecha=hoy_fecha_local() - timedelta(days=1), estado="ABIERTA")
+        db.add(Pedido(jornada=ayer, client_request_id="olvidado", cliente="Ana",
+                      tipo_sopa_codigo="CON_EMPAQUE", metodo_pago="EFECTIVO", estado="PENDIENTE",
+                      cantidad=1, direccion="Centro", pago_con_monto_exacto=True,
+                      monto_pagado=2, total=2, vuelto=0))
+        db.commit()
+    _abrir(sesiones)
+    with sesiones() as db:
+        assert db.get(Jornada, "ayer").closed_at is not None
+        assert archivar_vencidas(db, dias=0) == {"ayer": 1}
+        assert db.execute(select(Pedido.id)).first() is None
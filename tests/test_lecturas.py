@@ -0,0 +1,30 @@
+from app.routers import pedido_router
+
+def test_listado_sin_replica_usa_una_sola_sesion(client, monkeypatch):
+    # Sin réplica, GET /pedidos no puede ocupar dos conexiones: la admisión cuenta una
+    sesiones = []
+
+    def registrar(servicio):
+        def envuelto(db, *args, **kwargs):
+            sesiones.append(db)
+            return servicio(db, *args, **kwargs)
+        return envuelto
+
+    for nombre in ("get_or_create_jornada_activa", "marca_pedidos", "listar_pagina_pedidos"):
+        monkeypatch.setattr(pedido_router, nombre, registrar(getattr(pedido_router, nombre)))
+
+    assert client.get("/pedidos").status_code == 200
+    assert len(sesiones) == 3
+    assert len({id(s) for s in sesiones}) == 1
+
+def test_esquema_del_listado_admite_columnas_proyectadas(client):
+    esquema = client.get("/openapi.json").json()
+    for ruta in ("/pedidos", "/pedidos/historico"):
+        respuesta = esquema["paths"][ruta]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        assert respuesta["items"]["$ref"].endswith("/PedidoProyectado")
+    proyectado = esquema["components"]["schemas"]["PedidoProyectado"]
+    assert not proyectado.get("required")
+    assert "cliente" in proyectado["properties"]
+
+    filas = client.get("/pedidos", params={"fields": "id,cliente"}).json()
+    assert all(set(f) == {"id", "cliente"} for f in filas)